@@ -1,11 +1,15 @@
 from bcc import BPF
 import ctypes
 import subprocess
+import sys
 import time
 import os
 
 from eval import evaluate, SystemLoad
 
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from rq_histogram import open_rq_histogram
+
 # TODO: For now each workload is a single scheduler, ideally we could have overlapping workloads do something else too
 SCHED_PATH = "./scx"
 scheds = {
@@ -41,12 +45,25 @@ THRESHOLDS[SystemLoad.PARALLEL] = get_sys_cpus()
 print(f"Parallelism threshold set to {THRESHOLDS[SystemLoad.PARALLEL]}")
 
 p = subprocess.Popen([f'{SCHED_PATH}/{scheds[SystemLoad.CPU]}'], stdout=subprocess.DEVNULL)
+b = BPF(text='BPF_TABLE_PINNED("percpu_array", u32, u64, ba_bawm, 8, "/sys/fs/bpf/ba_bawm");')
+# PARALLEL is the median of runnable tasks from the C profiler's parallel
+# probe; the Python profilers have none, so it stays off without it.
+rq = open_rq_histogram()
+if rq is None:
+    print("No run-queue histogram (start the C profiler's parallel probe); PARALLEL disabled")
+# Counters are monotonic; each window is the difference from the previous read.
+prev = {}
 while(True):
-    b = BPF(text='BPF_TABLE_PINNED("hash", u64, u64, ba_bawm, 1024, "/sys/fs/bpf/ba_bawm");')
+    if rq is None:
+        rq = open_rq_histogram()
 
     for i, s_load in enumerate(load):
-        val = b["ba_bawm"].get(ctypes.c_uint(i))
-        load_val = val.value if val is not None else 0
+        if s_load == SystemLoad.PARALLEL:
+            load_val = rq.window()["p50"] if rq is not None else 0
+        else:
+            total = b["ba_bawm"].sum(ctypes.c_uint(i)).value
+            load_val = total - prev.get(i, total)
+            prev[i] = total
         threshold = THRESHOLDS[s_load]
         load[s_load] = load_val >= threshold if threshold is not None else False
 
@@ -59,10 +76,5 @@ while(True):
         p = subprocess.Popen([f'{SCHED_PATH}/{scheds[curr_load]}'], stdout=subprocess.DEVNULL)
         print(f"Switched to {scheds[curr_load]}, {curr_load.name}")
 
-    #b["ba_bawm"].clear()
-    for k in list(b["ba_bawm"].keys()):
-        if int(k.value) != 4:
-            del b["ba_bawm"][k]
-
 
     time.sleep(SLEEP_INTERVAL)
\ No newline at end of file
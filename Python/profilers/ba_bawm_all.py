@@ -0,0 +1,60 @@
+from bcc import BPF
+import argparse
+import time
+
+# Keys match SystemLoad; same layout as profilers_c/ALL/ba_bawm_all_skel.bpf.c.
+# The run-queue (parallel) sampler needs struct rq via BTF and is C-only.
+KEYS = {"cpu": 0, "io": 1, "mem": 2, "net": 3}
+DEFAULT_PROBES = "cpu,io,mem,net"
+
+MAP_DEF = 'BPF_TABLE_PINNED("percpu_array", u32, u64, ba_bawm, 8, "/sys/fs/bpf/ba_bawm");'
+
+COUNT = """
+static __always_inline void count(u32 key) {
+    u64 *val = ba_bawm.lookup(&key);
+    if (val)
+        (*val) += 1;
+}
+"""
+
+TRACEPOINTS = {
+    "cpu": ("sched", "sched_switch"),
+    "io": ("block", "block_rq_issue"),
+    "mem": ("kmem", "mm_page_alloc"),
+    "net": ("net", "net_dev_queue"),
+}
+
+
+def build_text(probes):
+    parts = [MAP_DEF, COUNT]
+    for name, (category, event) in TRACEPOINTS.items():
+        if name in probes:
+            parts.append(f"TRACEPOINT_PROBE({category}, {event}) {{ count({KEYS[name]}); return 0; }}")
+    return "\n".join(parts)
+
+
+def parse_probes(spec):
+    probes = set()
+    for p in spec.split(","):
+        if p == "all":
+            probes.update(KEYS)
+        elif p in KEYS:
+            probes.add(p)
+        else:
+            raise argparse.ArgumentTypeError(f"unknown probe '{p}'")
+    return probes
+
+
+parser = argparse.ArgumentParser(description="BA-BAWM combined profiler")
+parser.add_argument("-p", "--probes", type=parse_probes, default=parse_probes(DEFAULT_PROBES),
+                    help=f"comma-separated: {', '.join(KEYS)} or all (default: {DEFAULT_PROBES})")
+args = parser.parse_args()
+
+b = BPF(text=build_text(args.probes))
+print(f"Attached probes: {', '.join(sorted(args.probes, key=KEYS.get))}")
+
+try:
+    while True:
+        time.sleep(3600)
+except KeyboardInterrupt:
+    print("Detaching and exiting.")
@@ -2,16 +2,14 @@
 
 set -euo pipefail
 
-echo "Starting all profilers..."
+echo "Starting profiler..."
 
 CONFIG_FILE="config.json"
 SCRIPT_DIR=$(jq -r '.script_dir' "$CONFIG_FILE")
-PROFILERS=($(jq -r '.profilers[]' "$CONFIG_FILE"))
+PROBES=$(jq -r '.probes | join(",")' "$CONFIG_FILE")
 
-for PROFILER in "${PROFILERS[@]}"; do
-    echo "${PROFILER}"
-    sudo python3 "${SCRIPT_DIR}/${PROFILER}.py" &
-done
+echo "probes: ${PROBES}"
+sudo python3 "${SCRIPT_DIR}/ba_bawm_all.py" -p "${PROBES}" &
 
-echo "All scripts launched. Press Ctrl+C or kill this script to stop them."
+echo "Profiler launched. Press Ctrl+C or kill this script to stop it."
 wait
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Compare CounterSource backends: startup cost (open) and per-tick snapshot cost.
+
+    sudo python bench/counter_source_bench.py --ticks 2000
+    python bench/counter_source_bench.py --sources fake
+
+The pinned/bcc backends need root and a running profiler (/sys/fs/bpf/ba_bawm);
+they are reported as skipped otherwise.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from counter_source import PIN_PATH, SOURCES, open_counter_source
+
+
+def bench_source(kind, ticks, path):
+    kwargs = {} if kind == "fake" else {"path": path}
+
+    t0 = time.perf_counter()
+    try:
+        src = open_counter_source(kind, **kwargs)
+    except Exception as e:
+        return {"source": kind, "skipped": f"{type(e).__name__}: {e}"}
+    startup_ms = (time.perf_counter() - t0) * 1000
+
+    samples = []
+    try:
+        for _ in range(ticks):
+            if kind == "fake":
+                for key in range(5):
+                    src.add(key, 1000)
+            t = time.perf_counter()
+            src.snapshot()
+            samples.append((time.perf_counter() - t) * 1e6)
+    finally:
+        src.close()
+
+    samples.sort()
+    return {
+        "source": kind,
+        "startup_ms": round(startup_ms, 3),
+        "ticks": ticks,
+        "tick_us_mean": round(statistics.fmean(samples), 2),
+        "tick_us_p50": round(samples[len(samples) // 2], 2),
+        "tick_us_p99": round(samples[min(len(samples) - 1, int(len(samples) * 0.99))], 2),
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--sources", default=",".join(SOURCES), help="comma-separated backends")
+    ap.add_argument("--ticks", type=int, default=1000)
+    ap.add_argument("--path", default=PIN_PATH)
+    ap.add_argument("--json", action="store_true", help="emit JSON instead of a table")
+    args = ap.parse_args()
+
+    results = [bench_source(k, args.ticks, args.path) for k in args.sources.split(",")]
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{'SOURCE':<8} {'STARTUP_MS':>11} {'MEAN_US':>9} {'P50_US':>9} {'P99_US':>9}")
+    for r in results:
+        if "skipped" in r:
+            print(f"{r['source']:<8} skipped ({r['skipped']})")
+            continue
+        print(f"{r['source']:<8} {r['startup_ms']:>11} {r['tick_us_mean']:>9} "
+              f"{r['tick_us_p50']:>9} {r['tick_us_p99']:>9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""
+End-to-end dispatcher benchmark: run the synthetic loads of loadgen.py
+one after another under a live dispatcher and report, per load,
+
+    detect_ms      load start -> first tick classified as the expected load
+    switch_ms      that tick -> first tick with the expected scheduler running
+    accuracy       share of ticks after detection classified as expected
+    false_switches switches to a load that is neither the phase's load nor
+                   IDLE (while idle, anything but IDLE)
+
+plus the CPU time and peak RSS of the profiler and the dispatcher in
+each phase. Every load is followed by --settle idle seconds, which count
+towards the next phase only for false switches.
+
+    sudo ./start_c.sh -m profile all &
+    sudo python bench/dispatcher_bench.py --out bench.json
+    sudo python bench/dispatcher_bench.py --loads idle,cpu,net --seconds 20 --loop
+
+The dispatcher is started with a copy of --config that records a tick
+trace into a temporary directory (and serves no metrics); the report is
+computed from that trace once it exits. Needs root and a running
+profiler (/sys/fs/bpf/ba_bawm); it reports itself skipped otherwise.
+"""
+import argparse
+import json
+import os
+import platform
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+REPO = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, REPO)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from counter_source import PIN_PATH
+from loadgen import GENERATORS, Load, LoopDevice
+from system_load_enum import SystemLoad
+from tick_trace import SWITCHED, read_trace
+
+PROFILER_COMM = "ba_bawm_all"
+CLK_TCK = os.sysconf("SC_CLK_TCK")
+
+
+def _cpu_seconds(pid):
+    with open(f"/proc/{pid}/stat", "r") as f:
+        fields = f.read().rsplit(")", 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / CLK_TCK  # utime, stime
+
+
+def _rss_kb(pid):
+    with open(f"/proc/{pid}/status", "r") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1])
+    return 0
+
+
+def find_pids(comm):
+    pids = []
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/comm", "r") as f:
+                if f.read().strip() == comm:
+                    pids.append(int(entry))
+        except OSError:
+            pass
+    return pids
+
+
+class Usage:
+    """CPU time and peak RSS of a set of processes, sampled once a second between start() and stop()."""
+
+    def __init__(self, pids):
+        self.pids = pids
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample_rss(self):
+        for name, pids in self.pids.items():
+            for pid in pids:
+                try:
+                    self.peak[name] = max(self.peak[name], _rss_kb(pid))
+                except OSError:
+                    pass
+
+    def _cpu(self):
+        out = {}
+        for name, pids in self.pids.items():
+            total = 0.0
+            for pid in pids:
+                try:
+                    total += _cpu_seconds(pid)
+                except OSError:
+                    pass
+            out[name] = total
+        return out
+
+    def _run(self):
+        while not self._stop.wait(1.0):
+            self._sample_rss()
+
+    def start(self):
+        self.peak = {name: 0 for name in self.pids}
+        self._t0 = time.monotonic()
+        self._cpu0 = self._cpu()
+        self._sample_rss()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self._sample_rss()
+        elapsed = max(time.monotonic() - self._t0, 1e-6)
+        cpu1 = self._cpu()
+        return {name: {"cpu_pct": round(100 * (cpu1[name] - self._cpu0[name]) / elapsed, 2),
+                       "rss_kb_max": self.peak[name]} for name in self.pids}
+
+
+def run_phases(loads, seconds, settle, workers, io_path, usage):
+    """Runs each load, then settle idle seconds; returns [(kind, t0, t1, t_end, usage)]."""
+    phases = []
+    for kind in loads:
+        usage.start()
+        t0 = time.monotonic()
+        if kind == "idle":
+            time.sleep(seconds)
+        else:
+            with Load(kind, workers, io_path):
+                time.sleep(seconds)
+        t1 = time.monotonic()
+        used = usage.stop()
+        time.sleep(settle)
+        phases.append((kind, t0, t1, time.monotonic(), used))
+    return phases
+
+
+def analyse(phase, ticks):
+    kind, t0, t1, t_end, used = phase
+    expected = SystemLoad.IDLE if kind == "idle" else GENERATORS[kind]
+    during = [tk for tk in ticks if t0 <= tk.t <= t1]
+    after = [tk for tk in ticks if t1 < tk.t <= t_end]
+
+    detect = next((tk for tk in during if tk.decision == expected), None)
+    switched = None
+    if detect is not None:
+        switched = next((tk for tk in during + after
+                         if tk.t >= detect.t and tk.load == expected), None)
+
+    false = sum(1 for tk in during if tk.result == SWITCHED and tk.load != expected)
+    false += sum(1 for tk in after if tk.result == SWITCHED and tk.load not in (expected, SystemLoad.IDLE))
+
+    decisions = {}
+    for tk in during:
+        decisions[tk.decision.name] = decisions.get(tk.decision.name, 0) + 1
+    settled = [tk for tk in during if detect is not None and tk.t >= detect.t]
+
+    return {
+        "load": kind,
+        "expected": expected.name,
+        "seconds": round(t1 - t0, 3),
+        "ticks": len(during),
+        "detect_ms": round((detect.t - t0) * 1000, 1) if detect else None,
+        "switch_ms": round((switched.t - detect.t) * 1000, 1) if switched else None,
+        "accuracy": round(sum(tk.decision == expected for tk in settled) / len(settled), 3) if settled else 0.0,
+        "switches": sum(1 for tk in during + after if tk.result == SWITCHED),
+        "false_switches": false,
+        "decisions": decisions,
+        "usage": used,
+    }
+
+
+def bench(args):
+    if os.geteuid() != 0 or not os.path.exists(PIN_PATH):
+        return {"skipped": f"needs root and a running profiler ({PIN_PATH})"}
+    profilers = find_pids(PROFILER_COMM)
+
+    with open(os.path.join(REPO, args.config), "r", encoding="utf-8") as f:
+        cfg = json.load(f)
+    tmp = tempfile.mkdtemp(prefix="ba_bawm_bench.")
+    trace = os.path.join(tmp, "trace.bbtr")
+    cfg["RECORD_TRACE"] = trace
+    cfg.pop("metrics", None)
+    cfg_path = os.path.join(tmp, "dispatcher_bench.json")
+    with open(cfg_path, "w", encoding="utf-8") as f:
+        json.dump(cfg, f, indent=2)
+
+    loop = LoopDevice() if args.loop and "io" in args.loads else None
+    io_path = loop.dev if loop else args.io_path
+    with open(os.path.join(tmp, "dispatcher.err"), "wb") as err:
+        proc = subprocess.Popen([sys.executable, os.path.join(REPO, "dispatcher.py"), cfg_path],
+                                cwd=REPO, stdout=subprocess.DEVNULL, stderr=err)
+    try:
+        time.sleep(args.settle)
+        if proc.poll() is not None:
+            with open(err.name, "r", errors="replace") as f:
+                return {"skipped": f"dispatcher exited with {proc.returncode}: {f.read()[-500:]}"}
+        usage = Usage({"profiler": profilers, "dispatcher": [proc.pid]})
+        phases = run_phases(args.loads, args.seconds, args.settle, args.workers, io_path, usage)
+    finally:
+        if proc.poll() is None:
+            proc.send_signal(signal.SIGTERM)
+            proc.wait()
+        if loop is not None:
+            loop.close()
+
+    ticks = [tk for kind, tk in read_trace(trace) if kind == "tick"]
+    results = [analyse(p, ticks) for p in phases]
+    minutes = sum(p[3] - p[1] for p in phases) / 60
+    return {
+        "host": platform.node(),
+        "kernel": platform.release(),
+        "cpus": os.cpu_count(),
+        "config": args.config,
+        "seconds": args.seconds,
+        "settle": args.settle,
+        "workers": args.workers or os.cpu_count(),
+        "trace": trace,
+        "false_switches_per_min": round(sum(r["false_switches"] for r in results) / minutes, 3) if minutes else 0.0,
+        "phases": results,
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--config", default="dispatcher_config_main.json", help="relative to the repository")
+    ap.add_argument("--loads", default="idle," + ",".join(GENERATORS),
+                    type=lambda s: s.split(","), help="comma-separated, run in order")
+    ap.add_argument("--seconds", type=float, default=15.0, help="per load")
+    ap.add_argument("--settle", type=float, default=5.0, help="idle seconds after each load")
+    ap.add_argument("--workers", type=int, default=None, help="default: one per CPU")
+    ap.add_argument("--io-path", default=None, help="file or block device for io")
+    ap.add_argument("--loop", action="store_true", help="run io against a fresh loop device")
+    ap.add_argument("--out", default=None, help="write the JSON report here")
+    ap.add_argument("--json", action="store_true", help="emit JSON instead of a table")
+    args = ap.parse_args()
+    unknown = [k for k in args.loads if k != "idle" and k not in GENERATORS]
+    if unknown:
+        ap.error(f"unknown loads {unknown}")
+
+    report = bench(args)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    if "skipped" in report:
+        print(f"skipped ({report['skipped']})")
+        return
+
+    print(f"{'LOAD':<9} {'EXPECT':<9} {'DETECT_MS':>10} {'SWITCH_MS':>10} {'ACCURACY':>9} "
+          f"{'FALSE':>6} {'PROF_CPU%':>10} {'DISP_CPU%':>10} {'DISP_RSS_KB':>12}")
+    for r in report["phases"]:
+        u = r["usage"]
+        print(f"{r['load']:<9} {r['expected']:<9} {str(r['detect_ms']):>10} {str(r['switch_ms']):>10} "
+              f"{r['accuracy']:>9} {r['false_switches']:>6} {u['profiler']['cpu_pct']:>10} "
+              f"{u['dispatcher']['cpu_pct']:>10} {u['dispatcher']['rss_kb_max']:>12}")
+    print(f"false switches/min: {report['false_switches_per_min']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+Synthetic loads, one per SystemLoad, each aimed at the tracepoint its
+profiler counts. Everything stays on this machine and repeats exactly
+from run to run: fixed sizes, fixed seeds, no external benchmarks.
+
+    python bench/loadgen.py cpu --seconds 10
+    sudo python bench/loadgen.py io --seconds 10 --loop
+
+    cpu       pipe ping-pong between process pairs   (sched_switch)
+    parallel  4 spinning children per worker, reforked every 20 ms
+    mem       map, fill and unmap anonymous memory   (mm_page_alloc)
+    io        O_DIRECT writes and reads              (block_rq_issue)
+    net       loopback TCP echo                      (net_dev_queue)
+
+io needs a block device underneath: on a tmpfs-only machine pass --loop
+(root) to run it against a loop device backed by /dev/shm.
+"""
+import argparse
+import mmap
+import multiprocessing
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from system_load_enum import SystemLoad
+
+SPIN_S = 0.02
+MEM_CHUNK = 32 << 20
+IO_BLOCK = 4096
+IO_SPAN = 64 << 20
+NET_MSG = 64
+SEED = 1
+
+
+def _pingpong(rx, tx, first):
+    if first:
+        os.write(tx, b"x")
+    while True:
+        os.read(rx, 1)
+        os.write(tx, b"x")
+
+
+def _spin_slot():
+    while True:
+        pid = os.fork()
+        if pid == 0:
+            end = time.perf_counter() + SPIN_S
+            while time.perf_counter() < end:
+                pass
+            os._exit(0)
+        os.waitpid(pid, 0)
+
+
+def _page_churn():
+    fill = b"\x5a" * MEM_CHUNK
+    while True:
+        m = mmap.mmap(-1, MEM_CHUNK)
+        m.write(fill)
+        m.close()
+
+
+def _direct_io(path, seed):
+    flags = os.O_RDWR | getattr(os, "O_DIRECT", 0)
+    if not path.startswith("/dev/"):
+        flags |= os.O_CREAT
+    fd = os.open(path, flags, 0o600)
+    buf = mmap.mmap(-1, IO_BLOCK)  # page aligned, as O_DIRECT wants
+    buf.write(b"\xa5" * IO_BLOCK)
+    rng = random.Random(seed)
+    blocks = IO_SPAN // IO_BLOCK
+    try:
+        while True:
+            off = rng.randrange(blocks) * IO_BLOCK
+            os.pwritev(fd, [buf], off)
+            os.preadv(fd, [buf], off)
+            os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _echo_server(sock):
+    def serve(conn):
+        with conn:
+            while True:
+                data = conn.recv(NET_MSG)
+                if not data:
+                    return
+                conn.sendall(data)
+
+    while True:
+        conn, _ = sock.accept()
+        conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        threading.Thread(target=serve, args=(conn,), daemon=True).start()
+
+
+def _echo_client(addr):
+    msg = b"\x3c" * NET_MSG
+    with socket.create_connection(addr) as s:
+        s.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        while True:
+            s.sendall(msg)
+            got = 0
+            while got < NET_MSG:
+                got += len(s.recv(NET_MSG - got))
+
+
+class LoopDevice:
+    """A loop device over a file in /dev/shm, so tmpfs-only hosts still issue block requests."""
+
+    def __init__(self, size=IO_SPAN, directory="/dev/shm"):
+        fd, self.backing = tempfile.mkstemp(prefix="ba_bawm_loadgen.", dir=directory)
+        os.ftruncate(fd, size)
+        os.close(fd)
+        try:
+            self.dev = subprocess.run(["losetup", "--find", "--show", "--direct-io=on", self.backing],
+                                      check=True, capture_output=True, text=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            os.unlink(self.backing)
+            raise
+
+    def close(self):
+        subprocess.run(["losetup", "-d", self.dev], check=False)
+        os.unlink(self.backing)
+
+
+class Load:
+    """
+    One synthetic load, run by worker processes between start() and
+    stop(); also a context manager. io_path is the file or block device
+    the io load writes (default: a file in the current directory).
+    """
+
+    def __init__(self, kind, workers=None, io_path=None):
+        if kind not in GENERATORS:
+            raise ValueError(f"unknown load {kind!r}, expected one of {list(GENERATORS)}")
+        self.kind = kind
+        self.workers = workers or os.cpu_count()
+        self.io_path = io_path
+        self.expected = GENERATORS[kind]
+        self._ctx = multiprocessing.get_context("fork")
+        self._procs = []
+        self._remove = []
+
+    def _spawn(self, target, *args):
+        p = self._ctx.Process(target=target, args=args, daemon=True)
+        p.start()
+        self._procs.append(p)
+
+    def start(self):
+        n = self.workers
+        if self.kind == "cpu":
+            for _ in range(n):
+                a, b = os.pipe(), os.pipe()
+                self._spawn(_pingpong, a[0], b[1], True)
+                self._spawn(_pingpong, b[0], a[1], False)
+                for fd in a + b:
+                    os.close(fd)
+        elif self.kind == "parallel":
+            for _ in range(4 * n):
+                self._spawn(_spin_slot)
+        elif self.kind == "mem":
+            for _ in range(n):
+                self._spawn(_page_churn)
+        elif self.kind == "io":
+            path = self.io_path or os.path.abspath("ba_bawm_loadgen.io")
+            if not path.startswith("/dev/"):
+                self._remove.append(path)
+            for i in range(n):
+                self._spawn(_direct_io, path, SEED + i)
+        elif self.kind == "net":
+            srv = socket.create_server(("127.0.0.1", 0), backlog=n)
+            self._spawn(_echo_server, srv)
+            addr = srv.getsockname()
+            srv.close()
+            for _ in range(n):
+                self._spawn(_echo_client, addr)
+        return self
+
+    def stop(self):
+        for p in self._procs:
+            p.terminate()
+        for p in self._procs:
+            p.join()
+        self._procs = []
+        for path in self._remove:
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+        self._remove = []
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+# Load kind -> the classification it should produce.
+GENERATORS = {
+    "cpu": SystemLoad.CPU,
+    "parallel": SystemLoad.PARALLEL,
+    "mem": SystemLoad.MEM,
+    "io": SystemLoad.IO,
+    "net": SystemLoad.NET,
+}
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("kind", choices=list(GENERATORS))
+    ap.add_argument("--seconds", type=float, default=10.0)
+    ap.add_argument("--workers", type=int, default=None, help="default: one per CPU")
+    ap.add_argument("--io-path", default=None, help="file or block device for io")
+    ap.add_argument("--loop", action="store_true", help="run io against a fresh loop device (root)")
+    args = ap.parse_args()
+
+    loop = LoopDevice() if args.kind == "io" and args.loop else None
+    try:
+        with Load(args.kind, args.workers, loop.dev if loop else args.io_path):
+            time.sleep(args.seconds)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if loop is not None:
+            loop.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+import ctypes
+import errno
+import os
+import platform
+import struct
+import sys
+
+# Thin wrapper over the bpf(2) syscall so pinned maps can be read without
+# bcc/clang. Only the handful of commands the dispatcher needs are exposed.
+
+_NR_BPF = {
+    "x86_64": 321,
+    "aarch64": 280,
+    "riscv64": 280,
+    "ppc64le": 361,
+    "s390x": 351,
+}
+
+BPF_MAP_LOOKUP_ELEM = 1
+BPF_MAP_UPDATE_ELEM = 2
+BPF_MAP_DELETE_ELEM = 3
+BPF_MAP_GET_NEXT_KEY = 4
+BPF_OBJ_GET = 7
+BPF_OBJ_GET_INFO_BY_FD = 15
+BPF_MAP_LOOKUP_BATCH = 24
+BPF_MAP_LOOKUP_AND_DELETE_BATCH = 25
+
+BPF_ANY = 0
+
+BPF_MAP_TYPE_HASH = 1
+BPF_MAP_TYPE_ARRAY = 2
+BPF_MAP_TYPE_PERCPU_HASH = 5
+BPF_MAP_TYPE_PERCPU_ARRAY = 6
+BPF_MAP_TYPE_LRU_PERCPU_HASH = 10
+BPF_MAP_TYPE_RINGBUF = 27
+PERCPU_TYPES = (BPF_MAP_TYPE_PERCPU_HASH, BPF_MAP_TYPE_PERCPU_ARRAY, BPF_MAP_TYPE_LRU_PERCPU_HASH)
+
+# Errors that mean "this kernel/map does not support batch ops".
+_ENOTSUPP = 524
+BATCH_UNSUPPORTED = (errno.EINVAL, errno.ENOTSUP, errno.ENOSYS, _ENOTSUPP)
+
+_ATTR_SIZE = 128
+_libc = ctypes.CDLL(None, use_errno=True)
+_libc.syscall.restype = ctypes.c_long
+
+
+def _addr(buf):
+    return ctypes.addressof(buf) if buf is not None else 0
+
+
+def possible_cpus():
+    """Number of possible CPUs, which is how many slots a per-CPU value has."""
+    with open("/sys/devices/system/cpu/possible", "r", encoding="utf-8") as f:
+        spec = f.read().strip()
+    n = 0
+    for part in spec.split(","):
+        lo, _, hi = part.partition("-")
+        n = max(n, int(hi or lo) + 1)
+    return n
+
+
+def bpf(cmd, attr):
+    nr = _NR_BPF.get(platform.machine())
+    if nr is None:
+        raise OSError(errno.ENOSYS, f"bpf(2) syscall number unknown for {platform.machine()}")
+    ret = _libc.syscall(ctypes.c_long(nr), ctypes.c_int(cmd), attr, ctypes.c_uint(_ATTR_SIZE))
+    if ret < 0:
+        err = ctypes.get_errno()
+        raise OSError(err, os.strerror(err))
+    return ret
+
+
+class BpfMap:
+    """
+    A BPF map opened by fd; keys and values are raw bytes.
+    For per-CPU maps a value is the concatenation of every CPU's slot
+    (value_size rounded up to 8 bytes, possible_cpus() times).
+    """
+
+    def __init__(self, fd):
+        self.fd = fd
+        info = ctypes.create_string_buffer(80)
+        attr = ctypes.create_string_buffer(_ATTR_SIZE)
+        struct.pack_into("=IIQ", attr, 0, fd, len(info), _addr(info))
+        bpf(BPF_OBJ_GET_INFO_BY_FD, attr)
+        (self.map_type, self.map_id, self.key_size, self.value_size,
+         self.max_entries) = struct.unpack_from("=IIIII", info, 0)
+        self.percpu = self.map_type in PERCPU_TYPES
+        if self.percpu:
+            self.slot_size = (self.value_size + 7) & ~7
+            self.ncpus = possible_cpus()
+            self.value_stride = self.slot_size * self.ncpus
+        else:
+            self.slot_size = self.value_size
+            self.ncpus = 1
+            self.value_stride = self.value_size
+
+    @classmethod
+    def from_pinned(cls, path):
+        cpath = ctypes.create_string_buffer(os.fsencode(path))
+        attr = ctypes.create_string_buffer(_ATTR_SIZE)
+        struct.pack_into("=QII", attr, 0, _addr(cpath), 0, 0)
+        return cls(bpf(BPF_OBJ_GET, attr))
+
+    def close(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+    def _elem_attr(self, key, value, flags=0):
+        attr = ctypes.create_string_buffer(_ATTR_SIZE)
+        struct.pack_into("=IIQQQ", attr, 0, self.fd, 0, _addr(key), _addr(value), flags)
+        return attr
+
+    def lookup(self, key: bytes):
+        kbuf = ctypes.create_string_buffer(key, self.key_size)
+        vbuf = ctypes.create_string_buffer(self.value_stride)
+        try:
+            bpf(BPF_MAP_LOOKUP_ELEM, self._elem_attr(kbuf, vbuf))
+        except FileNotFoundError:
+            return None
+        return vbuf.raw
+
+    def update(self, key: bytes, value: bytes, flags=BPF_ANY):
+        kbuf = ctypes.create_string_buffer(key, self.key_size)
+        vbuf = ctypes.create_string_buffer(value, self.value_stride)
+        bpf(BPF_MAP_UPDATE_ELEM, self._elem_attr(kbuf, vbuf, flags))
+
+    def delete(self, key: bytes):
+        kbuf = ctypes.create_string_buffer(key, self.key_size)
+        try:
+            bpf(BPF_MAP_DELETE_ELEM, self._elem_attr(kbuf, None))
+        except FileNotFoundError:
+            pass
+
+    def keys(self):
+        out = []
+        cur = None
+        nxt = ctypes.create_string_buffer(self.key_size)
+        while True:
+            kbuf = ctypes.create_string_buffer(cur, self.key_size) if cur is not None else None
+            try:
+                bpf(BPF_MAP_GET_NEXT_KEY, self._elem_attr(kbuf, nxt))
+            except FileNotFoundError:
+                return out
+            cur = nxt.raw
+            out.append(cur)
+
+    def lookup_batch(self, delete=False):
+        """
+        Read every element with BPF_MAP_LOOKUP[_AND_DELETE]_BATCH.
+        With a buffer sized to max_entries this is normally one syscall.
+        Returns list of (key_bytes, value_bytes).
+        """
+        cap = self.max_entries
+        ks, vs = self.key_size, self.value_stride
+        keys = ctypes.create_string_buffer(ks * cap)
+        values = ctypes.create_string_buffer(vs * cap)
+        token_in = ctypes.create_string_buffer(max(ks, 8))
+        token_out = ctypes.create_string_buffer(max(ks, 8))
+        cmd = BPF_MAP_LOOKUP_AND_DELETE_BATCH if delete else BPF_MAP_LOOKUP_BATCH
+
+        out = []
+        first = True
+        while True:
+            attr = ctypes.create_string_buffer(_ATTR_SIZE)
+            struct.pack_into(
+                "=QQQQIIQQ", attr, 0,
+                0 if first else _addr(token_in), _addr(token_out),
+                _addr(keys), _addr(values), cap, self.fd, 0, 0,
+            )
+            done = False
+            try:
+                bpf(cmd, attr)
+            except FileNotFoundError:
+                done = True
+            count = struct.unpack_from("=I", attr, 32)[0]
+            kraw, vraw = keys.raw, values.raw
+            for i in range(count):
+                out.append((kraw[i * ks:(i + 1) * ks], vraw[i * vs:(i + 1) * vs]))
+            if done or count == 0:
+                return out
+            ctypes.memmove(token_in, token_out, len(token_out))
+            first = False
+
+    def slots(self, raw: bytes):
+        """Split a (per-CPU) value into its per-CPU slots."""
+        return [raw[i * self.slot_size:i * self.slot_size + self.value_size] for i in range(self.ncpus)]
+
+
+def u64(raw: bytes) -> int:
+    return int.from_bytes(raw[:8], sys.byteorder)
+
+
+def u64_bytes(val: int) -> bytes:
+    return val.to_bytes(8, sys.byteorder)
+
+
+def u32_bytes(val: int) -> bytes:
+    return val.to_bytes(4, sys.byteorder)
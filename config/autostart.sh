@@ -12,6 +12,15 @@ echo "======================================"
 echo "||      Dependencies Installed       ||"
 echo "======================================"
 
+# config/candidates/<vm>.json is written by harness.py and takes precedence.
+CANDIDATE="config/candidates/${VM_ID}.json"
+
+if [[ -f "$CANDIDATE" ]]; then
+  echo ">>> Starting profilers + dispatcher (${CANDIDATE}) on ${VM_ID}."
+  sudo ./start_c.sh -m both -v "$VM_ID" all "$CANDIDATE" &
+  exit 0
+fi
+
 case "$VM_ID" in
   vm1)
     echo ">>> Starting profilers only on vm1 (main config)."
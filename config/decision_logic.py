@@ -1,161 +1,484 @@
 #!/usr/bin/env python3
+import argparse
+import bisect
+import functools
 import json
+import math
 import os
 import sys
-import random
-from datetime import datetime, timedelta
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from scheduler_search import STRATEGIES, SearchStore, propose, record_round
 
 script_dir = os.path.dirname(os.path.abspath(__file__))
 root_dir = os.path.abspath(os.path.join(script_dir, ".."))
 
-vm1_test = os.path.join(script_dir, "tests", "vm1-test.txt")
-vm2_test = os.path.join(script_dir, "tests", "vm2-test.txt")
-vm2_detail = os.path.join(script_dir, "tests", "vm2-test_detail.txt")
+sys.path.insert(0, root_dir)
+from event_log import EventLog
+
+tests_dir = os.path.join(script_dir, "tests")
 results_log = os.path.join(script_dir, "tests", "results.log")
+# The same outcomes as records (event_log.py), for tools that would
+# otherwise parse results.log.
+results_events = os.path.join(script_dir, "tests", "results.jsonl")
+cache_path = os.path.join(script_dir, "tests", ".decision_cache.json")
 
 main_path = os.path.join(root_dir, "dispatcher_config_main.json")
 alt_path = os.path.join(root_dir, "dispatcher_config_alt.json")
 
-def parse_test_file(path):
+CACHE_VERSION = 2
+# Bytes at the start of a file remembered to notice it was rewritten.
+HEAD_BYTES = 64
+# Files with less new data than this are parsed inline; a process pool
+# only pays off for large backlogs (e.g. the first run over old logs).
+PARALLEL_MIN_BYTES = 4 << 20
+# Generations (one per truncation of a log) whose rows a file keeps in the cache.
+KEEP_GENERATIONS = 64
+
+
+def parse_test_line(line):
     """
-    Parse vmX-test.txt lines of the form:
+    Parse one vmX-test.txt line of the form:
     2025-11-20T01:23:45-06:00 iter=1 name=sysbench_cpu status=0 elapsed_ms=4213
-    Returns list of dicts with: name, iter, end_time, elapsed_ms, start_time.
+    Returns [name, iter, start, end, elapsed_ms, status] (times as epoch
+    seconds) or None.
     """
-    runs = []
-    if not os.path.exists(path):
-        return runs
-
-    with open(path, "r", encoding="utf-8", errors="ignore") as f:
-        for line in f:
-            line = line.strip()
-            if not line:
-                continue
-            parts = line.split()
-            if len(parts) < 2:
-                continue
-            ts_str = parts[0]
-            try:
-                end_time = datetime.fromisoformat(ts_str)
-            except Exception:
-                continue
+    parts = line.split()
+    if len(parts) < 2:
+        return None
+    try:
+        end_time = datetime.fromisoformat(parts[0]).timestamp()
+    except ValueError:
+        return None
+
+    kv = {}
+    for frag in parts[1:]:
+        if "=" in frag:
+            k, v = frag.split("=", 1)
+            kv[k] = v
+
+    try:
+        name = kv["name"]
+        elapsed_ms = int(kv.get("elapsed_ms", "0"))
+        iter_val = int(kv.get("iter", "0"))
+        status = int(kv.get("status", "0"))
+    except (KeyError, ValueError):
+        return None
+    return [name, iter_val, end_time - elapsed_ms / 1000.0, end_time, elapsed_ms, status]
+
+
+def parse_load_line(line):
+    """
+    Parse one vm2-test_detail.txt line. The dispatcher writes event_log.py
+    records; "load" ones mark a load change:
+    {"ts":1763601825.0,"event":"load","load":"CPU"}
+    Logs from older dispatchers have lines of the form:
+    [2025-11-20T01:23:45+00:00] load=CPU
+    Returns [timestamp, load_name] or None.
+    """
+    if line.startswith("{"):
+        try:
+            rec = json.loads(line)
+            if rec.get("event") != "load":
+                return None
+            return [float(rec["ts"]), str(rec["load"])]
+        except (ValueError, KeyError, TypeError, AttributeError):
+            return None
+    if not line.startswith("["):
+        return None
+    ts_part, _, rest = line.partition("]")
+    rest = rest.strip()
+    if not rest.startswith("load="):
+        return None
+    try:
+        ts = datetime.fromisoformat(ts_part[1:]).timestamp()
+    except ValueError:
+        return None
+    return [ts, rest.split("=", 1)[1].split()[0]]
+
+
+PARSERS = {"test": parse_test_line, "load": parse_load_line}
+
+
+def vm_files(vm):
+    """(vmX-test.txt, vmX-test_detail.txt) for a VM name."""
+    return (os.path.join(tests_dir, f"{vm}-test.txt"),
+            os.path.join(tests_dir, f"{vm}-test_detail.txt"))
+
+
+def _head(path):
+    with open(path, "rb") as f:
+        return f.read(HEAD_BYTES).hex()
+
+
+def parse_from(path, offset, kind):
+    """
+    Parse complete lines of path starting at byte offset. Returns
+    (rows, new_offset); a trailing line without a newline is left for the
+    next run, since the benchmark may still be writing it.
+    """
+    parse = PARSERS[kind]
+    rows = []
+    with open(path, "rb") as f:
+        f.seek(offset)
+        data = f.read()
+    end = data.rfind(b"\n") + 1
+    for raw in data[:end].decode("utf-8", errors="ignore").splitlines():
+        line = raw.strip()
+        if not line:
+            continue
+        row = parse(line)
+        if row is not None:
+            rows.append(row)
+    return rows, offset + end
 
-            kv = {}
-            for frag in parts[1:]:
-                if "=" in frag:
-                    k, v = frag.split("=", 1)
-                    kv[k] = v
 
-            try:
-                name = kv["name"]
-                elapsed_ms = int(kv.get("elapsed_ms", "0"))
-            except KeyError:
-                continue
+def load_cache(enabled=True):
+    if enabled:
+        try:
+            with open(cache_path, "r", encoding="utf-8") as f:
+                cache = json.load(f)
+            if cache.get("version") == CACHE_VERSION:
+                return cache
+        except (OSError, ValueError):
+            pass
+    return {"version": CACHE_VERSION, "files": {}, "epochs": {}}
 
-            iter_val = int(kv.get("iter", "0"))
-            start_time = end_time - timedelta(milliseconds=elapsed_ms)
 
-            runs.append({
-                "name": name,
-                "iter": iter_val,
-                "end_time": end_time,
-                "start_time": start_time,
-                "elapsed_ms": elapsed_ms,
-            })
-    return runs
+def save_cache(cache):
+    tmp = cache_path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(cache, f, separators=(",", ":"))
+    os.replace(tmp, cache_path)
 
-def compute_averages(runs):
+
+def refresh(cache, sources):
     """
-    Given list of runs, compute average elapsed_ms per benchmark name.
-    Returns dict: name -> avg_ms.
+    Bring the cached rows for each (path, kind) up to date, resuming from
+    the last parsed byte offset. run_tests.sh truncates its logs every
+    loop, so a file that shrank, was replaced or whose first bytes changed
+    is parsed again from the start and its rows are added to the ones
+    already cached as a new generation; only the last KEEP_GENERATIONS
+    are kept. Returns {path: rows}.
     """
-    sums = {}
-    counts = {}
-    for r in runs:
-        n = r["name"]
-        sums[n] = sums.get(n, 0) + r["elapsed_ms"]
-        counts[n] = counts.get(n, 0) + 1
-
-    avgs = {}
-    for n in sums:
-        if counts[n] > 0:
-            avgs[n] = sums[n] / counts[n]
-    return avgs
-
-def parse_vm2_load_events(path):
+    jobs = []
+    for path, kind in sources:
+        entry = cache["files"].get(path)
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            continue
+        if entry is None:
+            entry = {"ino": st.st_ino, "offset": 0, "head": "", "rows": [], "gens": [0]}
+            cache["files"][path] = entry
+        elif (entry["ino"] != st.st_ino or st.st_size < entry["offset"]
+              or (entry["offset"] and _head(path) != entry["head"])):
+            entry.update(ino=st.st_ino, offset=0, head="")
+            gens = entry.setdefault("gens", [0])
+            if gens[-1] < len(entry["rows"]):
+                gens.append(len(entry["rows"]))
+            drop_generations(entry, len(gens) - KEEP_GENERATIONS)
+        if st.st_size > entry["offset"]:
+            jobs.append((path, kind, entry, st.st_size - entry["offset"]))
+
+    big = [j for j in jobs if j[3] >= PARALLEL_MIN_BYTES]
+    if len(big) > 1:
+        with ProcessPoolExecutor(max_workers=len(big)) as pool:
+            futures = {j[0]: pool.submit(parse_from, j[0], j[2]["offset"], j[1]) for j in big}
+            results = {path: fut.result() for path, fut in futures.items()}
+    else:
+        results = {}
+    for path, kind, entry, _ in jobs:
+        rows, offset = results.get(path) or parse_from(path, entry["offset"], kind)
+        entry["rows"].extend(rows)
+        entry["offset"] = offset
+        if not entry["head"]:
+            entry["head"] = _head(path)
+
+    return {path: cache["files"][path]["rows"] for path, _ in sources if path in cache["files"]}
+
+
+def drop_generations(entry, n):
+    """Drop a cache entry's n oldest generations of rows; the current one always stays."""
+    gens = entry.setdefault("gens", [0])
+    n = min(n, len(gens) - 1)
+    if n <= 0:
+        return
+    cut = gens[n]
+    del entry["rows"][:cut]
+    entry["gens"] = [g - cut for g in gens[n:]]
+
+
+def drop_before(entry, ts, at):
+    """Drop leading generations of a cache entry whose rows all have at(row) < ts."""
+    gens = entry.setdefault("gens", [0])
+    n = 0
+    while n + 1 < len(gens) and all(at(r) < ts for r in entry["rows"][gens[n]:gens[n + 1]]):
+        n += 1
+    drop_generations(entry, n)
+
+
+class LoadIndex:
+    """Sorted load-switch events; which loads were active over [start, end]."""
+
+    def __init__(self, events):
+        events = sorted(events)
+        self.times = [ts for ts, _ in events]
+        self.loads = [name for _, name in events]
+
+    def active(self, start, end):
+        # The load in effect at start (last switch before it) plus every switch during the run.
+        lo = max(bisect.bisect_right(self.times, start) - 1, 0)
+        hi = bisect.bisect_right(self.times, end)
+        return set(self.loads[lo:hi])
+
+
+def sched_at(epochs, ts, key):
+    """Which scheduler ran key at time ts, given a VM's [[since, scheds], ...]."""
+    i = bisect.bisect_right([since for since, _ in epochs], ts) - 1
+    return epochs[max(i, 0)][1].get(key) if epochs else None
+
+
+def median(xs):
+    s = sorted(xs)
+    n = len(s)
+    if n == 0:
+        return float("nan")
+    mid = n // 2
+    return s[mid] if n % 2 else (s[mid - 1] + s[mid]) / 2
+
+
+def median_ci(xs, z=1.96):
+    """Distribution-free ~95% CI for the median from order statistics."""
+    s = sorted(xs)
+    n = len(s)
+    if n == 0:
+        return float("nan"), float("nan")
+    half = z * math.sqrt(n) / 2
+    lo = max(int(math.floor(n / 2 - half)), 0)
+    hi = min(int(math.ceil(n / 2 + half)), n - 1)
+    return s[lo], s[hi]
+
+
+def _exact_u_cdf(u, n1, n2):
+    """P(U <= u) for untied samples of sizes n1, n2."""
+    @functools.lru_cache(maxsize=None)
+    def arrangements(a, b, k):
+        # Orderings of a x's and b y's with exactly k (x > y) pairs: the
+        # largest element is either an x (beating all b y's) or a y.
+        if k < 0:
+            return 0
+        if a == 0 or b == 0:
+            return 1 if k == 0 else 0
+        return arrangements(a - 1, b, k - b) + arrangements(a, b - 1, k)
+
+    total = math.comb(n1 + n2, n1)
+    return sum(arrangements(n1, n2, k) for k in range(int(u) + 1)) / total
+
+
+def mann_whitney_less(x, y):
     """
-    Parse vm2-test_detail.txt lines of the form:
-    [2025-11-20T01:23:45+00:00] load=CPU
-    Returns list of (timestamp, load_name).
+    One-sided Mann-Whitney U test that x tends to be smaller than y.
+    Returns (U, p). Exact for small untied samples, otherwise the normal
+    approximation with tie and continuity correction.
     """
-    events = []
-    if not os.path.exists(path):
-        return events
-
-    with open(path, "r", encoding="utf-8", errors="ignore") as f:
-        for line in f:
-            line = line.strip()
-            if not line:
-                continue
-            if not line.startswith("["):
-                continue
-            try:
-                ts_part, rest = line.split("]", 1)
-                ts_str = ts_part[1:]
-                rest = rest.strip()
-                if not rest.startswith("load="):
-                    continue
-                load_name = rest.split("=", 1)[1]
-                ts = datetime.fromisoformat(ts_str)
-                events.append((ts, load_name))
-            except Exception:
-                continue
-    return events
-
-def main():
-    vm1_runs = parse_test_file(vm1_test)
-    vm2_runs = parse_test_file(vm2_test)
-
-    if not vm1_runs or not vm2_runs:
-        print("[decision] No runs found in vm1/vm2 test files; exiting.")
-        return
-
-    vm1_avg = compute_averages(vm1_runs)
-    vm2_avg = compute_averages(vm2_runs)
+    n1, n2 = len(x), len(y)
+    if n1 == 0 or n2 == 0:
+        return float("nan"), 1.0
+    pooled = sorted([(v, 0) for v in x] + [(v, 1) for v in y])
+    ranks = [0.0] * len(pooled)
+    ties = 0.0
+    i = 0
+    while i < len(pooled):
+        j = i
+        while j + 1 < len(pooled) and pooled[j + 1][0] == pooled[i][0]:
+            j += 1
+        for k in range(i, j + 1):
+            ranks[k] = (i + j) / 2 + 1
+        t = j - i + 1
+        ties += t ** 3 - t
+        i = j + 1
+    r1 = sum(r for r, (_, g) in zip(ranks, pooled) if g == 0)
+    u = r1 - n1 * (n1 + 1) / 2
+
+    if ties == 0 and n1 + n2 <= 20:
+        return u, _exact_u_cdf(u, n1, n2)
+    n = n1 + n2
+    mu = n1 * n2 / 2
+    sigma = math.sqrt(n1 * n2 / 12 * ((n + 1) - ties / (n * (n - 1))))
+    if sigma == 0:
+        return u, 1.0
+    z = (u - mu + 0.5) / sigma
+    return u, 0.5 * math.erfc(-z / math.sqrt(2))
+
+
+def compare(vm1_ms, vm2_ms):
+    lo1, hi1 = median_ci(vm1_ms)
+    lo2, hi2 = median_ci(vm2_ms)
+    _, p = mann_whitney_less(vm2_ms, vm1_ms)
+    return {
+        "n1": len(vm1_ms), "median1": median(vm1_ms), "ci1": (lo1, hi1),
+        "n2": len(vm2_ms), "median2": median(vm2_ms), "ci2": (lo2, hi2),
+        "p": p,
+    }
+
+
+def evaluate(cache, control, candidates, alpha, search, ts_summary, log=None):
+    """
+    Compare every candidate VM against the control in one pass.
+
+    Candidate runs are grouped per (benchmark, load key, scheduler that ran
+    that key on that VM) and tested against the control's runs of the same
+    benchmark since the control config last changed. Every group feeds the
+    search store, and a "compare" record to log when given. Returns
+    (lines, winners, better) where winners maps a load key to
+    (sched, p, vm) and better maps a VM to its winning benchmarks, or None
+    if there was nothing to compare.
+    """
+    sources = [(vm_files(control)[0], "test")]
+    for vm in candidates:
+        test, detail = vm_files(vm)
+        sources += [(test, "test"), (detail, "load")]
+    parsed = refresh(cache, sources)
+
+    control_since = cache["epochs"][control][-1][0]
+    if vm_files(control)[0] in cache["files"]:
+        # Control runs from before its config last changed are never compared again.
+        drop_before(cache["files"][vm_files(control)[0]], control_since, lambda r: r[2])
+    control_by_name = {}
+    for r in parsed.get(vm_files(control)[0], []):
+        if r[5] == 0 and r[2] >= control_since:
+            control_by_name.setdefault(r[0], []).append(r[4])
+
+    if not control_by_name:
+        print(f"[decision] No runs found in {control} test file; exiting.")
+        return None
 
-    vm2_better = []
-    for name, avg2 in vm2_avg.items():
-        avg1 = vm1_avg.get(name)
-        if avg1 is None:
+    lines = []
+    winners = {}
+    better = {}
+    evaluated = 0
+
+    for vm in candidates:
+        test, detail = vm_files(vm)
+        runs = [r for r in parsed.get(test, []) if r[5] == 0]
+        if not runs:
+            print(f"[decision] No runs found in {vm} test file; skipping.")
             continue
-        if avg2 < avg1:
-            vm2_better.append(name)
+        index = LoadIndex(parsed.get(detail, []))
+        if not index.times:
+            print(f"[decision] No load-change events in {vm}-test_detail; cannot infer workloads.")
+            continue
+        evaluated += 1
 
-    if not vm2_better:
-        print("[decision] No benchmarks where vm2 is faster than vm1; no config changes.")
-        return
+        epochs = cache["epochs"][vm]
+        groups = {}
+        for name, _, start, end, elapsed_ms, _ in runs:
+            if name not in control_by_name:
+                continue
+            for key in index.active(start, end):
+                sched = sched_at(epochs, start, key)
+                groups.setdefault((name, key, sched), []).append(elapsed_ms)
+
+        for (name, key, sched), vm_ms in sorted(groups.items(), key=lambda kv: tuple(map(str, kv[0]))):
+            st = compare(control_by_name[name], vm_ms)
+            won = st["median2"] < st["median1"] and st["p"] <= alpha
+            lines.append(
+                f"[{ts_summary}] [decision] {name} {key} {sched}: "
+                f"{control} n={st['n1']} median={st['median1']:.0f} [{st['ci1'][0]:.0f}, {st['ci1'][1]:.0f}] "
+                f"{vm} n={st['n2']} median={st['median2']:.0f} [{st['ci2'][0]:.0f}, {st['ci2'][1]:.0f}] "
+                f"p={st['p']:.4f}{' *' if won else ''}"
+            )
+            if log is not None:
+                log.write("compare", control=control, vm=vm, bench=name, load=key, sched=sched, won=won, **st)
+            if sched is not None:
+                search.observe(key, sched, name, st)
+            if won and sched is not None:
+                better.setdefault(vm, set()).add(name)
+                # Several winning schedulers for one key: keep the strongest evidence.
+                if key not in winners or st["p"] < winners[key][1]:
+                    winners[key] = (sched, st["p"], vm)
+    if not evaluated:
+        return None
+    return lines, winners, better
+
+
+def ensure_epochs(cache, vm, scheds):
+    """A VM seen for the first time: everything so far ran under its current config."""
+    epochs = cache["epochs"].setdefault(vm, [])
+    if not epochs:
+        epochs.append([0.0, dict(scheds)])
+    return epochs
+
+
+def promote(winners, ms):
+    """Move winning schedulers into the main sched map; returns the changed keys."""
+    changed = []
+    for k in sorted(winners):
+        sched = winners[k][0]
+        if k in ms and ms[k] != sched:
+            ms[k] = sched
+            changed.append(k)
+    return changed
+
+
+def next_candidates(search, ms, cand_scheds, strategy):
+    """
+    Re-point each candidate sched map at the search's next proposal, one
+    distinct proposal per candidate. Returns a list of [(key, old, new)]
+    per candidate.
+    """
+    proposals, ranking = propose(search, ms, len(cand_scheds), strategy=strategy)
+    changes = []
+    for scheds, proposal in zip(cand_scheds, proposals):
+        diff = []
+        for k, new_val in sorted(proposal.items()):
+            if k in scheds and scheds[k] != new_val:
+                diff.append((k, scheds[k], new_val))
+                scheds[k] = new_val
+        changes.append(diff)
+    record_round(search, ranking, strategy)
+    return changes
+
+
+def log_decisions(log, winners, changed_main, ms, candidate_changes, strategy):
+    """Records for what summary_lines() and the candidate lines report: promotions and new candidates."""
+    for k in changed_main:
+        sched, p, vm = winners[k]
+        log.write("promote", load=k, sched=ms[k], p=p, vm=vm)
+    for vm, diff in candidate_changes:
+        for rk, old_val, new_val in diff:
+            log.write("candidate", vm=vm, load=rk, old=old_val, new=new_val, strategy=strategy)
+
+
+def summary_lines(ts_summary, alpha, winners, better, changed_main):
+    lines = []
+    if winners:
+        for vm in sorted(better):
+            lines.append(f"[{ts_summary}] [decision] {vm}-better benchmarks: {', '.join(sorted(better[vm]))}")
+        lines.append(f"[{ts_summary}] [decision] workload keys considered: {', '.join(sorted(winners))}")
+    else:
+        print("[decision] No benchmark/load where a candidate is significantly faster than the control.")
+        lines.append(f"[{ts_summary}] [decision] No significant candidate wins (alpha={alpha}).")
 
-    
-    events = parse_vm2_load_events(vm2_detail)
-    if not events:
-        print("[decision] No load-change events in vm2-test_detail; cannot infer workloads.")
-        return
+    if changed_main:
+        lines.append(f"[{ts_summary}] [decision] Updated main scheds for keys: {', '.join(changed_main)}")
+    else:
+        lines.append(f"[{ts_summary}] [decision] No changes made to main scheds.")
+    return lines
 
 
-    work_keys = set()
+def main():
+    ap = argparse.ArgumentParser(description="Promote alt schedulers that beat main on vm2.")
+    ap.add_argument("--alpha", type=float, default=0.05,
+                    help="significance level for vm2 < vm1 (default: 0.05; 1 = any lower median)")
+    ap.add_argument("--no-cache", action="store_true", help="ignore the parse cache and start over")
+    ap.add_argument("--strategy", choices=STRATEGIES, default="ei",
+                    help="how the next alt candidate is chosen (default: expected improvement)")
+    args = ap.parse_args()
 
-    for r in vm2_runs:
-        if r["name"] not in vm2_better:
-            continue
-        start_t = r["start_time"]
-        end_t = r["end_time"]
-        for ts, load_name in events:
-            if start_t <= ts <= end_t:
-                work_keys.add(load_name)
-
-    if not work_keys:
-        print("[decision] No load keys found within vm2-better run intervals; nothing to sync.")
-        return
+    cache = load_cache(not args.no_cache)
 
     # Load configs
     with open(main_path, "r", encoding="utf-8") as f:
@@ -165,66 +488,61 @@ def main():
 
     ms = main_cfg.get("scheds", {})
     asched = alt_cfg.get("scheds", {})
+    ensure_epochs(cache, "vm1", ms)
+    ensure_epochs(cache, "vm2", asched)
 
-    changed_main = []
-    for k in sorted(work_keys):
-        if k in ms and k in asched and ms[k] != asched[k]:
-            ms[k] = asched[k]
-            changed_main.append(k)
-
-    main_changed = False
-    if changed_main:
-        with open(main_path, "w", encoding="utf-8") as f:
-            json.dump(main_cfg, f, indent=2)
-        main_changed = True
-
-    # Randomly mutate
-    alt_changed = False
-    alt_change_desc = None
-    choices = [
-        "build/scheds/c/scx_simple",
-        "target/release/scx_bpfland",
-        "build/scheds/c/scx_central",
-        "build/scheds/c/scx_prev",
-        "target/release/scx_flash",
-        "target/release/scx_beerland",
-        "target/release/scx_layered",
-        "target/release/scx_lavd",
-        "target/release/scx_cosmos",
-        "build/scheds/c/scx_nest",
-    ]
-    if asched:
-        rk = random.choice(list(asched.keys()))
-        old_val = asched[rk]
-        new_val = random.choice(choices)
-        asched[rk] = new_val
-        with open(alt_path, "w", encoding="utf-8") as f:
-            json.dump(alt_cfg, f, indent=2)
-        alt_changed = True
-        alt_change_desc = (rk, old_val, new_val)
-
+    search = SearchStore()
+    search.set_control(ms)
     ts_summary = datetime.now().isoformat()
-    lines = []
-    lines.append(f"[{ts_summary}] [decision] vm2-better benchmarks: {', '.join(sorted(vm2_better))}")
-    lines.append(f"[{ts_summary}] [decision] workload keys considered: {', '.join(sorted(work_keys))}")
-
-    if main_changed:
-        lines.append(f"[{ts_summary}] [decision] Updated main scheds for keys: {', '.join(changed_main)}")
-    else:
-        lines.append(f"[{ts_summary}] [decision] No changes made to main scheds.")
-
-    if alt_changed and alt_change_desc is not None:
-        rk, old_val, new_val = alt_change_desc
-        lines.append(
-            f"[{ts_summary}] [decision] Alt sched randomized for key '{rk}': '{old_val}' -> '{new_val}'"
-        )
-    else:
-        lines.append(f"[{ts_summary}] [decision] No changes made to alt scheds.")
-
-    lines.append("")
+    log = EventLog(results_events)
+    try:
+        result = evaluate(cache, "vm1", ["vm2"], args.alpha, search, ts_summary, log)
+        if result is None:
+            save_cache(cache)
+            return
+        lines, winners, better = result
+
+        changed_main = promote(winners, ms)
+        if changed_main:
+            with open(main_path, "w", encoding="utf-8") as f:
+                json.dump(main_cfg, f, indent=2)
+            # Control runs from now on are the ones the candidates are compared with.
+            cache["epochs"]["vm1"].append([datetime.now().timestamp(), dict(ms)])
+            # Speed-ups so far were measured against the old main config.
+            search.set_control(ms)
+
+        # Next alt candidate: per load, the scheduler the search expects to gain the most.
+        alt_changes = []
+        if asched:
+            alt_changes = next_candidates(search, ms, [asched], args.strategy)[0]
+            if alt_changes:
+                with open(alt_path, "w", encoding="utf-8") as f:
+                    json.dump(alt_cfg, f, indent=2)
+                # Runs from now on are attributed to the new alt mapping.
+                cache["epochs"]["vm2"].append([datetime.now().timestamp(), dict(asched)])
+        search.save()
+        log_decisions(log, winners, changed_main, ms, [("vm2", alt_changes)], args.strategy)
+
+        lines += summary_lines(ts_summary, args.alpha, winners, better, changed_main)
+        if alt_changes:
+            for rk, old_val, new_val in alt_changes:
+                lines.append(
+                    f"[{ts_summary}] [decision] Alt sched ({args.strategy}) for key '{rk}': '{old_val}' -> '{new_val}'"
+                )
+            if search.history:
+                lines.append(f"[{ts_summary}] [decision] Search round {search.history[-1]['round']}: "
+                             f"max EI {search.history[-1]['max_ei']:.5f}")
+        else:
+            lines.append(f"[{ts_summary}] [decision] No changes made to alt scheds.")
+
+        lines.append("")
+
+        with open(results_log, "a", encoding="utf-8") as f:
+            f.write("\n".join(lines))
+        save_cache(cache)
+    finally:
+        log.close()
 
-    with open(results_log, "a", encoding="utf-8") as f:
-        f.write("\n".join(lines))
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+"""
+N-way A/B tuning rounds over the VM inventory (see vmpool.py).
+
+The control VM runs dispatcher_config_main.json; every candidate VM runs
+its own config/candidates/<vm>.json, each a distinct proposal from the
+scheduler search. A round runs the benchmarks on all VMs at once, collects
+the results and evaluates every candidate against the control in one
+pass: winners are promoted into main and each candidate gets the next
+proposal. Dispatchers pick the new configs up on their next reload, so a
+round costs the same wall-clock time for one candidate or eight.
+
+    ./launch_2vms.sh -n 4
+    ./harness.py --vms 4 --start --rounds 3
+"""
+import argparse
+import asyncio
+import json
+import os
+import shlex
+import sys
+import time
+from datetime import datetime
+
+from decision_logic import (
+    ensure_epochs, evaluate, load_cache, log_decisions, main_path, next_candidates, promote, results_events,
+    results_log, save_cache, summary_lines, vm_files,
+)
+from event_log import EventLog  # decision_logic puts the repository root on sys.path
+from scheduler_search import STRATEGIES, SearchStore, propose
+from vmpool import SSHPool, inventory_path, load_inventory
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+candidates_dir = os.path.join(script_dir, "candidates")
+
+
+def candidate_path(vm):
+    return os.path.join(candidates_dir, f"{vm}.json")
+
+
+def write_json(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2)
+    # The dispatcher reloads on mtime; never let it see half a file.
+    os.replace(tmp, path)
+
+
+def candidate_config(main_cfg, scheds):
+    cfg = dict(main_cfg)
+    cfg["scheds"] = dict(scheds)
+    return cfg
+
+
+def remote(vm, *parts):
+    return "/".join([vm.root.rstrip("/"), *parts])
+
+
+class Harness:
+    def __init__(self, pool, vms, args):
+        self.pool = pool
+        self.args = args
+        self.control = next(vm for vm in vms if vm.role == "control")
+        self.candidates = [vm for vm in vms if vm.role != "control"]
+        self.cache = load_cache(not args.no_cache)
+        self.search = SearchStore()
+        self.events = EventLog(results_events)
+        with open(main_path, "r", encoding="utf-8") as f:
+            self.main_cfg = json.load(f)
+        self.scheds = {}
+
+    def log(self, msg):
+        print(f"[harness] {msg}", flush=True)
+
+    # ---- configs ----
+
+    def load_candidates(self):
+        """Current sched map per candidate; VMs without one get a fresh proposal."""
+        ms = self.main_cfg["scheds"]
+        self.search.set_control(ms)
+        missing = []
+        for vm in self.candidates:
+            try:
+                with open(candidate_path(vm.name), "r", encoding="utf-8") as f:
+                    self.scheds[vm.name] = json.load(f)["scheds"]
+            except (OSError, ValueError, KeyError):
+                missing.append(vm.name)
+        if missing:
+            proposals, _ = propose(self.search, ms, len(missing), strategy=self.args.strategy)
+            for name, scheds in zip(missing, proposals):
+                self.scheds[name] = scheds
+                write_json(candidate_path(name), candidate_config(self.main_cfg, scheds))
+                self.cache["epochs"].pop(name, None)
+        ensure_epochs(self.cache, self.control.name, ms)
+        for vm in self.candidates:
+            ensure_epochs(self.cache, vm.name, self.scheds[vm.name])
+
+    async def push_configs(self):
+        """Copy configs to VMs that do not share this checkout."""
+        jobs = []
+        for vm in [self.control] + self.candidates:
+            if vm.shared:
+                continue
+            if vm is self.control:
+                local, dest = main_path, remote(vm, "dispatcher_config_main.json")
+            else:
+                local, dest = candidate_path(vm.name), remote(vm, "config", "candidates", f"{vm.name}.json")
+            with open(local, "rb") as f:
+                data = f.read()
+            cmd = f"mkdir -p {shlex.quote(os.path.dirname(dest))} && cat > {shlex.quote(dest)}.tmp " \
+                  f"&& mv {shlex.quote(dest)}.tmp {shlex.quote(dest)}"
+            jobs.append(self.pool.run(vm.name, cmd, input=data, timeout=60))
+        for res in await asyncio.gather(*jobs):
+            if res.rc != 0:
+                self.log(f"{res.vm}: config push failed: {res.stderr.strip()}")
+
+    # ---- runs ----
+
+    async def start(self):
+        vms = [self.control] + self.candidates
+        self.log(f"starting profilers + dispatchers on {len(vms)} VMs")
+        await asyncio.gather(*(
+            self.pool.run(vm.name, f"nohup {remote(vm, 'config', 'autostart.sh')} >/dev/null 2>&1 &", timeout=60)
+            for vm in vms))
+        self.log(f"waiting {self.args.settle}s for profilers + dispatchers to stabilize")
+        await asyncio.sleep(self.args.settle)
+
+    async def run_benchmarks(self):
+        vms = [self.control] + self.candidates
+        results = await asyncio.gather(*(
+            self.pool.run(vm.name, f"sudo {remote(vm, 'config', 'tests', 'run_tests.sh')} --runs={self.args.runs}",
+                          timeout=self.args.timeout)
+            for vm in vms))
+        for res in results:
+            status = "timed out" if res.rc is None else f"rc={res.rc}"
+            self.log(f"{res.vm}: benchmarks {status} in {res.elapsed:.0f}s")
+        return results
+
+    async def collect(self):
+        """Fetch result logs from VMs that do not share this checkout."""
+        jobs = []
+        for vm in [self.control] + self.candidates:
+            if vm.shared:
+                continue
+            for path in vm_files(vm.name):
+                src = remote(vm, "config", "tests", os.path.basename(path))
+                jobs.append((path, self.pool.pull_file(vm.name, src, path, timeout=300)))
+        results = await asyncio.gather(*(job for _, job in jobs))
+        for (path, _), res in zip(jobs, results):
+            if res.rc != 0:
+                self.log(f"{res.vm}: could not fetch {os.path.basename(path)}: {res.stderr.strip()}")
+
+    # ---- evaluation ----
+
+    def decide(self, round_no, bench_s):
+        ts_summary = datetime.now().isoformat()
+        control = self.control.name
+        names = [vm.name for vm in self.candidates]
+        result = evaluate(self.cache, control, names, self.args.alpha, self.search, ts_summary, self.events)
+        if result is None:
+            save_cache(self.cache)
+            return
+        lines, winners, better = result
+
+        ms = self.main_cfg["scheds"]
+        changed_main = promote(winners, ms)
+        now = datetime.now().timestamp()
+        if changed_main:
+            write_json(main_path, self.main_cfg)
+            self.cache["epochs"][control].append([now, dict(ms)])
+            self.search.set_control(ms)
+
+        cand_scheds = [self.scheds[n] for n in names]
+        changes = next_candidates(self.search, ms, cand_scheds, self.args.strategy)
+        for name, diff in zip(names, changes):
+            # Shared keys (scoring, hysteresis, ...) follow main even when the mapping does not change.
+            write_json(candidate_path(name), candidate_config(self.main_cfg, self.scheds[name]))
+            if diff:
+                self.cache["epochs"][name].append([now, dict(self.scheds[name])])
+        self.search.save()
+        log_decisions(self.events, winners, changed_main, ms, list(zip(names, changes)), self.args.strategy)
+
+        lines += summary_lines(ts_summary, self.args.alpha, winners, better, changed_main)
+        for name, diff in zip(names, changes):
+            for rk, old_val, new_val in diff:
+                lines.append(f"[{ts_summary}] [decision] {name} sched ({self.args.strategy}) "
+                             f"for key '{rk}': '{old_val}' -> '{new_val}'")
+        h = self.search.history[-1]
+        self.events.write("round", round=round_no, candidates=names, bench_s=round(bench_s, 1),
+                          search_round=h["round"], max_ei=h["max_ei"])
+        lines.append(f"[{ts_summary}] [harness] round {round_no}: {len(names)} candidates, "
+                     f"benchmarks {bench_s:.0f}s, search round {h['round']} max EI {h['max_ei']:.5f}")
+        lines.append("")
+        with open(results_log, "a", encoding="utf-8") as f:
+            f.write("\n".join(lines))
+        save_cache(self.cache)
+
+        for k in changed_main:
+            self.log(f"promoted {k} -> {ms[k]} ({winners[k][2]}, p={winners[k][1]:.4f})")
+        self.log(f"round {round_no}: {sum(map(len, changes))} candidate mapping changes, max EI {h['max_ei']:.5f}")
+
+    async def run(self):
+        self.load_candidates()
+        save_cache(self.cache)
+        self.log(f"control {self.control.name}, candidates {', '.join(vm.name for vm in self.candidates)}")
+        await self.push_configs()
+        if self.args.start:
+            await self.start()
+        for round_no in range(1, self.args.rounds + 1):
+            self.log(f"round {round_no}/{self.args.rounds}: running benchmarks")
+            started = time.monotonic()
+            await self.run_benchmarks()
+            await self.collect()
+            self.decide(round_no, time.monotonic() - started)
+            await self.push_configs()
+
+
+async def amain(args):
+    user, key, vms = load_inventory(args.inventory, args.vms)
+    if len(vms) < 2:
+        raise ValueError("need a control and at least one candidate VM")
+    pool = SSHPool(vms, user, key, concurrency=args.concurrency)
+    harness = Harness(pool, vms, args)
+    try:
+        await harness.run()
+    finally:
+        harness.events.close()
+        await pool.close()
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--inventory", default=inventory_path, help="VM inventory (default: config/vms.json)")
+    ap.add_argument("--vms", type=int, help="ignore the inventory and use vm1..vmN on ports 2221..")
+    ap.add_argument("--rounds", type=int, default=1)
+    ap.add_argument("--runs", type=int, default=5, help="runs per benchmark per round (run_tests.sh --runs)")
+    ap.add_argument("--start", action="store_true", help="launch autostart.sh on every VM first")
+    ap.add_argument("--settle", type=float, default=20.0, help="seconds to wait after --start")
+    ap.add_argument("--timeout", type=float, help="per-VM benchmark timeout in seconds")
+    ap.add_argument("--concurrency", type=int, default=32, help="max concurrent SSH commands")
+    ap.add_argument("--alpha", type=float, default=0.05)
+    ap.add_argument("--strategy", choices=STRATEGIES, default="ei")
+    ap.add_argument("--no-cache", action="store_true", help="ignore the parse cache and start over")
+    args = ap.parse_args()
+    try:
+        asyncio.run(amain(args))
+    except (OSError, ValueError) as e:
+        print(f"harness: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,13 +3,15 @@ set -euo pipefail
 
 usage() {
     cat <<EOF
-Usage: $(basename "$0") [-b base_image] [-a core_sets]
+Usage: $(basename "$0") [-b base_image] [-a core_sets] [-n count]
 
-Launch two VMs. Optionally pin each VM's QEMU process to specific host CPUs.
+Launch two VMs (or count of them, vm1..vmN on SSH ports 2221..).
+Optionally pin each VM's QEMU process to specific host CPUs.
 
 Options:
   -b base_image  Path to the base qcow2 image (default: plucky-server-cloudimg-amd64.img)
-  -a core_sets   Semicolon-separated host CPU specs per VM (vm1;vm2), e.g. "0-1;2,3"
+  -a core_sets   Semicolon-separated host CPU specs per VM (vm1;vm2;...), e.g. "0-1;2,3"
+  -n count       Number of VMs to launch (default: 2); see config/vms.json for harness.py
   -h             Show this help message
 
 Passing a positional argument for the base image is still supported for backward compatibility.
@@ -18,11 +20,13 @@ EOF
 
 BASE_IMG="plucky-server-cloudimg-amd64.img"
 HOST_CORES_LIST=""
+COUNT=2
 
-while getopts ":b:a:h" opt; do
+while getopts ":b:a:n:h" opt; do
     case "$opt" in
         b) BASE_IMG=$OPTARG ;;
         a) HOST_CORES_LIST=$OPTARG ;;
+        n) COUNT=$OPTARG ;;
         h)
             usage
             exit 0
@@ -52,6 +56,11 @@ if [ $# -gt 0 ]; then
     exit 1
 fi
 
+if ! [[ "$COUNT" =~ ^[0-9]+$ ]] || (( COUNT <= 0 )); then
+    echo "Error: -n must be a positive integer." >&2
+    exit 1
+fi
+
 if [ ! -f "$BASE_IMG" ]; then
     echo "Base image not found: $BASE_IMG"
     exit 1
@@ -160,7 +169,7 @@ launch_vm() {
 }
 
 # === Main loop ===
-for i in 1 2; do
+for (( i = 1; i <= COUNT; i++ )); do
     name="vm${i}"
     port=$((2220 + i))
     host_spec=""
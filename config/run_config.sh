@@ -55,7 +55,9 @@ echo '========== Auto_Ext Running =========='
 
 for (( loop = 1; loop <= LOOPS; loop++ )); do
   echo "=== Loop ${loop}/${LOOPS}: Running tests ==="
-  ./ssh_vm.sh all -- sudo /mnt/w/config/tests/run_tests.sh --runs=5
+  # Per-VM exit codes, timings and output tails go to tests/loop-N.json.
+  ./supershell.py --batch - --json "tests/loop-${loop}.json" \
+    <<< "sudo /mnt/w/config/tests/run_tests.sh --runs=5"
 
   echo "=== Loop ${loop}/${LOOPS}: Comparing vm1 vs vm2 ==="
   ./tests/compare.sh
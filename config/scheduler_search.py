@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+"""
+Guided search over (load, scheduler) assignments for the candidate configs.
+
+decision_logic.py feeds every (benchmark, load, scheduler) comparison into a
+persistent store as a log speed-up of the candidate over the control
+(ln(control median / candidate median), so > 0 is faster). Each
+observation belongs to a generation of the control's sched map; when a
+promotion changes the control, the ones for loads whose control scheduler
+changed are re-based on the new control or left out. Each
+(load, scheduler) pair gets a Gaussian posterior over that speed-up, and the
+next candidate config(s) pick, per load, the scheduler with the best
+acquisition score: expected improvement by default, or Thompson sampling.
+Because runs are attributed per load, one candidate explores every load at
+once; with N candidate VMs the loads get the top-N distinct schedulers.
+
+    ./scheduler_search.py report            # convergence per round
+    ./scheduler_search.py propose --n 3     # next 3 candidate configs
+"""
+import argparse
+import json
+import math
+import os
+import random
+from datetime import datetime
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+root_dir = os.path.abspath(os.path.join(script_dir, ".."))
+store_path = os.path.join(script_dir, "tests", "search_store.json")
+main_path = os.path.join(root_dir, "dispatcher_config_main.json")
+
+CANDIDATES = [
+    "build/scheds/c/scx_simple",
+    "target/release/scx_bpfland",
+    "build/scheds/c/scx_central",
+    "build/scheds/c/scx_prev",
+    "target/release/scx_flash",
+    "target/release/scx_beerland",
+    "target/release/scx_layered",
+    "target/release/scx_lavd",
+    "target/release/scx_cosmos",
+    "build/scheds/c/scx_nest",
+]
+
+STRATEGIES = ("ei", "thompson", "random")
+
+STORE_VERSION = 2
+# Prior on the log speed-up of an untried scheduler: centred on "no
+# different", with +-10% as one standard deviation.
+PRIOR_SD = 0.1
+# Floor on a comparison's standard error, so a handful of runs with
+# identical timings can't claim certainty.
+MIN_SE = 0.02
+Z95 = 1.96
+
+
+def log_speedup(st):
+    """(mean, se) of ln(median1 / median2) from a decision_logic.compare() result."""
+    m1, m2 = st["median1"], st["median2"]
+    if not (m1 > 0 and m2 > 0):
+        return None
+    se2 = 0.0
+    for lo, hi in (st["ci1"], st["ci2"]):
+        if lo > 0 and hi > 0:
+            se2 += ((math.log(hi) - math.log(lo)) / (2 * Z95)) ** 2
+    return math.log(m1 / m2), max(math.sqrt(se2), MIN_SE)
+
+
+class SearchStore:
+    """
+    Per (load, scheduler, benchmark): the latest summary of that comparison,
+    with the control generation it was measured against. decision_logic
+    recomputes its statistics over all runs every time, so a summary
+    replaces the previous one instead of being added to it. Only the
+    current generation counts towards a posterior.
+    """
+
+    def __init__(self, path=store_path):
+        self.path = path
+        self.obs = {}
+        self.history = []
+        self.control = None
+        self.generation = 0
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == STORE_VERSION:
+                self.obs = data["obs"]
+                self.history = data["history"]
+                self.control = data["control"]
+                self.generation = data["generation"]
+            elif data.get("version") == 1:
+                # Taken to be against whatever the control is now.
+                self.obs = {k: v + [0] for k, v in data["obs"].items()}
+                self.history = data["history"]
+        except (OSError, ValueError, KeyError):
+            pass
+
+    @staticmethod
+    def _key(load, sched, bench):
+        return f"{load}|{sched}|{bench}"
+
+    def observe(self, load, sched, bench, st):
+        est = log_speedup(st)
+        if est is None or st["n2"] < 2:
+            return
+        self.obs[self._key(load, sched, bench)] = [est[0], est[1], st["n2"], self.generation]
+
+    def set_control(self, scheds):
+        """
+        The control's sched map, after a promotion or at the start of a pass.
+        When it changed, the current observations move to a new generation:
+        a load whose control scheduler is the same keeps its speed-ups, one
+        whose control changed gets them re-based on the new control's
+        speed-up on the same benchmark (ln(new/old control) is subtracted),
+        and the old control scheduler gets the new one's, negated.
+        Observations that can't be re-based stay in the old generation.
+        Returns True when the generation changed.
+        """
+        scheds = dict(scheds)
+        if self.control is None or scheds == self.control:
+            self.control = scheds
+            return False
+        old_gen = self.generation
+        self.generation += 1
+        current = {k: v for k, v in self.obs.items() if v[3] == old_gen}
+        for key, (mean, se, n, _) in current.items():
+            load, sched, bench = key.split("|", 2)
+            old, new = self.control.get(load), scheds.get(load)
+            if new == old:
+                self.obs[key] = [mean, se, n, self.generation]
+                continue
+            if sched == new:
+                # The old control, measured against the new one.
+                if old is not None:
+                    self.obs[self._key(load, old, bench)] = [-mean, se, n, self.generation]
+                continue
+            base = current.get(self._key(load, new, bench))
+            if base is None:
+                continue
+            self.obs[key] = [mean - base[0], math.hypot(se, base[1]), min(n, base[2]), self.generation]
+        self.control = scheds
+        return True
+
+    def posterior(self, load, sched, prior_sd=PRIOR_SD):
+        """(mean, sd, runs) of the log speed-up of sched for load over the control."""
+        prec = 1.0 / prior_sd ** 2
+        acc = 0.0
+        runs = 0
+        prefix = f"{load}|{sched}|"
+        for k, (mean, se, n, gen) in self.obs.items():
+            if gen == self.generation and k.startswith(prefix):
+                prec += 1.0 / se ** 2
+                acc += mean / se ** 2
+                runs += n
+        return acc / prec, math.sqrt(1.0 / prec), runs
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"version": STORE_VERSION, "control": self.control, "generation": self.generation,
+                       "obs": self.obs, "history": self.history}, f, indent=1)
+        os.replace(tmp, self.path)
+
+
+def _phi(z):
+    return math.exp(-0.5 * z * z) / math.sqrt(2 * math.pi)
+
+
+def _Phi(z):
+    return 0.5 * math.erfc(-z / math.sqrt(2))
+
+
+def expected_improvement(mean, sd, best=0.0):
+    if sd <= 0:
+        return max(mean - best, 0.0)
+    z = (mean - best) / sd
+    return (mean - best) * _Phi(z) + sd * _phi(z)
+
+
+def score(store, load, candidates, control, strategy="ei", rng=random):
+    """[(score, sched, mean, sd)] best first; the control's own scheduler is excluded."""
+    # Improvement is over the control, or over the best known scheduler if that is better.
+    best = max([0.0] + [store.posterior(load, s)[0] for s in candidates if s != control])
+    out = []
+    for s in candidates:
+        if s == control:
+            continue
+        mean, sd, _ = store.posterior(load, s)
+        if strategy == "ei":
+            val = expected_improvement(mean, sd, best)
+        elif strategy == "thompson":
+            val = rng.gauss(mean, sd)
+        else:
+            val = rng.random()
+        out.append((val, s, mean, sd))
+    out.sort(key=lambda t: -t[0])
+    return out
+
+
+def propose(store, control_scheds, n=1, candidates=CANDIDATES, strategy="ei", rng=random):
+    """
+    n candidate sched maps. For each load, candidate i gets the i-th best
+    scheduler by acquisition score; loads with fewer options than n fall back
+    to the control's scheduler for the remaining candidates.
+    """
+    configs = [dict(control_scheds) for _ in range(n)]
+    ranking = {}
+    for load, control in control_scheds.items():
+        ranked = score(store, load, candidates, control, strategy, rng)
+        ranking[load] = ranked
+        for i, (_, sched, _, _) in enumerate(ranked[:n]):
+            configs[i][load] = sched
+    return configs, ranking
+
+
+def record_round(store, ranking, strategy):
+    """
+    Append one point of the convergence curve: the best remaining EI per
+    load. max_ei/total_ei only cover loads with at least one observation;
+    a load no benchmark exercises would otherwise pin the curve at the prior.
+    """
+    per_load = {}
+    for load, ranked in ranking.items():
+        if not ranked:
+            continue
+        _, sched, mean, sd = ranked[0]
+        best = max([0.0] + [m for _, _, m, _ in ranked])
+        per_load[load] = {
+            "sched": sched,
+            "mean": round(mean, 5),
+            "sd": round(sd, 5),
+            "ei": round(max(expected_improvement(m, s, best) for _, _, m, s in ranked), 6),
+            "observed": any(store.posterior(load, s)[2] for _, s, _, _ in ranked),
+        }
+    observed = [v["ei"] for v in per_load.values() if v["observed"]]
+    store.history.append({
+        "round": len(store.history) + 1,
+        "ts": datetime.now().isoformat(),
+        "strategy": strategy,
+        "max_ei": max(observed, default=0.0),
+        "total_ei": round(sum(observed), 6),
+        "loads": per_load,
+    })
+
+
+def best_known(store, control_scheds, candidates=CANDIDATES):
+    """Per load: the scheduler whose speed-up has the highest lower 95% bound above 0, else the control's."""
+    out = {}
+    for load, control in control_scheds.items():
+        top = (0.0, control, 0.0)
+        for s in candidates:
+            if s == control:
+                continue
+            mean, sd, runs = store.posterior(load, s)
+            if runs and mean - Z95 * sd > top[0]:
+                top = (mean - Z95 * sd, s, mean)
+        out[load] = {"sched": top[1], "speedup_pct": round((math.exp(top[2]) - 1) * 100, 2)}
+    return out
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--store", default=store_path)
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    rep = sub.add_parser("report", help="convergence curve and best known schedulers")
+    rep.add_argument("--json", action="store_true")
+    prop = sub.add_parser("propose", help="print the next candidate sched maps")
+    prop.add_argument("--n", type=int, default=1)
+    prop.add_argument("--strategy", choices=STRATEGIES, default="ei")
+    args = ap.parse_args()
+
+    store = SearchStore(args.store)
+    with open(main_path, "r", encoding="utf-8") as f:
+        control = json.load(f).get("scheds", {})
+
+    if args.cmd == "propose":
+        configs, _ = propose(store, control, args.n, strategy=args.strategy)
+        print(json.dumps(configs, indent=2))
+        return
+
+    best = best_known(store, control)
+    if args.json:
+        print(json.dumps({"history": store.history, "best": best}, indent=2))
+        return
+    print(f"{'ROUND':<6} {'STRATEGY':<9} {'MAX_EI':>9} {'TOTAL_EI':>9}")
+    for h in store.history:
+        print(f"{h['round']:<6} {h['strategy']:<9} {h['max_ei']:>9.5f} {h['total_ei']:>9.5f}")
+    print()
+    print(f"{'LOAD':<9} {'BEST KNOWN':<32} {'SPEEDUP':>8}")
+    for load, b in sorted(best.items()):
+        print(f"{load:<9} {b['sched']:<32} {b['speedup_pct']:>7.2f}%")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,12 @@
 #!/usr/bin/env python3
-import asyncio, shlex, sys, os
+import argparse, asyncio, json, shlex, sys, os, time
+from datetime import datetime
 
-VMs = {
-    "vm1": ("localhost", 2221),
-    "vm2": ("localhost", 2222),
-    "vm3": ("localhost", 2223),
-}
+from vmpool import SSHPool, inventory_path, load_inventory
 
-SSH_KEY = "vms/sshkey/id_ed25519"
-USER = "u"
+# Filled in from the inventory (config/vms.json, see vmpool.py) at startup.
+VMs = {}
+pool = None
 
 ctx_cwd = "/home/u"
 ctx_env = {}
@@ -19,6 +17,7 @@ VM_COLORS = {
     "vm2": "\033[1;33m",  # bright yellow
     "vm3": "\033[1;35m",  # bright magenta
 }
+EXTRA_COLORS = ["\033[1;32m", "\033[1;36m", "\033[1;37m"]  # green, cyan, white
 ERR_COLOR = "\033[1;31m"  # bright red
 USE_COLOR = sys.stdout.isatty()
 
@@ -28,121 +27,240 @@ def build_remote_cmd(cmd: str):
     wrapped = f"bash -lc {shlex.quote(prefix + ' ' + cmd)}"
     return wrapped
 
-async def run_on_vm(vm, host, port, cmd):
-    remote = build_remote_cmd(cmd)
-    proc = await asyncio.create_subprocess_exec(
-        "ssh",
-        "-i", SSH_KEY,
-        "-o", "StrictHostKeyChecking=no",
-        "-o", "UserKnownHostsFile=/dev/null",
-        "-o", "LogLevel=ERROR",
-        f"{USER}@{host}", "-p", str(port),
-        remote,
-        stdout=asyncio.subprocess.PIPE,
-        stderr=asyncio.subprocess.PIPE,
-    )
-
-    async def read_stream(stream, is_err=False):
-        if USE_COLOR:
-            vm_color = VM_COLORS.get(vm, "")
-            err_color = ERR_COLOR if is_err else ""
-            prefix = f"{vm_color}[{vm}]{COLOR_RESET}"
-            if is_err:
-                prefix += f"{err_color}[ERR]{COLOR_RESET}"
-            prefix += " "
-        else:
-            prefix = f"[{vm}]{'[ERR]' if is_err else ''} "
-        while True:
-            line = await stream.readline()
-            if not line:
-                break
-            sys.stdout.write(prefix + line.decode(errors="replace"))
-            sys.stdout.flush()
-
-    await asyncio.gather(read_stream(proc.stdout), read_stream(proc.stderr, True))
-    rc = await proc.wait()
-    return rc
+def line_prefix(vm, is_err=False):
+    if USE_COLOR:
+        vm_color = VM_COLORS.get(vm, "")
+        err_color = ERR_COLOR if is_err else ""
+        prefix = f"{vm_color}[{vm}]{COLOR_RESET}"
+        if is_err:
+            prefix += f"{err_color}[ERR]{COLOR_RESET}"
+        return prefix + " "
+    return f"[{vm}]{'[ERR]' if is_err else ''} "
+
+def print_line(vm, line, is_err):
+    sys.stdout.write(line_prefix(vm, is_err) + line.decode(errors="replace"))
+    sys.stdout.flush()
+
+async def run_on_vm(vm, cmd):
+    # Output is streamed to the terminal, nothing needs to be kept.
+    res = await pool.run(vm, build_remote_cmd(cmd), on_line=print_line, max_output=0)
+    return res.rc
+
+def print_stats():
+    print(f"[supershell] {'VM':<6} {'N':>6} {'MEAN':>9} {'P50':>9} {'P95':>9} {'MAX':>9}  (ms)")
+    for vm, st in pool.stats().items():
+        print(f"[supershell] {vm:<6} {st['n']:>6} {st['mean_ms']:>9.1f} {st['p50_ms']:>9.1f} "
+              f"{st['p95_ms']:>9.1f} {st['max_ms']:>9.1f}")
+
+async def transfer(direction, src, dst):
+    if direction == "pull":
+        jobs = {vm: pool.pull(vm, src, os.path.join(dst, vm)) for vm in VMs}
+    else:
+        jobs = {vm: pool.push(vm, src, dst) for vm in VMs}
+    results = await asyncio.gather(*jobs.values())
+    for res in results:
+        status = "ok" if res.rc == 0 else f"failed (rc={res.rc}): {res.stderr.strip()}"
+        print(f"[supershell] {direction} {res.vm} {status} in {res.elapsed:.2f}s")
+
+def set_cwd(path):
+    global ctx_cwd
+    # Expand tilde and environment variables
+    path = os.path.expandvars(os.path.expanduser(path))
+    if not os.path.isabs(path):
+        ctx_cwd = os.path.normpath(os.path.join(ctx_cwd, path))
+    else:
+        ctx_cwd = path
+
+def set_env(assignment):
+    key, val = assignment.split("=", 1)
+    ctx_env[key] = val
+    return key, val
 
 async def parse_builtin(line):
-    global ctx_cwd, ctx_env
     parts = line.strip().split()
     if not parts:
         return True
     cmd = parts[0]
 
-    if cmd in ("exit", "quit", ":q"):
-        sys.exit(0)
-
     if cmd == "cd" and len(parts) > 1:
-        path = parts[1]
-        # Expand tilde and environment variables
-        path = os.path.expandvars(os.path.expanduser(path))
-        if not os.path.isabs(path):
-            ctx_cwd = os.path.normpath(os.path.join(ctx_cwd, path))
-        else:
-            ctx_cwd = path
+        set_cwd(parts[1])
         print(f"[supershell] cwd → {ctx_cwd}")
         return True
 
     if cmd == "export" and len(parts) > 1 and "=" in parts[1]:
-        key, val = parts[1].split("=", 1)
-        ctx_env[key] = val
+        key, val = set_env(parts[1])
         print(f"[supershell] export {key}={val}")
         return True
 
     if line.strip() == ":poweroff":
         print("[supershell] powering off all VMs...")
-        tasks = [run_on_vm(vm, host, port, "sudo poweroff") for vm, (host, port) in VMs.items()]
+        tasks = [run_on_vm(vm, "sudo poweroff") for vm in VMs]
         await asyncio.gather(*tasks)
         print("[supershell] all VMs are shutting down.")
         return True
-    
-    if line.startswith(":pull"):
-        import subprocess
-        parts = line.split()
+
+    if cmd in (":pull", ":push"):
         if len(parts) < 3:
-            print("[supershell] Usage: :pull <remote_path> <local_path>")
+            if cmd == ":pull":
+                print("[supershell] Usage: :pull <remote_path> <local_path>")
+            else:
+                print("[supershell] Usage: :push <local_path> <remote_path>")
             return True
-        remote_path = parts[1]
-        local_path = parts[2]
-        os.makedirs(local_path, exist_ok=True)
-        vm_ports = {"vm1": 2221, "vm2": 2222, "vm3": 2223}
-        key_path = "vms/sshkey/id_ed25519"
-
-        for vm, port in vm_ports.items():
-            vm_dest = os.path.join(local_path, vm)
-            os.makedirs(vm_dest, exist_ok=True)
-            print(f"[supershell] Pulling from {vm}:{remote_path} → {vm_dest}/")
-            cmd = [
-                "scp",
-                "-i", key_path,
-                "-P", str(port),
-                "-o", "StrictHostKeyChecking=no",
-                "-o", "UserKnownHostsFile=/dev/null",
-                "-r", f"u@localhost:{remote_path.rstrip('/')}/.",
-                vm_dest,
-            ]
-            subprocess.run(cmd)
+        await transfer(cmd[1:], parts[1], parts[2])
+        return True
+
+    if cmd == ":stats":
+        print_stats()
         return True
 
     return False
 
 async def repl():
     print("=== SuperShell ===")
-    print("Type commands to run on vm1-vm3.")
-    print("Built-ins: cd, export, :poweroff, exit|quit|:q")
+    print(f"Type commands to run on {', '.join(VMs)}.")
+    print("Built-ins: cd, export, :pull, :push, :stats, :poweroff, exit|quit|:q")
+    loop = asyncio.get_running_loop()
     while True:
         try:
-            line = input("supersh> ").strip()
+            # Read in a thread so transfers and masters are not stalled by the prompt.
+            line = (await loop.run_in_executor(None, input, "supersh> ")).strip()
         except EOFError:
             break
         if not line:
             continue
+        if line.split()[0] in ("exit", "quit", ":q"):
+            break
         if await parse_builtin(line):
             continue
-        tasks = [run_on_vm(vm, host, port, line) for vm, (host, port) in VMs.items()]
+        tasks = [run_on_vm(vm, line) for vm in VMs]
         results = await asyncio.gather(*tasks, return_exceptions=False)
         print(f"[supershell] exit codes: {dict(zip(VMs.keys(), results))}")
 
+# ---- Batch mode ----
+
+def parse_steps(lines):
+    """
+    Turn a command file into steps. cd/export apply to the steps after
+    them; :pull/:push are steps too; blank lines and # comments are skipped.
+    """
+    steps = []
+    for raw in lines:
+        line = raw.strip()
+        if not line or line.startswith("#"):
+            continue
+        parts = line.split()
+        cmd = parts[0]
+        if cmd == "cd" and len(parts) > 1:
+            set_cwd(parts[1])
+        elif cmd == "export" and len(parts) > 1 and "=" in parts[1]:
+            set_env(parts[1])
+        elif cmd in (":pull", ":push"):
+            if len(parts) < 3:
+                raise ValueError(f"{cmd} needs a source and a destination: {line}")
+            steps.append({"cmd": line, "kind": cmd[1:], "src": parts[1], "dst": parts[2]})
+        elif cmd.startswith(":"):
+            raise ValueError(f"not available in batch mode: {line}")
+        else:
+            steps.append({"cmd": line, "kind": "run", "remote": build_remote_cmd(line)})
+    return steps
+
+def stream_line(vm, line, is_err):
+    # Batch output goes to stderr so stdout stays valid JSON.
+    sys.stderr.write(f"[{vm}]{'[ERR]' if is_err else ''} " + line.decode(errors="replace"))
+
+async def run_steps(vm, steps, args):
+    """One VM's steps in order, independent of the other VMs."""
+    out = []
+    opts = {"timeout": args.timeout, "max_output": args.max_output,
+            "on_line": stream_line if args.stream else None}
+    for step in steps:
+        if step["kind"] == "pull":
+            res = await pool.pull(vm, step["src"], os.path.join(step["dst"], vm), **opts)
+        elif step["kind"] == "push":
+            res = await pool.push(vm, step["src"], step["dst"], **opts)
+        else:
+            res = await pool.run(vm, step["remote"], **opts)
+        out.append({
+            "cmd": step["cmd"],
+            "rc": res.rc,
+            "timed_out": res.rc is None,
+            "elapsed_s": round(res.elapsed, 3),
+            "stdout": res.stdout,
+            "stderr": res.stderr,
+            "truncated": res.truncated,
+        })
+        status = "timed out" if res.rc is None else f"rc={res.rc}"
+        print(f"[supershell] {vm} {status} in {res.elapsed:.1f}s: {step['cmd']}", file=sys.stderr)
+        if res.rc != 0 and args.fail_fast:
+            break
+    return out
+
+async def batch(args):
+    if args.batch == "-":
+        lines = sys.stdin.read().splitlines()
+    else:
+        with open(args.batch, "r", encoding="utf-8") as f:
+            lines = f.read().splitlines()
+    steps = parse_steps(lines)
+
+    started = datetime.now().isoformat()
+    t0 = time.monotonic()
+    per_vm = await asyncio.gather(*(run_steps(vm, steps, args) for vm in VMs))
+    results = dict(zip(VMs, per_vm))
+    ok = all(len(r) == len(steps) and all(x["rc"] == 0 for x in r) for r in results.values())
+    report = {
+        "started": started,
+        "elapsed_s": round(time.monotonic() - t0, 3),
+        "ok": ok,
+        "steps": [step["cmd"] for step in steps],
+        "vms": results,
+        "latency_ms": pool.stats(),
+    }
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    return 0 if ok else 1
+
+async def main(args):
+    global pool
+    user, key, vms = load_inventory(args.inventory, args.vms)
+    for i, vm in enumerate(vms):
+        VMs[vm.name] = (vm.host, vm.port)
+        VM_COLORS.setdefault(vm.name, EXTRA_COLORS[i % len(EXTRA_COLORS)])
+    pool = SSHPool(vms, user, key, concurrency=args.concurrency)
+    log = sys.stderr if args.batch else sys.stdout
+    try:
+        # One handshake per VM here; every later command reuses it.
+        for res in (await pool.connect()).values():
+            status = "connected" if res.rc == 0 else f"not reachable: {res.stderr.strip()}"
+            print(f"[supershell] {res.vm} {status} ({res.elapsed * 1000:.0f} ms)", file=log)
+        if args.batch:
+            return await batch(args)
+        await repl()
+        return 0
+    finally:
+        await pool.close()
+
 if __name__ == "__main__":
-    asyncio.run(repl())
+    ap = argparse.ArgumentParser(description="Run each command on every VM at once.")
+    ap.add_argument("--inventory", default=inventory_path, help="VM inventory (default: config/vms.json)")
+    ap.add_argument("--vms", type=int, help="ignore the inventory and use vm1..vmN on ports 2221..")
+    ap.add_argument("--concurrency", type=int, default=32, help="max commands running at once")
+    batch_opts = ap.add_argument_group("batch mode")
+    batch_opts.add_argument("--batch", metavar="FILE",
+                            help="run the commands in FILE (- for stdin) on every VM and print JSON results")
+    batch_opts.add_argument("--json", metavar="PATH", help="write the JSON results to PATH instead of stdout")
+    batch_opts.add_argument("--timeout", type=float, help="per-VM timeout for each step, in seconds")
+    batch_opts.add_argument("--max-output", type=int, default=64 << 10,
+                            help="bytes of stdout/stderr kept per step and VM (the tail; default: 64 KiB)")
+    batch_opts.add_argument("--fail-fast", action="store_true", help="stop a VM's steps at its first failure")
+    batch_opts.add_argument("--stream", action="store_true", help="also stream output lines to stderr")
+    args = ap.parse_args()
+    try:
+        sys.exit(asyncio.run(main(args)))
+    except (OSError, ValueError) as e:
+        print(f"supershell: {e}", file=sys.stderr)
+        sys.exit(2)
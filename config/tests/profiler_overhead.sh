@@ -0,0 +1,109 @@
+#!/usr/bin/env bash
+
+# Measure profiler overhead with the perf_sched_all benchmark from run_tests.sh:
+# each iteration runs it once with no profilers loaded and once with them attached.
+#
+# To compare two profiler builds (e.g. hash+atomics vs per-CPU arrays), run this
+# once per build with --profilers=<that build's profilers_c> and a distinct --label,
+# then compare the "on" rows of the two labels.
+
+set -u
+set -o pipefail
+
+SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
+ROOT_DIR="$(cd "${SCRIPT_DIR}/../.." && pwd)"
+
+VM_ID=$(cat /etc/hostname 2>/dev/null || echo unknown)
+
+RUNS=""
+LABEL="current"
+PROFILERS_DIR="${ROOT_DIR}/profilers_c"
+PROBES="cpu,io,mem,net,parallel"
+BENCH_CMD="perf bench sched all"
+
+for arg in "$@"; do
+  case "$arg" in
+    --runs=*)
+      RUNS="${arg#*=}"
+      ;;
+    --label=*)
+      LABEL="${arg#*=}"
+      ;;
+    --profilers=*)
+      PROFILERS_DIR="${arg#*=}"
+      ;;
+    *)
+      echo "Usage: $0 --runs=<N> [--label=<name>] [--profilers=<profilers_c dir>]"
+      exit 1
+      ;;
+  esac
+done
+
+if [[ -z "${RUNS:-}" ]] || ! [[ "$RUNS" =~ ^[0-9]+$ ]] || (( RUNS <= 0 )); then
+  echo "Error: --runs must be a positive integer."
+  exit 1
+fi
+
+OUT_FILE="${SCRIPT_DIR}/${VM_ID}-overhead.txt"
+PIDS=()
+
+start_profilers() {
+  if [[ -x "${PROFILERS_DIR}/ALL/ba_bawm_all" ]]; then
+    "${PROFILERS_DIR}/ALL/ba_bawm_all" -p "$PROBES" >/dev/null 2>&1 &
+    PIDS+=($!)
+  else
+    # Older builds shipped one binary per probe.
+    for p in ${PROBES//,/ }; do
+      "${PROFILERS_DIR}/${p^^}/ba_bawm_${p}" >/dev/null 2>&1 &
+      PIDS+=($!)
+    done
+  fi
+  for i in {1..20}; do
+    [[ -e /sys/fs/bpf/ba_bawm ]] && break
+    sleep 0.5
+  done
+  sleep 1
+}
+
+stop_profilers() {
+  for pid in "${PIDS[@]}"; do
+    kill "$pid" 2>/dev/null || true
+    wait "$pid" 2>/dev/null || true
+  done
+  PIDS=()
+  rm -f /sys/fs/bpf/ba_bawm /sys/fs/bpf/ba_bawm_rq /sys/fs/bpf/ba_bawm_rq_cpu /sys/fs/bpf/ba_bawm_events /sys/fs/bpf/ba_bawm_trig /sys/fs/bpf/ba_bawm_trig_cfg
+}
+
+trap 'stop_profilers; exit 1' INT TERM
+
+run_benchmark() {
+  local iter="$1"
+  local mode="$2"
+
+  local start_ns end_ns elapsed_ms status
+  start_ns=$(date +%s%N)
+  bash -c "$BENCH_CMD" >/dev/null 2>&1
+  status=$?
+  end_ns=$(date +%s%N)
+  elapsed_ms=$(( (end_ns - start_ns) / 1000000 ))
+
+  # Same line format as run_tests.sh, so compare.sh/benchmarks.sh can read it.
+  printf '%s iter=%s name=perf_sched_all_%s_%s status=%s elapsed_ms=%s\n' \
+    "$(date -Is)" "$iter" "$LABEL" "$mode" "$status" "$elapsed_ms" >>"$OUT_FILE"
+}
+
+if [[ -e /sys/fs/bpf/ba_bawm ]]; then
+  echo "Error: /sys/fs/bpf/ba_bawm exists; stop running profilers first."
+  exit 1
+fi
+
+for ((iter = 1; iter <= RUNS; iter++)); do
+  echo "=== Iteration $iter / $RUNS (${LABEL}) ==="
+  run_benchmark "$iter" off
+
+  start_profilers
+  run_benchmark "$iter" on
+  stop_profilers
+done
+
+echo "Done. Results appended to $OUT_FILE; summarise with ./benchmarks.sh $OUT_FILE"
@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+"""
+VM inventory and a pooled SSH runner shared by harness.py and supershell.py.
+
+The inventory is config/vms.json:
+
+    {"user": "u", "key": "vms/sshkey/id_ed25519",
+     "vms": {"vm1": {"port": 2221, "role": "control"},
+             "vm2": {"port": 2222},
+             "vm3": {"host": "10.0.0.7", "port": 22, "shared": false, "root": "/opt/auto_ext"}}}
+
+host defaults to localhost, role to "candidate" and root (where the repo
+lives on the VM) to /mnt/w. shared means root is this very checkout
+mounted over 9p (launch_vm.sh does that), so configs and result files need
+no copying. Without the file, vm1..vmN on ports 2221.. are assumed, vm1
+being the control.
+"""
+import asyncio
+import collections
+import json
+import os
+import shlex
+import shutil
+import tempfile
+import time
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+inventory_path = os.path.join(script_dir, "vms.json")
+
+DEFAULT_USER = "u"
+DEFAULT_KEY = "vms/sshkey/id_ed25519"
+BASE_PORT = 2220
+REMOTE_ROOT = "/mnt/w"
+# Per-stream output kept for each command; older output is dropped.
+MAX_OUTPUT = 1 << 20
+# Bytes per read of a command's stdout/stderr.
+READ_CHUNK = 1 << 16
+# Latency samples kept per VM for stats().
+LATENCY_SAMPLES = 1000
+
+VM = collections.namedtuple("VM", "name host port role shared root")
+Result = collections.namedtuple("Result", "vm rc stdout stderr elapsed truncated")
+
+
+def load_inventory(path=inventory_path, count=None):
+    """Returns (user, key, [VM]); count overrides the file with vm1..vmN."""
+    data = {}
+    if count is None and os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    user = data.get("user", DEFAULT_USER)
+    key = data.get("key", DEFAULT_KEY)
+    if not os.path.isabs(key):
+        key = os.path.join(script_dir, key)
+
+    entries = data.get("vms")
+    if entries is None:
+        entries = {f"vm{i}": {"port": BASE_PORT + i} for i in range(1, (count or 2) + 1)}
+        entries["vm1"]["role"] = "control"
+    vms = []
+    for name, e in entries.items():
+        vms.append(VM(name, e.get("host", "localhost"), int(e.get("port", 22)),
+                      e.get("role", "candidate"), bool(e.get("shared", True)), e.get("root", REMOTE_ROOT)))
+    if sum(vm.role == "control" for vm in vms) != 1:
+        raise ValueError("inventory needs exactly one VM with role 'control'")
+    return user, key, vms
+
+
+class _Tail:
+    """Keeps the last limit bytes of a stream."""
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.chunks = collections.deque()
+        self.size = 0
+        self.truncated = False
+
+    def add(self, data):
+        self.chunks.append(data)
+        self.size += len(data)
+        while self.size > self.limit and self.chunks:
+            extra = self.size - self.limit
+            head = self.chunks[0]
+            self.truncated = True
+            if len(head) <= extra:
+                self.chunks.popleft()
+                self.size -= len(head)
+            else:
+                self.chunks[0] = head[extra:]
+                self.size -= extra
+
+    def text(self):
+        return b"".join(self.chunks).decode(errors="replace")
+
+
+def _percentile(sorted_xs, q):
+    if not sorted_xs:
+        return 0.0
+    return sorted_xs[min(int(q * len(sorted_xs)), len(sorted_xs) - 1)]
+
+
+class SSHPool:
+    """
+    One OpenSSH ControlMaster connection per VM, opened on first use (or by
+    connect()) and kept alive, so every later command and transfer
+    multiplexes over it without a new handshake. At most concurrency
+    commands run at once.
+    """
+
+    def __init__(self, vms, user=DEFAULT_USER, key=DEFAULT_KEY, concurrency=32, persist=600):
+        self.vms = {vm.name: vm for vm in vms}
+        self.user = user
+        self.key = key
+        self.persist = persist
+        self._dir = tempfile.mkdtemp(prefix="vmpool-")
+        self._sem = asyncio.Semaphore(concurrency)
+        self.latency = {name: collections.deque(maxlen=LATENCY_SAMPLES) for name in self.vms}
+        self.rsync = shutil.which("rsync")
+
+    def ssh_opts(self):
+        return [
+            "-i", self.key,
+            "-o", "StrictHostKeyChecking=no",
+            "-o", "UserKnownHostsFile=/dev/null",
+            "-o", "LogLevel=ERROR",
+            "-o", "ControlMaster=auto",
+            "-o", f"ControlPath={self._dir}/%C",
+            "-o", f"ControlPersist={self.persist}",
+        ]
+
+    def target(self, vm):
+        return f"{self.user}@{self.vms[vm].host}"
+
+    def ssh_args(self, vm, remote):
+        return ["ssh", *self.ssh_opts(), "-p", str(self.vms[vm].port), self.target(vm), remote]
+
+    async def exec(self, vm, argv, timeout=None, on_line=None, max_output=MAX_OUTPUT, input=None):
+        """Run a local command (ssh/rsync/...) for vm and capture bounded output."""
+        async with self._sem:
+            start = time.monotonic()
+            proc = await asyncio.create_subprocess_exec(
+                *argv, stdin=asyncio.subprocess.DEVNULL if input is None else asyncio.subprocess.PIPE,
+                stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE)
+            out, err = _Tail(max_output), _Tail(max_output)
+            if input is not None:
+                proc.stdin.write(input)
+                await proc.stdin.drain()
+                proc.stdin.close()
+
+            async def pump(stream, tail, is_err):
+                # Fixed-size reads: a long unterminated line (a \r progress bar) is
+                # fine here, where readline() would raise past asyncio's 64 KiB limit.
+                pending = b""
+                while True:
+                    chunk = await stream.read(READ_CHUNK)
+                    if not chunk:
+                        break
+                    tail.add(chunk)
+                    if on_line is None:
+                        continue
+                    pending += chunk
+                    *lines, pending = pending.split(b"\n")
+                    for line in lines:
+                        on_line(vm, line + b"\n", is_err)
+                    if len(pending) >= READ_CHUNK:
+                        on_line(vm, pending, is_err)
+                        pending = b""
+                if pending and on_line is not None:
+                    on_line(vm, pending, is_err)
+
+            rc = None
+            try:
+                await asyncio.wait_for(
+                    asyncio.gather(pump(proc.stdout, out, False), pump(proc.stderr, err, True), proc.wait()),
+                    timeout)
+                rc = proc.returncode
+            except asyncio.TimeoutError:
+                pass
+            finally:
+                if proc.returncode is None:
+                    try:
+                        proc.kill()
+                    except ProcessLookupError:
+                        pass
+                await proc.wait()
+            elapsed = time.monotonic() - start
+            self.latency[vm].append(elapsed)
+            return Result(vm, rc, out.text(), err.text(), elapsed, out.truncated or err.truncated)
+
+    async def run(self, vm, remote, **kwargs):
+        return await self.exec(vm, self.ssh_args(vm, remote), **kwargs)
+
+    async def connect(self):
+        """Open every master connection up front; returns {vm: Result}."""
+        return await self.run_all("true", timeout=30)
+
+    def _transfer_args(self, vm, src, dst, inplace=False):
+        port = str(self.vms[vm].port)
+        if self.rsync:
+            # Incremental and compressed, over the master connection.
+            ssh = shlex.join(["ssh", *self.ssh_opts(), "-p", port])
+            return [self.rsync, "-az", "--inplace" if inplace else "--partial", "-e", ssh, src, dst]
+        return ["scp", *self.ssh_opts(), "-C", "-r", "-P", port, src, dst]
+
+    async def pull(self, vm, remote_path, local_dir, **kwargs):
+        """Copy the contents of remote_path on vm into local_dir."""
+        os.makedirs(local_dir, exist_ok=True)
+        src = f"{self.target(vm)}:{remote_path.rstrip('/')}/"
+        if not self.rsync:
+            src += "."
+        return await self.exec(vm, self._transfer_args(vm, src, local_dir.rstrip("/") + "/"), **kwargs)
+
+    async def pull_file(self, vm, remote_path, local_path, **kwargs):
+        """
+        Bring local_path up to date with the file remote_path on vm. It is
+        updated in place, so a log that only grew keeps its inode and readers
+        can resume from their last offset.
+        """
+        os.makedirs(os.path.dirname(local_path) or ".", exist_ok=True)
+        src = f"{self.target(vm)}:{remote_path}"
+        return await self.exec(vm, self._transfer_args(vm, src, local_path, inplace=True), **kwargs)
+
+    async def push(self, vm, local_path, remote_dir, **kwargs):
+        """Copy local_path (a file, or a directory's contents) into remote_dir on vm."""
+        src = local_path.rstrip("/") + ("/" if os.path.isdir(local_path) else "")
+        if os.path.isdir(local_path) and not self.rsync:
+            src += "."
+        dst = f"{self.target(vm)}:{remote_dir.rstrip('/')}/"
+        return await self.exec(vm, self._transfer_args(vm, src, dst), **kwargs)
+
+    def stats(self):
+        """Per VM: count, mean, p50, p95 and max command latency in ms."""
+        out = {}
+        for vm, samples in self.latency.items():
+            xs = sorted(samples)
+            out[vm] = {
+                "n": len(xs),
+                "mean_ms": round(sum(xs) / len(xs) * 1000, 1) if xs else 0.0,
+                "p50_ms": round(_percentile(xs, 0.50) * 1000, 1),
+                "p95_ms": round(_percentile(xs, 0.95) * 1000, 1),
+                "max_ms": round(xs[-1] * 1000, 1) if xs else 0.0,
+            }
+        return out
+
+    async def run_all(self, remote, vms=None, **kwargs):
+        names = list(vms or self.vms)
+        results = await asyncio.gather(*(self.run(vm, remote, **kwargs) for vm in names))
+        return dict(zip(names, results))
+
+    async def close(self):
+        """Tear down the master connections."""
+        procs = []
+        for vm in self.vms:
+            procs.append(await asyncio.create_subprocess_exec(
+                "ssh", *self.ssh_opts(), "-p", str(self.vms[vm].port), "-O", "exit", self.target(vm),
+                stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.DEVNULL))
+        await asyncio.gather(*(p.wait() for p in procs))
+        try:
+            os.rmdir(self._dir)
+        except OSError:
+            pass
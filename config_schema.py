@@ -0,0 +1,156 @@
+import numbers
+
+from counter_source import SOURCES
+from partitions import KINDS, POLICIES, parse_cpulist
+from sampler import AdaptiveCadence
+from scoring import ScoringModel
+from system_load_enum import SystemLoad
+
+# Optional blocks and the keys each one accepts.
+BLOCKS = {
+    "scoring": ("thresholds", "weights", "bias", "idle_level"),
+    "sampling": ("min_interval", "max_interval", "backoff", "change_ratio", "rate_floor"),
+    "hysteresis": ("tau", "exit_ratio", "min_dwell", "stats_window"),
+    "handoff": ("stop_timeout", "attach_timeout", "retries", "prewarm", "poll_interval"),
+    "events": ("path", "top_n", "max_per_poll"),
+    "trigger": ("window_ms", "heartbeat", "ratio"),
+    "log": ("max_bytes", "max_age", "keep", "compress"),
+    "predict": ("slot_s", "lead_s", "confidence", "min_count", "decay", "hold_s", "path"),
+}
+RQ_STATS = ("p50", "p99", "mean")
+
+# Opened once at start; a reload that changes them is applied without them.
+RESTART_ONLY = ("COUNTER_SOURCE", "events", "RECORD_TRACE", "metrics", "partitions", "trigger", "log", "predict")
+PARTITION_KEYS = ("scheduler", "groups", "policies")
+GROUP_KEYS = ("name", "cpus", "cgroup", "match", "kind")
+
+TOP_LEVEL = ("SCHED_PATH", "scheds", "PARALLEL_STAT") + tuple(BLOCKS) + RESTART_ONLY
+
+
+def _check(ok, msg):
+    if not ok:
+        raise ValueError(msg)
+
+
+def _number(block, key, v, lo=0.0, integer=False):
+    kind = numbers.Integral if integer else numbers.Real
+    _check(isinstance(v, kind) and not isinstance(v, bool) and v >= lo,
+           f"{block}.{key} must be {'an integer' if integer else 'a number'} >= {lo}, got {v!r}")
+
+
+def _block(cfg, name):
+    block = cfg.get(name, {})
+    _check(isinstance(block, dict), f"{name} must be an object")
+    unknown = sorted(block.keys() - set(BLOCKS[name]))
+    _check(not unknown, f"unknown {name} keys {unknown}, expected some of {list(BLOCKS[name])}")
+    return block
+
+
+def _partitions(block):
+    _check(isinstance(block, dict), "partitions must be an object")
+    unknown = sorted(block.keys() - set(PARTITION_KEYS))
+    _check(not unknown, f"unknown partitions keys {unknown}, expected some of {list(PARTITION_KEYS)}")
+    _check(isinstance(block.get("scheduler"), str) and block["scheduler"],
+           "partitions.scheduler must be the scx_layered binary")
+    groups = block.get("groups")
+    _check(isinstance(groups, list) and groups, "partitions.groups must be a non-empty list")
+    names = set()
+    for g in groups:
+        _check(isinstance(g, dict) and isinstance(g.get("name"), str) and g["name"],
+               "every partition group needs a name")
+        name = g["name"]
+        _check(name not in names and name != "rest", f"partition name {name!r} is taken")
+        names.add(name)
+        unknown = sorted(g.keys() - set(GROUP_KEYS))
+        _check(not unknown, f"unknown keys {unknown} in partition {name}")
+        _check(("cpus" in g) != ("cgroup" in g), f"partition {name} needs either cpus or cgroup")
+        if "cpus" in g:
+            _check(isinstance(g["cpus"], str), f"partition {name}: cpus must be a CPU list like \"0-3,8\"")
+            try:
+                parse_cpulist(g["cpus"])
+            except ValueError:
+                raise ValueError(f"partition {name}: bad cpus {g['cpus']!r}") from None
+            _check("match" in g, f"partition {name} has no cgroup, so it needs a match")
+        else:
+            _check(isinstance(g["cgroup"], str) and g["cgroup"].strip("/"), f"partition {name}: bad cgroup")
+        _check(isinstance(g.get("match", []), list), f"partition {name}: match must be a list of lists")
+        _check(g.get("kind", "Confined") in KINDS, f"partition {name}: kind must be one of {list(KINDS)}")
+    policies = block.get("policies", {})
+    _check(isinstance(policies, dict), "partitions.policies must be an object")
+    for k, v in policies.items():
+        _check(k in POLICIES, f"partitions.policies: unknown load {k!r}")
+        _check(isinstance(v, dict), f"partitions.policies.{k} must be an object")
+
+
+def validate(cfg, cpus) -> ScoringModel:
+    """
+    Check a parsed dispatcher config, raising ValueError on the first
+    problem. Returns the ScoringModel it describes, which is the most
+    thorough check of the "scoring" block.
+    """
+    _check(isinstance(cfg, dict), "config must be a JSON object")
+    unknown = sorted(cfg.keys() - set(TOP_LEVEL))
+    _check(not unknown, f"unknown keys {unknown}")
+
+    _check(isinstance(cfg.get("SCHED_PATH"), str) and cfg["SCHED_PATH"], "SCHED_PATH must be a path")
+    scheds = cfg.get("scheds")
+    _check(isinstance(scheds, dict), "scheds must map every load to a scheduler")
+    names = [s.name for s in SystemLoad]
+    _check(not sorted(scheds.keys() - set(names)), f"unknown loads in scheds, expected {names}")
+    missing = [n for n in names if n not in scheds]
+    _check(not missing, f"scheds has no scheduler for {missing}")
+    for k, v in scheds.items():
+        _check(isinstance(v, str) and v, f"scheds.{k} must be a binary path")
+
+    sampling = _block(cfg, "sampling")
+    for k, v in sampling.items():
+        _number("sampling", k, v)
+    AdaptiveCadence(**sampling)  # min_interval <= max_interval
+
+    hysteresis = _block(cfg, "hysteresis")
+    for k, v in hysteresis.items():
+        _number("hysteresis", k, v)
+    _check(0 < hysteresis.get("exit_ratio", 1) <= 1, "hysteresis.exit_ratio must be in (0, 1]")
+
+    for k, v in _block(cfg, "handoff").items():
+        _number("handoff", k, v, integer=k in ("retries", "prewarm"))
+
+    events = _block(cfg, "events")
+    for k, v in events.items():
+        if k != "path":
+            _number("events", k, v, lo=1, integer=True)
+
+    for k, v in _block(cfg, "trigger").items():
+        _number("trigger", k, v)
+        _check(v > 0, f"trigger.{k} must be > 0")
+
+    for k, v in _block(cfg, "log").items():
+        if k == "compress":
+            _check(isinstance(v, bool), f"log.compress must be true or false, got {v!r}")
+        else:
+            _number("log", k, v, lo=1, integer=k != "max_age")
+
+    if cfg.get("predict") is not None:
+        for k, v in _block(cfg, "predict").items():
+            if k == "path":
+                _check(isinstance(v, str) and v, "predict.path must be a path")
+                continue
+            _number("predict", k, v)
+            _check(k not in ("slot_s", "confidence", "decay") or v > 0, f"predict.{k} must be > 0")
+        for k in ("confidence", "decay"):
+            _check(cfg["predict"].get(k, 1) <= 1, f"predict.{k} must be at most 1")
+        _check(cfg["predict"].get("slot_s", 1) <= 86400, "predict.slot_s must be at most a day")
+
+    _check(cfg.get("PARALLEL_STAT", "p50") in RQ_STATS, f"PARALLEL_STAT must be one of {list(RQ_STATS)}")
+    _check(cfg.get("COUNTER_SOURCE", "pinned") in SOURCES,
+           f"COUNTER_SOURCE must be one of {sorted(SOURCES)}")
+    if cfg.get("partitions") is not None:
+        _partitions(cfg["partitions"])
+    for key in ("RECORD_TRACE", "metrics"):
+        _check(cfg.get(key) is None or isinstance(cfg[key], str), f"{key} must be a string")
+
+    scoring = _block(cfg, "scoring")
+    try:
+        return ScoringModel.from_config(scoring, cpus)
+    except (TypeError, AttributeError, KeyError) as e:
+        raise ValueError(f"malformed scoring block: {e!r}") from None
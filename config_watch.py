@@ -0,0 +1,99 @@
+import asyncio
+import ctypes
+import ctypes.util
+import os
+import struct
+
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+_EVENT = struct.Struct("=iIII")  # wd, mask, cookie, len; then len bytes of name
+
+_libc = None
+
+
+def _inotify():
+    global _libc
+    if _libc is None:
+        _libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+    return _libc
+
+
+def _open_inotify(path):
+    """An inotify fd watching path's directory, or None if inotify is unavailable."""
+    try:
+        libc = _inotify()
+        fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+    except (OSError, AttributeError):
+        return None
+    if fd < 0:
+        return None
+    # Watch the directory: editors and atomic writers replace the file,
+    # which would silently end a watch on the file itself. A plain write
+    # shows up as IN_CLOSE_WRITE, a rename over it as IN_MOVED_TO.
+    parent = os.path.dirname(os.path.abspath(path)) or "."
+    wd = libc.inotify_add_watch(fd, parent.encode(), IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE)
+    if wd < 0:
+        os.close(fd)
+        return None
+    return fd
+
+
+def _names(buf):
+    off = 0
+    while off + _EVENT.size <= len(buf):
+        _, _, _, n = _EVENT.unpack_from(buf, off)
+        off += _EVENT.size
+        yield buf[off:off + n].rstrip(b"\0").decode(errors="replace")
+        off += n
+
+
+def _mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+async def watch_file(path, poll_interval=1.0, settle=0.05):
+    """
+    Yields each time path is rewritten. Uses inotify when it can and polls
+    the mtime every poll_interval seconds otherwise. Bursts of events
+    within settle seconds are reported once.
+    """
+    name = os.path.basename(path)
+    fd = _open_inotify(path)
+    if fd is None:
+        last = _mtime(path)
+        while True:
+            await asyncio.sleep(poll_interval)
+            mtime = _mtime(path)
+            if mtime != last:
+                last = mtime
+                if mtime is not None:
+                    yield path
+        return
+
+    loop = asyncio.get_running_loop()
+    ready = asyncio.Event()
+    loop.add_reader(fd, ready.set)
+    try:
+        while True:
+            await ready.wait()
+            await asyncio.sleep(settle)
+            ready.clear()
+            hit = False
+            while True:
+                try:
+                    buf = os.read(fd, 65536)
+                except BlockingIOError:
+                    break
+                hit = hit or name in _names(buf)
+            if hit:
+                yield path
+    finally:
+        loop.remove_reader(fd)
+        os.close(fd)
@@ -0,0 +1,155 @@
+from bpf_map import BATCH_UNSUPPORTED, BpfMap, u32_bytes, u64
+
+PIN_PATH = "/sys/fs/bpf/ba_bawm"
+
+# Profilers share a BPF_MAP_TYPE_PERCPU_ARRAY keyed by SystemLoad value.
+# PARALLEL is not a counter; it comes from the run-queue histogram (rq_histogram.py).
+MAP_ENTRIES = 8
+
+_U64 = (1 << 64) - 1
+
+
+class CounterSource:
+    """
+    Reads one window of profiler counters from the ba_bawm map.
+
+    Profilers only ever increment; the map is never written or cleared from
+    userspace, so no event can fall between a read and a reset.
+    snapshot() returns {key: value} where value is the number of events since
+    the previous call (the difference of two monotonic totals, modulo 2^64).
+    snapshot_cpus() is the same with one delta per CPU slot, for CPU
+    partitions; use one or the other on a given source.
+    """
+
+    def __init__(self):
+        self._last = {}
+
+    def _deltas(self, totals):
+        out = {}
+        for k, v in totals.items():
+            out[k] = (v - self._last.get(k, 0)) & _U64
+            self._last[k] = v
+        return out
+
+    def _deltas_cpus(self, totals):
+        out = {}
+        for k, slots in totals.items():
+            last = self._last.get(k) or [0] * len(slots)
+            out[k] = [(v - p) & _U64 for v, p in zip(slots, last)]
+            self._last[k] = slots
+        return out
+
+    def snapshot(self) -> dict:
+        raise NotImplementedError
+
+    def snapshot_cpus(self) -> dict:
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class BccCounterSource(CounterSource):
+    """Pinned map through bcc, compiled once; batched syscalls when available."""
+
+    def __init__(self, path=PIN_PATH):
+        super().__init__()
+        from bcc import BPF
+
+        self._bpf = BPF(text=f'BPF_TABLE_PINNED("percpu_array", u32, u64, ba_bawm, {MAP_ENTRIES}, "{path}");')
+        self._table = self._bpf["ba_bawm"]
+        self._batch = True
+
+    def snapshot(self):
+        if self._batch:
+            try:
+                return self._snapshot_batch()
+            except Exception:
+                self._batch = False
+        return self._snapshot_per_key()
+
+    def _snapshot_batch(self):
+        items = self._table.items_lookup_batch()
+        return self._deltas({int(k.value): sum(v) for k, v in items})
+
+    def _snapshot_per_key(self):
+        t = self._table
+        return self._deltas({key: sum(t[t.Key(key)]) for key in range(MAP_ENTRIES)})
+
+    def snapshot_cpus(self):
+        t = self._table
+        return self._deltas_cpus({key: list(t[t.Key(key)]) for key in range(MAP_ENTRIES)})
+
+    def close(self):
+        self._bpf.cleanup()
+
+
+class PinnedMapCounterSource(CounterSource):
+    """Pinned map through raw bpf(2); no bcc, no LLVM compile at startup."""
+
+    def __init__(self, path=PIN_PATH):
+        super().__init__()
+        self._map = BpfMap.from_pinned(path)
+        self._batch = True
+
+    def _items(self):
+        if self._batch:
+            try:
+                return self._map.lookup_batch()
+            except OSError as e:
+                if e.errno not in BATCH_UNSUPPORTED:
+                    raise
+                self._batch = False
+        m = self._map
+        items = []
+        for key in range(m.max_entries):
+            v = m.lookup(u32_bytes(key))
+            if v is not None:
+                items.append((u32_bytes(key), v))
+        return items
+
+    def snapshot(self):
+        m = self._map
+        return self._deltas({u64(k): sum(u64(slot) for slot in m.slots(v)) for k, v in self._items()})
+
+    def snapshot_cpus(self):
+        m = self._map
+        return self._deltas_cpus({u64(k): [u64(slot) for slot in m.slots(v)] for k, v in self._items()})
+
+    def close(self):
+        self._map.close()
+
+
+class FakeCounterSource(CounterSource):
+    """In-memory stand-in for tests and benchmarks; counts are monotonic totals."""
+
+    def __init__(self, counts=None, ncpus=1):
+        super().__init__()
+        self.counts = dict(counts or {})
+        self.cpu_counts = {k: [v] + [0] * (ncpus - 1) for k, v in self.counts.items()}
+        self.ncpus = ncpus
+
+    def add(self, key, n=1, cpu=0):
+        self.counts[key] = self.counts.get(key, 0) + n
+        self.cpu_counts.setdefault(key, [0] * self.ncpus)[cpu] += n
+
+    def snapshot(self):
+        return self._deltas(self.counts)
+
+    def snapshot_cpus(self):
+        return self._deltas_cpus({k: list(v) for k, v in self.cpu_counts.items()})
+
+
+SOURCES = {
+    "pinned": PinnedMapCounterSource,
+    "bcc": BccCounterSource,
+    "fake": FakeCounterSource,
+}
+
+
+def open_counter_source(kind="pinned", **kwargs) -> CounterSource:
+    try:
+        cls = SOURCES[kind]
+    except KeyError:
+        raise ValueError(f"unknown counter source '{kind}', expected one of {sorted(SOURCES)}")
+    return cls(**kwargs)
@@ -1,14 +1,26 @@
-from bcc import BPF
 from system_load_enum import SystemLoad
-import ctypes
-import subprocess
-import time
 import os
+import asyncio
 import json
+import signal
 import sys
+import time
 from datetime import datetime, timezone
 
-from eval import evaluate
+from counter_source import open_counter_source
+from event_log import open_event_log
+from event_stream import open_event_stream
+from partitions import PartitionLayout, load_partitions
+from phase_predictor import PhasePredictor
+from rq_histogram import open_rq_cpus, open_rq_histogram
+from sampler import AdaptiveCadence, RateSampler
+from load_classifier import LoadClassifier
+from tick_trace import NO_SWITCH, SWITCH_FAILED, SWITCHED, open_trace_writer
+from trigger import open_trigger
+from config_schema import RESTART_ONLY, validate as validate_config
+from config_watch import watch_file
+from sched_manager import SchedulerManager, wait_exit
+from telemetry import DispatcherMetrics, serve_metrics
 
 # ---- Argument parsing ----
 # Patterns:
@@ -16,6 +28,7 @@ from eval import evaluate
 #   dispatcher.py alt
 #   dispatcher.py vm1
 #   dispatcher.py alt vm2
+#   dispatcher.py config/candidates/vm3.json vm3
 args = sys.argv[1:]
 
 cfg_name = "dispatcher_config_main.json"
@@ -25,6 +38,9 @@ if args:
     if args[0] == "alt":
         cfg_name = "dispatcher_config_alt.json"
         args = args[1:]
+    elif args[0].endswith(".json"):
+        cfg_name = args[0]
+        args = args[1:]
 
     if args:
         vm_id = args[0]
@@ -41,101 +57,410 @@ LOG_DIR = os.path.join(SCRIPT_DIR, "config", "tests")
 if vm_id is not None:
     os.makedirs(LOG_DIR, exist_ok=True)
     SCHED_LOG_PATH = os.path.join(LOG_DIR, f"{vm_id}-test_detail.txt")
+    SCHED_OUT_PATH = os.path.join(LOG_DIR, f"{vm_id}-sched_output.txt")
 else:
     SCHED_LOG_PATH = None
+    SCHED_OUT_PATH = None
 
-def reload_scheds():
-    global config, SCHED_PATH, scheds
+def get_sys_cpus():
+    try:
+        return int(os.getenv("NUM_CPUS", os.cpu_count()))
+    except Exception:
+        return os.cpu_count()
+
+
+def load_config():
+    """Returns (config, ScoringModel); raises OSError or ValueError for a bad file."""
     with open(cfg_path, "r", encoding="utf-8") as f:
-        config = json.load(f)
-    SCHED_PATH = config["SCHED_PATH"]
-    scheds = {SystemLoad[k]: v for k, v in config["scheds"].items()}
+        cfg = json.load(f)
+    return cfg, validate_config(cfg, get_sys_cpus())
 
-reload_scheds()
-last_mtime = os.path.getmtime(cfg_path)
 
-#print(scheds)
+try:
+    config, model = load_config()
+except (OSError, ValueError) as e:
+    sys.exit(f"[dispatcher] {cfg_path}: {e}")
+SCHED_PATH = config["SCHED_PATH"]
+scheds = {SystemLoad[k]: v for k, v in config["scheds"].items()}
 
-load = {}
-for s_load in list(scheds.keys())[:-1]:
-    load[s_load] = False
+#print(scheds)
 
 curr_load = SystemLoad.CPU
 
-SLEEP_INTERVAL = 3
-THRESHOLDS = {
-    SystemLoad.CPU: 1000,
-    SystemLoad.IO: 1000,
-    SystemLoad.MEM: 2000,
-    SystemLoad.NET: 1000,
-    SystemLoad.PARALLEL: None,
-}
 
-def get_sys_cpus():
+# With a vm_id, load switches and other events go to {vm_id}-test_detail.txt
+# as JSON lines, which decision_logic.py reads back. Optional "log":
+# {"max_bytes", "max_age", "keep", "compress"} sets its rotation.
+event_log = open_event_log(SCHED_LOG_PATH, **config.get("log", {}))
+
+
+def log_event(event, **fields):
+    if event_log is not None:
+        event_log.write(event, **fields)
+
+
+# Optional "partitions": {"scheduler", "groups", "policies"}; classify each
+# CPU partition on its own and run one scx_layered with a layer per partition
+# instead of switching between the scheds.
+layout = None
+if config.get("partitions"):
+    os.makedirs(LOG_DIR, exist_ok=True)
     try:
-        return int(os.getenv("NUM_CPUS", os.cpu_count()))
-    except Exception:
-        return os.cpu_count()
+        layout = PartitionLayout(
+            load_partitions(config["partitions"]["groups"]), config["partitions"]["scheduler"],
+            os.path.join(LOG_DIR, f"{vm_id or 'local'}-layered"), config.get("scoring", {}),
+            get_sys_cpus(), config.get("hysteresis"), config["partitions"].get("policies"), curr_load)
+    except (OSError, ValueError) as e:
+        sys.exit(f"[dispatcher] {cfg_path}: partitions: {e}")
+
+
+def target(load):
+    """(binary, args, partition loads) to run for load; args and loads only with partitions."""
+    if layout is None:
+        return scheds[load], (), None
+    loads = dict(layout.loads)
+    return layout.binary, layout.args(loads), loads
+
+
+# Optional "handoff": {"stop_timeout", "attach_timeout", "retries", "prewarm"} in the config.
+manager = SchedulerManager(SCHED_PATH, log_path=SCHED_OUT_PATH, **config.get("handoff", {}))
+binary, sched_args, running_loads = target(curr_load)
+manager.start(binary, sched_args)
+
+# "pinned" reads the map with raw bpf(2) batch ops; "bcc" goes through bcc.
+counters = open_counter_source(config.get("COUNTER_SOURCE", "pinned"))
+rq = open_rq_histogram()
+sampler = RateSampler(counters, rq=rq, rq_stat=config.get("PARALLEL_STAT", "p50"),
+                      partitions=layout and layout.cpu_sets(), rq_cpus=layout and open_rq_cpus())
+# Optional "sampling": {"min_interval", "max_interval", "backoff", ...} in the config.
+cadence = AdaptiveCadence(**config.get("sampling", {}))
+# "scoring": {"thresholds", "weights", "bias", "idle_level"}; thresholds are
+# events/second, except PARALLEL (runnable tasks, default: the CPU count).
+# The model was built by load_config().
+# Optional "hysteresis": {"tau", "exit_ratio", "min_dwell"} in the config.
+classifier = LoadClassifier(model, curr_load, **config.get("hysteresis", {}))
+# Per-task attribution when the profiler runs with -s; optional "events": {"top_n"}.
+events = open_event_stream(**config.get("events", {}))
+
+# Optional "trigger": {"window_ms", "heartbeat", "ratio"}; once the cadence
+# has backed off to max_interval, sleep until the profiler reports a
+# threshold crossing, with a tick every heartbeat seconds regardless.
+TRIGGER_DEFAULTS = {"window_ms": 50, "heartbeat": 5.0, "ratio": 1.0}
+trigger_cfg = dict(TRIGGER_DEFAULTS, **config["trigger"]) if "trigger" in config else None
+trigger = open_trigger() if trigger_cfg else None
+
+
+def arm_trigger(thresholds):
+    if trigger is not None:
+        trigger.arm(thresholds, trigger_cfg["window_ms"], trigger_cfg["ratio"])
+
 
-THRESHOLDS[SystemLoad.PARALLEL] = get_sys_cpus()
-#print(f"Parallelism threshold set to {THRESHOLDS[SystemLoad.PARALLEL]}")
+arm_trigger(model.thresholds)
 
-def log_load_switch(load_enum: SystemLoad):
-    if SCHED_LOG_PATH is None:
+# Optional "predict": {"slot_s", "lead_s", "confidence", "min_count", "decay",
+# "hold_s", "path"}; learn load changes that recur at the same time of day
+# and switch lead_s seconds before them. The model is saved to "path"
+# (relative to this directory) every few minutes and at exit. Not used with
+# partitions.
+PREDICT_STATE = "config/tests/phase_predictor.json"
+PREDICT_SAVE_S = 300.0
+predictor = None
+if config.get("predict") is not None and layout is None:
+    predict_cfg = dict(config["predict"])
+    predict_path = os.path.join(SCRIPT_DIR, predict_cfg.pop("path", PREDICT_STATE))
+    predictor = PhasePredictor(**predict_cfg)
+    predictor.load(predict_path)
+predict_saved = time.time()
+
+
+def save_predictor():
+    if predictor is None or not predictor.dirty:
         return
-    ts = datetime.now(timezone.utc).isoformat()
-    line = f"[{ts}] load={load_enum.name}\n"
     try:
-        with open(SCHED_LOG_PATH, "a", encoding="utf-8") as f:
-            f.write(line)
-    except Exception:
-        pass
+        os.makedirs(os.path.dirname(predict_path), exist_ok=True)
+        predictor.save(predict_path)
+    except OSError as e:
+        print(f"[dispatcher] could not save {predict_path}: {e}", file=sys.stderr, flush=True)
 
+# Optional "RECORD_TRACE": path (relative to this directory) of a tick trace
+# for replay.py.
+recorder = open_trace_writer(config.get("RECORD_TRACE"), SCRIPT_DIR)
 
-p = subprocess.Popen(
-    [f"{SCHED_PATH}/{scheds[SystemLoad.CPU]}"],
-    stdout=subprocess.DEVNULL
-)
+# Optional "metrics": "unix:/run/ba_bawm.sock" or "127.0.0.1:9464"; an
+# OpenMetrics scrape target served alongside the control loop.
+metrics = DispatcherMetrics() if config.get("metrics") else None
 
 
+def record_meta():
+    if recorder is not None:
+        recorder.meta({
+            "config": config,
+            "cpus": get_sys_cpus(),
+            "initial": curr_load.name,
+            "monotonic": time.monotonic(),
+            "rq": rq is not None,
+            "vm_id": vm_id,
+            "wall_time": datetime.now(timezone.utc).isoformat(),
+        })
 
-b = BPF(text="""
-BPF_TABLE_PINNED("hash", u64, u64, ba_bawm, 1024, "/sys/fs/bpf/ba_bawm");
-""")
-ba_bawm = b["ba_bawm"]
 
-while True:
-    try:
-        mtime = os.path.getmtime(cfg_path)
-        if mtime != last_mtime:
-            last_mtime = mtime
-            reload_scheds()
-    except FileNotFoundError:
-        pass
-
-
-    for i, s_load in enumerate(load):
-        val = ba_bawm.get(ctypes.c_uint(i))
-        load_val = val.value if val is not None else 0
-        threshold = THRESHOLDS[s_load]
-        load[s_load] = load_val >= threshold if threshold is not None else False
-    
-    # print(load)
-
-    new_load = evaluate(*list(load.values()))
-    if not (curr_load == new_load and load[new_load] is True):
-        curr_load = new_load
-        p.kill()
-        p = subprocess.Popen(
-            [f"{SCHED_PATH}/{scheds[curr_load]}"],
-            stdout=subprocess.DEVNULL
-        )
-        log_load_switch(curr_load)
+record_meta()
+
+
+def dump_stats(*_):
+    stats = {"classifier": classifier.stats(), "handoff": manager.stats(), "reloads": reloads}
+    if layout is not None:
+        stats["partitions"] = layout.stats()
+    if trigger is not None:
+        stats["trigger"] = trigger.stats()
+    if events is not None:
+        stats["offenders"] = events.aggregator.last
+    if predictor is not None:
+        stats["predictor"] = predictor.stats()
+    if event_log is not None:
+        stats["log"] = event_log.stats()
+    print(json.dumps(stats), file=sys.stderr, flush=True)
+
+
+# Seconds between restart attempts of a scheduler that keeps exiting.
+RESTART_BACKOFF = (1.0, 30.0)
+
+# Reloads of the config file. last_ms runs from the file event to the new
+# config being in effect, including any scheduler swap it caused.
+reloads = {"applied": 0, "rejected": 0, "last_ms": None}
+
+# Set by switch_to() and recorded by the next tick.
+switch_result = NO_SWITCH
+switch_task = None
+switch_lock = None
+
+
+async def in_thread(fn, *args):
+    return await asyncio.get_running_loop().run_in_executor(None, fn, *args)
+
+
+async def switch_to(new_load=None):
+    """
+    Hand off in a worker thread, so sampling carries on during a slow spawn.
+    With no new_load, bring the running scheduler in line with the current
+    load: after a reload remapped it, or when a partition's load changed.
+    """
+    global curr_load, switch_result, running_loads
+    async with switch_lock:
+        load = curr_load if new_load is None else new_load
+        manager.set_sched_path(SCHED_PATH)
+        binary, args, loads = target(load)
+        if new_load is None and manager.running(binary, args):
+            return
+        switch_start = time.perf_counter()
+        switched = await in_thread(manager.switch, binary, args)
+        if metrics is not None:
+            metrics.switch(time.perf_counter() - switch_start, switched)
+        if switched:
+            switch_result = SWITCHED
+            running_loads = loads
+            if load != curr_load:
+                curr_load = load
+                log_event("load", load=curr_load.name)
+                if events is not None:
+                    # Top offenders since the previous switch; shown in the SIGUSR1 dump.
+                    events.window()
+        else:
+            switch_result = SWITCH_FAILED
+            log_event("switch_failed", load=load.name, binary=binary)
+            classifier.force(curr_load)
+            if layout is not None:
+                layout.force(running_loads)
         # print(f"\n==========\nSwitched to {scheds[curr_load]}, {curr_load.name}\n==========\n")
 
-    #b["ba_bawm"].clear()
-    for k in list(ba_bawm.keys()):
-        if int(k.value) != 4:
-            del ba_bawm[k]
 
-    time.sleep(SLEEP_INTERVAL)
\ No newline at end of file
+async def sample_loop():
+    global switch_task, switch_result, predict_saved
+    while True:
+        tick_start = time.perf_counter()
+        rates = sampler.sample()
+        read_s = time.perf_counter() - tick_start
+        new_load = classifier.update(rates)
+        wall = time.time()
+        if predictor is not None:
+            predictor.observe_tick(classifier, wall)
+        if layout is not None:
+            layout.update(sampler.partition_rates)
+        if events is not None:
+            events.poll()
+
+        # print(classifier.scores)
+
+        if switch_task is not None and switch_task.done():
+            switch_task.result()  # re-raise anything the hand-off hit
+            switch_task = None
+        if switch_task is None:
+            if layout is not None and layout.loads != running_loads:
+                switch_task = asyncio.create_task(switch_to())
+            elif predictor is not None:
+                target, predicted = predictor.decide(classifier, curr_load, wall)
+                if predicted:
+                    log_event("predict", load=target.name, after=curr_load.name, p=predictor.last["p"])
+                if target is not None:
+                    switch_task = asyncio.create_task(switch_to(target))
+            elif new_load != curr_load:
+                switch_task = asyncio.create_task(switch_to(new_load))
+
+        result, switch_result = switch_result, NO_SWITCH
+        if recorder is not None:
+            recorder.tick(sampler.last, sampler.window, sampler.counts, sampler.rq_stats,
+                          new_load, curr_load, result)
+
+        cadence.update(rates, curr_load)
+        if metrics is not None:
+            metrics.tick(time.perf_counter() - tick_start, read_s, rates, classifier,
+                         manager.binary, cadence.interval)
+            if layout is not None:
+                metrics.partitions = running_loads
+        if predictor is not None and wall - predict_saved >= PREDICT_SAVE_S:
+            predict_saved = wall
+            save_predictor()
+        delay = cadence.delay()
+        if trigger is not None and cadence.interval >= cadence.max_interval and switch_task is None:
+            # Nothing is moving: block until a crossing instead of polling the map.
+            # A predictor still needs a tick within its lead time.
+            heartbeat = trigger_cfg["heartbeat"]
+            if predictor is not None:
+                heartbeat = min(heartbeat, predictor.lead_s / 2)
+            if await trigger.wait(heartbeat):
+                cadence.tighten()
+                if metrics is not None:
+                    metrics.wakeups += 1
+        else:
+            await asyncio.sleep(delay)
+
+
+def apply_config(new, new_model):
+    """
+    Put a validated config into effect. Nothing here awaits, so every tick
+    sees either the old settings or the new ones. Returns the restart-only
+    keys whose change was not applied.
+    """
+    global config, SCHED_PATH, scheds
+    new = dict(new)
+    kept = []
+    for key in RESTART_ONLY:
+        if new.get(key) != config.get(key):
+            kept.append(key)
+            if key in config:
+                new[key] = config[key]
+            else:
+                del new[key]
+    classifier.configure(new_model, **new.get("hysteresis", {}))
+    arm_trigger(new_model.thresholds)
+    if layout is not None:
+        layout.configure(new.get("scoring", {}), get_sys_cpus(), new.get("hysteresis"))
+    cadence.configure(**new.get("sampling", {}))
+    sampler.rq_stat = new.get("PARALLEL_STAT", "p50")
+    manager.configure(**new.get("handoff", {}))
+    config = new
+    SCHED_PATH = new["SCHED_PATH"]
+    scheds = {SystemLoad[k]: v for k, v in new["scheds"].items()}
+    return kept
+
+
+async def watch_config():
+    async for _ in watch_file(cfg_path):
+        reload_start = time.perf_counter()
+        try:
+            new, new_model = load_config()
+        except (OSError, ValueError) as e:
+            # Half-written or invalid; keep running on the current config.
+            reloads["rejected"] += 1
+            if metrics is not None:
+                metrics.reload(time.perf_counter() - reload_start, False)
+            print(f"[dispatcher] {cfg_name} rejected, keeping the previous config: {e}",
+                  file=sys.stderr, flush=True)
+            log_event("reload", ok=False, error=str(e))
+            continue
+        kept = apply_config(new, new_model)
+        if kept:
+            print(f"[dispatcher] {', '.join(kept)} only change on restart", file=sys.stderr, flush=True)
+        record_meta()
+        await switch_to()
+        elapsed = time.perf_counter() - reload_start
+        reloads["applied"] += 1
+        reloads["last_ms"] = round(1000 * elapsed, 2)
+        if metrics is not None:
+            metrics.reload(elapsed, True)
+        log_event("reload", ok=True, kept=kept, ms=reloads["last_ms"])
+
+
+async def supervise():
+    """Restart the scheduler when it exits without a switch asking it to."""
+    global running_loads
+    backoff = RESTART_BACKOFF[0]
+    while True:
+        proc = manager.proc
+        if proc is not None:
+            await wait_exit(proc)
+        else:
+            await asyncio.sleep(backoff)
+        async with switch_lock:
+            if manager.alive():
+                continue  # replaced by a switch, or already back
+            binary, args, loads = target(curr_load)
+            restarted = await in_thread(manager.restart, binary, args)
+            if restarted:
+                running_loads = loads
+        log_event("restart", binary=binary, ok=restarted)
+        if metrics is not None:
+            if restarted:
+                metrics.restarts += 1
+            else:
+                metrics.restart_failures += 1
+        if restarted:
+            backoff = RESTART_BACKOFF[0]
+        else:
+            backoff = min(backoff * 2, RESTART_BACKOFF[1])
+            await asyncio.sleep(backoff)
+
+
+async def main():
+    global switch_lock
+    switch_lock = asyncio.Lock()
+    loop = asyncio.get_running_loop()
+    # `kill -USR1 <pid>` dumps switch-rate and hand-off statistics to stderr.
+    loop.add_signal_handler(signal.SIGUSR1, dump_stats)
+    tasks = [asyncio.current_task()]
+    loop.add_signal_handler(signal.SIGTERM, lambda: tasks[0].cancel())
+
+    server = None
+    if metrics is not None:
+        server = await serve_metrics(metrics, config["metrics"])
+    workers = [asyncio.create_task(coro) for coro in (sample_loop(), watch_config(), supervise())]
+    try:
+        # None of these return; the first one to fail takes the dispatcher down.
+        done, _ = await asyncio.wait(workers, return_when=asyncio.FIRST_EXCEPTION)
+        for task in done:
+            task.result()
+    finally:
+        for task in workers:
+            task.cancel()
+        if server is not None:
+            server.close()
+            if config["metrics"].startswith("unix:"):
+                try:
+                    os.unlink(config["metrics"][len("unix:"):])
+                except OSError:
+                    pass
+
+
+try:
+    asyncio.run(main())
+except (asyncio.CancelledError, KeyboardInterrupt):
+    pass
+finally:
+    if recorder is not None:
+        recorder.close()
+    if trigger is not None:
+        trigger.close()
+    save_predictor()
+    if event_log is not None:
+        event_log.close()
+    manager.close()
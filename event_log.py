@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+"""
+Structured event log shared by the dispatcher and the config loop.
+
+Records are compact JSON lines, {"ts": <epoch s>, "event": <name>, ...},
+buffered in memory and written in batches by a background thread, so the
+caller never waits on the disk. Next to the log, <log>.idx holds a
+(ts, byte offset) pair per batch; a range query seeks straight to the
+first batch it needs.
+
+When the log passes max_bytes, or its first record is older than max_age
+seconds, it is renamed to <log>.<UTC time of its first record> (gzipped
+when compress is set) and a new one is started; the oldest segments past
+keep are deleted. Rotated segments are named by their start, so a range
+query skips whole segments without opening them.
+
+    python event_log.py config/tests/vm2-test_detail.txt --since 2025-11-20T00:00 --event load
+"""
+import argparse
+import bisect
+import glob
+import gzip
+import json
+import os
+import shutil
+import struct
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+
+# <log>.idx: one entry per written batch.
+INDEX = struct.Struct("=dQ")
+STAMP = "%Y%m%dT%H%M%S"
+
+# Records held while the file cannot be written; older ones are dropped.
+MAX_PENDING = 10000
+
+
+class EventLog:
+    def __init__(self, path, max_bytes=8 << 20, max_age=None, keep=10, compress=True,
+                 batch=64, flush_interval=1.0):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.keep = keep
+        self.compress = compress
+        self.batch = batch
+        self.flush_interval = flush_interval
+        self.written = 0
+        self.dropped = 0
+        self.rotations = 0
+        self.errors = 0
+        self.last_error = None
+        self._buf = []
+        self._cond = threading.Condition()
+        self._io = threading.Lock()
+        self._f = None
+        self._first = None
+        self._closed = False
+        parent = os.path.dirname(path)
+        if parent:
+            os.makedirs(parent, exist_ok=True)
+        self._thread = threading.Thread(target=self._run, name="event-log", daemon=True)
+        self._thread.start()
+
+    def write(self, event, ts=None, **fields):
+        """Queue one record; returns at once."""
+        rec = {"ts": time.time() if ts is None else ts, "event": event}
+        rec.update(fields)
+        with self._cond:
+            self._buf.append(rec)
+            if len(self._buf) >= self.batch:
+                self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if not self._buf and not self._closed:
+                    self._cond.wait(self.flush_interval)
+                closed = self._closed
+            self.flush()
+            if closed:
+                return
+
+    def _open(self):
+        """(Re)open the log; also notices it was truncated or replaced by someone else."""
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            st = None
+        if self._f is not None:
+            own = os.fstat(self._f.fileno())
+            if st is not None and (st.st_ino, st.st_dev) == (own.st_ino, own.st_dev) and st.st_size >= self._size:
+                return
+            self._f.close()
+            self._f = None
+        self._f = open(self.path, "ab")
+        self._size = self._f.tell()
+        entries = read_index(self.path) if self._size else []
+        if not self._size or not entries or entries[-1][1] >= self._size:
+            # New, truncated (run_tests.sh empties the detail log each loop) or unindexed.
+            with open(self.path + ".idx", "wb"):
+                pass
+            entries = []
+        self._first = entries[0][0] if entries else None
+
+    def flush(self):
+        with self._cond:
+            recs, self._buf = self._buf, []
+        if not recs:
+            return
+        with self._io:
+            try:
+                self._open()
+                if self._first is not None and self._due(recs[0]["ts"]):
+                    self._rotate()
+                    self._open()
+                blob = b"".join(json.dumps(r, separators=(",", ":")).encode() + b"\n" for r in recs)
+                with open(self.path + ".idx", "ab") as idx:
+                    idx.write(INDEX.pack(recs[0]["ts"], self._size))
+                self._f.write(blob)
+                self._f.flush()
+            except OSError as e:
+                self.errors += 1
+                if self.last_error is None:
+                    print(f"[event_log] {self.path}: {e}", file=sys.stderr, flush=True)
+                self.last_error = str(e)
+                with self._cond:
+                    self._buf[:0] = recs
+                    extra = len(self._buf) - MAX_PENDING
+                    if extra > 0:
+                        del self._buf[:extra]
+                        self.dropped += extra
+                return
+            self._size += len(blob)
+            if self._first is None:
+                self._first = recs[0]["ts"]
+            self.written += len(recs)
+            self.last_error = None
+
+    def _due(self, ts):
+        if self._size >= self.max_bytes:
+            return True
+        return self.max_age is not None and ts - self._first >= self.max_age
+
+    def _rotate(self):
+        self._f.close()
+        self._f = None
+        seg = f"{self.path}.{datetime.fromtimestamp(self._first, timezone.utc).strftime(STAMP)}"
+        while os.path.exists(seg) or os.path.exists(seg + ".gz"):
+            seg += "_"
+        os.replace(self.path + ".idx", seg + ".idx")
+        os.replace(self.path, seg)
+        if self.compress:
+            with open(seg, "rb") as src, gzip.open(seg + ".gz", "wb") as dst:
+                shutil.copyfileobj(src, dst)
+            os.unlink(seg)
+        self.rotations += 1
+        if not self.keep:
+            return
+        for _, old in segments(self.path)[:-self.keep]:
+            for p in (old, _plain(old) + ".idx"):
+                try:
+                    os.unlink(p)
+                except FileNotFoundError:
+                    pass
+
+    def stats(self):
+        return {"path": self.path, "written": self.written, "pending": len(self._buf), "dropped": self.dropped,
+                "rotations": self.rotations, "errors": self.errors, "last_error": self.last_error}
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._thread.join()
+        with self._io:
+            if self._f is not None:
+                self._f.close()
+                self._f = None
+
+
+def open_event_log(path, **kwargs):
+    return EventLog(path, **kwargs) if path else None
+
+
+def _plain(seg):
+    return seg[:-3] if seg.endswith(".gz") else seg
+
+
+def read_index(path):
+    """[(ts, offset)] of a log or a rotated segment (given with or without .gz)."""
+    try:
+        with open(_plain(path) + ".idx", "rb") as f:
+            data = f.read()
+    except FileNotFoundError:
+        return []
+    n = len(data) // INDEX.size
+    return [INDEX.unpack_from(data, i * INDEX.size) for i in range(n)]
+
+
+def segments(path):
+    """Rotated segments of a log as [(start ts, file)], oldest first; the live log is not included."""
+    out = []
+    for seg in glob.glob(glob.escape(path) + ".*"):
+        stamp = _plain(seg)[len(path) + 1:].rstrip("_")
+        try:
+            start = datetime.strptime(stamp, STAMP).replace(tzinfo=timezone.utc).timestamp()
+        except ValueError:
+            continue  # the .idx files
+        out.append((start, seg))
+    out.sort()
+    return out
+
+
+def _read_from(seg, since):
+    entries = read_index(seg)
+    offset = 0
+    if since is not None and entries:
+        i = bisect.bisect_right([e[0] for e in entries], since) - 1
+        offset = entries[i][1] if i >= 0 else 0
+    opener = gzip.open if seg.endswith(".gz") else open
+    with opener(seg, "rb") as f:
+        f.seek(offset)
+        for line in f:
+            if not line.endswith(b"\n"):
+                return  # still being written
+            try:
+                yield json.loads(line)
+            except ValueError:
+                continue
+
+
+def _live_start(path):
+    """Timestamp of the live log's first record; -inf when it can't be told, so nothing is skipped."""
+    entries = read_index(path)
+    if entries:
+        return entries[0][0]
+    try:
+        with open(path, "rb") as f:
+            return float(json.loads(f.readline())["ts"])
+    except (OSError, ValueError, KeyError, TypeError):
+        return float("-inf")
+
+
+def read_events(path, since=None, until=None, event=None):
+    """Records with since <= ts <= until (epoch s, either may be None), across rotations, in order."""
+    parts = segments(path)
+    if os.path.exists(path):
+        parts.append((_live_start(path), path))
+    for i, (start, seg) in enumerate(parts):
+        if until is not None and start > until:
+            return
+        nxt = parts[i + 1][0] if i + 1 < len(parts) else float("inf")
+        if since is not None and nxt < since:
+            continue
+        for rec in _read_from(seg, since):
+            ts = rec.get("ts", 0)
+            if since is not None and ts < since:
+                continue
+            if until is not None and ts > until:
+                return
+            if event is None or rec.get("event") == event:
+                yield rec
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("path")
+    ap.add_argument("--since", default=None, help="ISO time or epoch seconds")
+    ap.add_argument("--until", default=None, help="ISO time or epoch seconds")
+    ap.add_argument("--event", default=None, help="only records of this event")
+    args = ap.parse_args()
+
+    def when(s):
+        if s is None:
+            return None
+        try:
+            return float(s)
+        except ValueError:
+            return datetime.fromisoformat(s).timestamp()
+
+    for rec in read_events(args.path, when(args.since), when(args.until), args.event):
+        print(json.dumps(rec, separators=(",", ":")))
+
+
+if __name__ == "__main__":
+    main()
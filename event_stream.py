@@ -0,0 +1,204 @@
+import collections
+import mmap
+import os
+import struct
+
+from bpf_map import BPF_MAP_TYPE_RINGBUF, BpfMap
+from system_load_enum import SystemLoad
+
+EVENTS_PIN_PATH = "/sys/fs/bpf/ba_bawm_events"
+
+# struct event in profilers_c/ALL/ba_bawm_all_skel.bpf.c:
+# ts_ns, cgroup_id, pid (tgid), cpu, type (SystemLoad value).
+EVENT = struct.Struct("=QQIHH")
+
+# Ring buffer record header: u32 len (with BUSY/DISCARD bits), u32 page offset.
+_HDR = 8
+_BUSY = 1 << 31
+_DISCARD = 1 << 30
+_POS = struct.Struct("=Q")
+_LEN = struct.Struct("=I")
+
+
+class RingBuffer:
+    """
+    Consumer side of a BPF_MAP_TYPE_RINGBUF, read straight from its mmap.
+
+    The kernel maps the data area twice back to back, so a record that wraps
+    is still contiguous and can be handed out as a memoryview slice without
+    copying. The event stream is submitted without wakeups and polled once
+    per tick; the trigger ring (trigger.py) wakes whoever polls fileno().
+    """
+
+    def __init__(self, fd, size, owner=None):
+        page = mmap.PAGESIZE
+        # Kept open only when the caller wants to poll the fd for wakeups.
+        self._owner = owner
+        self._size = size
+        self._mask = size - 1
+        self._consumer = mmap.mmap(fd, page, mmap.MAP_SHARED, mmap.PROT_READ | mmap.PROT_WRITE, offset=0)
+        self._producer = mmap.mmap(fd, page + 2 * size, mmap.MAP_SHARED, mmap.PROT_READ, offset=page)
+        self._data = memoryview(self._producer)[page:]
+
+    @classmethod
+    def from_pinned(cls, path, pollable=False):
+        m = BpfMap.from_pinned(path)
+        if m.map_type != BPF_MAP_TYPE_RINGBUF:
+            m.close()
+            raise ValueError(f"{path} is not a ring buffer")
+        if pollable:
+            return cls(m.fd, m.max_entries, owner=m)
+        try:
+            return cls(m.fd, m.max_entries)
+        finally:
+            # The mappings keep the ring alive on their own.
+            m.close()
+
+    def fileno(self):
+        """The map fd; readable (epoll) while records are pending. Needs pollable=True."""
+        return self._owner.fd
+
+    def pending(self) -> int:
+        """Bytes submitted (or reserved) but not yet consumed."""
+        return _POS.unpack_from(self._producer)[0] - _POS.unpack_from(self._consumer)[0]
+
+    def records(self, limit=None):
+        """
+        Yield each committed record as a memoryview. The consumer position
+        advances as records are yielded, so don't keep a view past the next one.
+        """
+        data, mask = self._data, self._mask
+        cons = _POS.unpack_from(self._consumer)[0]
+        prod = _POS.unpack_from(self._producer)[0]
+        n = 0
+        while cons < prod and (limit is None or n < limit):
+            off = cons & mask
+            hdr = _LEN.unpack_from(data, off)[0]
+            if hdr & _BUSY:
+                break
+            length = hdr & ~(_BUSY | _DISCARD)
+            if not hdr & _DISCARD:
+                yield data[off + _HDR:off + _HDR + length]
+                n += 1
+            cons += (length + _HDR + 7) & ~7
+            _POS.pack_into(self._consumer, 0, cons)
+
+    def close(self):
+        self._data.release()
+        self._producer.close()
+        self._consumer.close()
+        if self._owner is not None:
+            self._owner.close()
+
+
+def task_comm(pid):
+    try:
+        with open(f"/proc/{pid}/comm", "r", encoding="utf-8") as f:
+            return f.read().strip()
+    except OSError:
+        return "?"
+
+
+class CgroupResolver:
+    """cgroup v2 ids are the inode numbers of the cgroupfs directories."""
+
+    def __init__(self, root="/sys/fs/cgroup"):
+        self.root = root
+        self._paths = {}
+        self._scanned = False
+
+    def _scan(self):
+        self._paths = {}
+        for dirpath, _, _ in os.walk(self.root):
+            rel = os.path.relpath(dirpath, self.root)
+            try:
+                self._paths[os.stat(dirpath).st_ino] = "/" if rel == "." else "/" + rel
+            except OSError:
+                pass
+        self._scanned = True
+
+    def __call__(self, cgroup_id):
+        if cgroup_id not in self._paths and not self._scanned:
+            self._scan()
+        path = self._paths.get(cgroup_id)
+        if path is None:
+            # New cgroup since the last scan; rescan on the next miss.
+            self._scanned = False
+            return str(cgroup_id)
+        return path
+
+
+class EventAggregator:
+    """
+    Counts sampled events per (load, pid) and (load, cgroup) and reports the
+    top_n of each per window. Counts are samples, not events: multiply by the
+    profiler's 1-in-N ratio for an estimate of the real rate.
+    """
+
+    def __init__(self, top_n=5, resolve_cgroup=None, comm=task_comm):
+        self.top_n = top_n
+        self.resolve_cgroup = resolve_cgroup or CgroupResolver()
+        self.comm = comm
+        self.samples = 0
+        self._pids = collections.defaultdict(collections.Counter)
+        self._cgroups = collections.defaultdict(collections.Counter)
+        self.last = {}
+
+    def add(self, record):
+        _, cgroup_id, pid, _, load = EVENT.unpack_from(record)
+        self._pids[load][pid] += 1
+        self._cgroups[load][cgroup_id] += 1
+        self.samples += 1
+
+    def window(self) -> dict:
+        """{load name: {"pids": [...], "cgroups": [...]}} since the previous call."""
+        out = {}
+        for load, pids in self._pids.items():
+            try:
+                name = SystemLoad(load).name
+            except ValueError:
+                name = str(load)
+            out[name] = {
+                "samples": sum(pids.values()),
+                "pids": [{"pid": pid, "comm": self.comm(pid), "samples": n}
+                         for pid, n in pids.most_common(self.top_n)],
+                "cgroups": [{"cgroup": self.resolve_cgroup(cg), "samples": n}
+                            for cg, n in self._cgroups[load].most_common(self.top_n)],
+            }
+        self._pids.clear()
+        self._cgroups.clear()
+        self.last = out
+        return out
+
+
+class EventStream:
+    """Drains a RingBuffer into an EventAggregator."""
+
+    def __init__(self, ring, top_n=5, max_per_poll=None):
+        self.ring = ring
+        self.aggregator = EventAggregator(top_n)
+        self.max_per_poll = max_per_poll
+
+    def poll(self) -> int:
+        add = self.aggregator.add
+        n = 0
+        for record in self.ring.records(self.max_per_poll):
+            add(record)
+            n += 1
+        return n
+
+    def window(self) -> dict:
+        self.poll()
+        return self.aggregator.window()
+
+    def close(self):
+        self.ring.close()
+
+
+def open_event_stream(path=EVENTS_PIN_PATH, **kwargs):
+    """Returns None when the profiler isn't running or has no event stream."""
+    try:
+        ring = RingBuffer.from_pinned(path)
+    except FileNotFoundError:
+        return None
+    return EventStream(ring, **kwargs)
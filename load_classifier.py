@@ -0,0 +1,120 @@
+import collections
+import math
+import time
+
+from scoring import CLASSES, FEATURES
+from system_load_enum import SystemLoad
+
+
+class LoadClassifier:
+    """
+    Smoothed, hysteretic front-end to a ScoringModel.
+
+    Each load's rate goes through a time-based EWMA (time constant tau
+    seconds, so the smoothing is independent of the sampling cadence).
+    The running load's score is divided by exit_ratio, so it is only
+    replaced once it falls below exit_ratio of the level it needed to win,
+    or another load outscores it by that margin. The margin is taken on
+    the score's magnitude, so it still favours the running load when a
+    negative bias pushes its score below zero. A switch to a new
+    classification is held back until the current one has lasted
+    min_dwell seconds.
+    """
+
+    LOADS = FEATURES
+
+    def __init__(self, model, initial=SystemLoad.CPU, tau=1.0, exit_ratio=0.7,
+                 min_dwell=2.0, stats_window=600.0, clock=time.monotonic):
+        self.configure(model, tau, exit_ratio, min_dwell, stats_window)
+        self.clock = clock
+
+        self.smoothed = {s_load: 0.0 for s_load in self.LOADS}
+        self.scores = [0.0] * len(CLASSES)
+        self.current = initial
+        self.measured = initial
+
+        now = self.clock()
+        self._last_sample = None
+        self._since = now
+        self._started = now
+        self._switch_times = collections.deque()
+        self.switches = 0
+        self.suppressed = 0
+        self.time_in_state = collections.Counter()
+
+    def configure(self, model, tau=1.0, exit_ratio=0.7, min_dwell=2.0, stats_window=600.0):
+        """Swap in a new model and parameters; smoothed rates and the current load carry over."""
+        if not 0 < exit_ratio <= 1:
+            raise ValueError("exit_ratio must be in (0, 1]")
+        self.model = model
+        self.tau = tau
+        self.exit_ratio = exit_ratio
+        self.min_dwell = min_dwell
+        self.stats_window = stats_window
+
+    def _smooth(self, rates, now):
+        if self._last_sample is None or self.tau <= 0:
+            alpha = 1.0
+        else:
+            alpha = 1.0 - math.exp(-(now - self._last_sample) / self.tau)
+        self._last_sample = now
+        for s_load in self.LOADS:
+            x = rates.get(s_load.value, 0.0)
+            self.smoothed[s_load] += alpha * (x - self.smoothed[s_load])
+
+    def _score(self):
+        scores = self.model.scores([self.smoothed[s_load] for s_load in self.LOADS])
+        # The pick without the running load's advantage.
+        self.measured = self.model.pick(scores)
+        if self.current != SystemLoad.IDLE:
+            cur = scores[self.current.value]
+            scores[self.current.value] = cur + abs(cur) * (1.0 / self.exit_ratio - 1.0)
+        self.scores = scores
+        return self.model.pick(scores)
+
+    def update(self, rates) -> SystemLoad:
+        """Feed one sample ({key: rate}); returns the load to run now."""
+        now = self.clock()
+        self._smooth(rates, now)
+
+        candidate = self._score()
+        if candidate == self.current:
+            return self.current
+        if now - self._since < self.min_dwell:
+            self.suppressed += 1
+            return self.current
+
+        self.time_in_state[self.current] += now - self._since
+        self.current = candidate
+        self._since = now
+        self.switches += 1
+        self._switch_times.append(now)
+        return self.current
+
+    def force(self, s_load):
+        """Pin the current classification, e.g. after a failed switch was rolled back."""
+        now = self.clock()
+        self.time_in_state[self.current] += now - self._since
+        self.current = s_load
+        self._since = now
+
+    def switches_per_min(self) -> float:
+        now = self.clock()
+        while self._switch_times and now - self._switch_times[0] > self.stats_window:
+            self._switch_times.popleft()
+        window = min(self.stats_window, max(now - self._started, 1e-9))
+        return len(self._switch_times) * 60.0 / window
+
+    def stats(self) -> dict:
+        now = self.clock()
+        in_state = collections.Counter(self.time_in_state)
+        in_state[self.current] += now - self._since
+        return {
+            "current": self.current.name,
+            "switches": self.switches,
+            "suppressed": self.suppressed,
+            "switches_per_min": self.switches_per_min(),
+            "time_in_state": {s.name: round(t, 3) for s, t in in_state.items()},
+            "smoothed": {s.name: round(v, 1) for s, v in self.smoothed.items()},
+            "scores": {s.name: round(v, 3) for s, v in zip(CLASSES, self.scores)},
+        }
@@ -0,0 +1,142 @@
+import collections
+import json
+import os
+
+from load_classifier import LoadClassifier
+from scoring import ScoringModel
+from system_load_enum import SystemLoad
+
+CGROUP_ROOT = "/sys/fs/cgroup"
+
+# scx_layered layer settings for a partition in each classification.
+# Latency-bound loads get short, preempting slices; throughput-bound loads
+# long ones. "policies" in the config overrides them per load.
+POLICIES = {
+    "CPU": {"slice_us": 20000, "preempt": False},
+    "IO": {"slice_us": 5000, "preempt": True},
+    "MEM": {"slice_us": 20000, "preempt": False},
+    "NET": {"slice_us": 1000, "preempt": True},
+    "PARALLEL": {"slice_us": 10000, "preempt": False},
+    "IDLE": {"slice_us": 20000, "preempt": False},
+}
+UTIL_RANGE = [0.8, 0.9]
+KINDS = ("Confined", "Grouped")
+
+Partition = collections.namedtuple("Partition", "name cpus match kind")
+
+
+def parse_cpulist(spec):
+    """"0-3,8" -> [0, 1, 2, 3, 8], the format of cpuset.cpus and /sys/devices/system/cpu/*."""
+    cpus = []
+    for part in spec.strip().split(","):
+        if not part:
+            continue
+        lo, _, hi = part.partition("-")
+        cpus.extend(range(int(lo), int(hi or lo) + 1))
+    return cpus
+
+
+def cgroup_cpus(cgroup, root=CGROUP_ROOT):
+    with open(os.path.join(root, cgroup.strip("/"), "cpuset.cpus.effective"), "r", encoding="utf-8") as f:
+        return parse_cpulist(f.read())
+
+
+def load_partitions(groups, root=CGROUP_ROOT):
+    """
+    The "groups" of the "partitions" block -> [Partition]. A group names
+    its CPUs directly ("cpus": "0-3") or through a cgroup, whose effective
+    cpuset is read once here. Tasks are matched into the layer by "match"
+    (scx_layered syntax), which defaults to the cgroup.
+    """
+    out = []
+    owner = {}
+    for g in groups:
+        if "cgroup" in g:
+            cpus = cgroup_cpus(g["cgroup"], root)
+        else:
+            cpus = parse_cpulist(g["cpus"])
+        if not cpus:
+            raise ValueError(f"partition {g['name']} has no CPUs")
+        for c in cpus:
+            if c in owner:
+                raise ValueError(f"CPU {c} is in both {owner[c]} and {g['name']}")
+            owner[c] = g["name"]
+        match = g["match"] if "match" in g else [[{"CgroupPrefix": g["cgroup"].strip("/")}]]
+        out.append(Partition(g["name"], cpus, match, g.get("kind", "Confined")))
+    return out
+
+
+def partition_model(scoring, ncpus, total_cpus):
+    """
+    Thresholds are set for the whole machine; a partition gets its share
+    of each, so PARALLEL: null becomes the partition's CPU count.
+    """
+    model = ScoringModel.from_config(scoring, total_cpus)
+    share = ncpus / total_cpus
+    thresholds = {f: t * share for f, t in model.thresholds.items()}
+    return ScoringModel(thresholds, scoring.get("weights"), scoring.get("bias"), scoring.get("idle_level", 1.0))
+
+
+class PartitionLayout:
+    """
+    Classifies each CPU partition on its own counters and turns the
+    classifications into one scx_layered spec: a layer per partition with
+    the policy of its load, plus an open layer for everything else. A spec
+    file is written per combination of loads, so the scheduler's argv
+    tells which combination is running.
+    """
+
+    def __init__(self, partitions, binary, spec_prefix, scoring, total_cpus, hysteresis=None,
+                 policies=None, initial=SystemLoad.CPU):
+        self.partitions = partitions
+        self.binary = binary
+        self.spec_prefix = spec_prefix
+        self.policies = {name: dict(p, **(policies or {}).get(name, {})) for name, p in POLICIES.items()}
+        self.classifiers = {
+            p.name: LoadClassifier(partition_model(scoring, len(p.cpus), total_cpus), initial, **(hysteresis or {}))
+            for p in partitions
+        }
+        self.loads = {p.name: initial for p in partitions}
+
+    def configure(self, scoring, total_cpus, hysteresis=None):
+        for p in self.partitions:
+            self.classifiers[p.name].configure(partition_model(scoring, len(p.cpus), total_cpus),
+                                               **(hysteresis or {}))
+
+    def cpu_sets(self):
+        return {p.name: p.cpus for p in self.partitions}
+
+    def update(self, partition_rates):
+        """Classify every partition; returns the loads the spec should have now."""
+        for name, clf in self.classifiers.items():
+            self.loads[name] = clf.update(partition_rates.get(name, {}))
+        return dict(self.loads)
+
+    def force(self, loads):
+        for name, load in loads.items():
+            self.classifiers[name].force(load)
+        self.loads = dict(loads)
+
+    def spec(self, loads):
+        layers = []
+        for p in self.partitions:
+            load = loads[p.name]
+            body = {"util_range": UTIL_RANGE, "cpus_range": [len(p.cpus), len(p.cpus)]}
+            body.update(self.policies[load.name])
+            layers.append({"name": p.name, "comment": f"{load.name} on {len(p.cpus)} CPUs",
+                           "matches": p.match, "kind": {p.kind: body}})
+        layers.append({"name": "rest", "matches": [[]], "kind": {"Open": {}}})
+        return layers
+
+    def args(self, loads):
+        """Write the spec for loads and return scx_layered's arguments."""
+        path = f"{self.spec_prefix}-{'-'.join(loads[p.name].name for p in self.partitions)}.json"
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.spec(loads), f, indent=2)
+        os.replace(tmp, path)
+        return (f"f:{os.path.abspath(path)}",)
+
+    def stats(self):
+        return {p.name: {"cpus": len(p.cpus), "load": self.loads[p.name].name,
+                         "classifier": self.classifiers[p.name].stats()} for p in self.partitions}
@@ -0,0 +1,214 @@
+import json
+import os
+from datetime import datetime
+
+from system_load_enum import SystemLoad
+
+STATE_VERSION = 1
+
+
+def time_of_day(wall):
+    """Seconds since local midnight, and the day it belongs to."""
+    dt = datetime.fromtimestamp(wall)
+    return dt.hour * 3600 + dt.minute * 60 + dt.second + dt.microsecond / 1e6, dt.toordinal()
+
+
+class PhasePredictor:
+    """
+    Learns recurring load changes by time of day, so the scheduler for the
+    next phase can be started before the classifier notices it.
+
+    The day is cut into slots of slot_s seconds. For every (slot, load) it
+    keeps how many days the host was in that load during that slot, and
+    for every load it moved on to, how many of those days it did and at
+    what offset into the slot: a Markov chain over SystemLoad transitions
+    conditioned on the time of day. Counts decay by decay per day seen, so
+    a pattern that stops fades out.
+
+    advise() proposes the next load when a transition has happened on at
+    least min_count days, with probability >= confidence, and is due
+    within lead_s seconds. After a pre-switch, holding() tells the caller
+    to keep the new scheduler for hold_s seconds even though the load
+    has not changed yet; the prediction counts as a hit if the observed
+    load reaches the predicted one in that time.
+    """
+
+    def __init__(self, slot_s=900.0, lead_s=10.0, confidence=0.8, min_count=3, decay=0.9, hold_s=None):
+        self.configure(slot_s, lead_s, confidence, min_count, decay, hold_s)
+        # (slot, load) -> [visits, {next load: [count, mean offset in slot]}]
+        self.model = {}
+        self.phase = None
+        self.pending = None  # (target, from, armed at, expires)
+        self._instance = None
+        self._visited = set()
+        self._moved = set()
+        self._fired = set()
+        self.predictions = 0
+        self.hits = 0
+        self.misses = 0
+        self.lead_total = 0.0
+        self.last = None
+        self.dirty = False
+
+    def configure(self, slot_s=900.0, lead_s=10.0, confidence=0.8, min_count=3, decay=0.9, hold_s=None):
+        if not 0 < confidence <= 1 or not 0 < decay <= 1:
+            raise ValueError("confidence and decay must be in (0, 1]")
+        self.slot_s = slot_s
+        self.lead_s = lead_s
+        self.confidence = confidence
+        self.min_count = min_count
+        self.decay = decay
+        self.hold_s = 2 * lead_s if hold_s is None else hold_s
+
+    def _slot(self, wall):
+        tod, day = time_of_day(wall)
+        slot = int(tod // self.slot_s)
+        return slot, day, tod - slot * self.slot_s
+
+    def _visit(self, slot, day, load):
+        if (day, slot) != self._instance:
+            self._instance = (day, slot)
+            self._visited = set()
+            self._moved = set()
+        if load in self._visited:
+            return
+        self._visited.add(load)
+        entry = self.model.setdefault((slot, load), [0.0, {}])
+        entry[0] = entry[0] * self.decay + 1
+        for nxt in entry[1].values():
+            nxt[0] *= self.decay
+        self.dirty = True
+
+    def observe(self, load, wall):
+        """Feed the measured load for this tick (not a pre-switched one)."""
+        slot, day, offset = self._slot(wall)
+        self._visit(slot, day, load)
+        if self.phase is not None and load != self.phase:
+            # The previous phase may have run into this slot without a tick in it.
+            self._visit(slot, day, self.phase)
+            # Like visits, a transition counts once per day, so p stays <= 1
+            # for a load that flaps inside the slot.
+            if (self.phase, load) not in self._moved:
+                self._moved.add((self.phase, load))
+                nxt = self.model[(slot, self.phase)][1].setdefault(load, [0.0, 0.0])
+                nxt[0] += 1
+                nxt[1] += (offset - nxt[1]) / max(nxt[0], 1.0)
+        self.phase = load
+
+        if self.pending is not None:
+            target, prev, armed, expires = self.pending
+            if load == target:
+                self.hits += 1
+                self.lead_total += wall - armed
+                self.pending = None
+            elif wall > expires or load != prev:
+                self.misses += 1
+                self.pending = None
+
+    def _candidates(self, load, wall):
+        seen = set()
+        for t in (wall, wall + self.lead_s):
+            slot, day, offset = self._slot(t)
+            if slot in seen:
+                continue
+            seen.add(slot)
+            entry = self.model.get((slot, load))
+            if entry is None or entry[0] <= 0:
+                continue
+            start = t - offset
+            for nxt, (count, at) in entry[1].items():
+                p = count / entry[0]
+                due = start + at - wall
+                if nxt != load and count >= self.min_count and p >= self.confidence and 0 < due <= self.lead_s:
+                    yield p, nxt, (day, slot, load, nxt)
+
+    def advise(self, load, wall):
+        """The load to switch to ahead of time, or None. Arms the hold when it returns one."""
+        if self.pending is not None:
+            return None
+        best = max((c for c in self._candidates(load, wall) if c[2] not in self._fired), default=None,
+                   key=lambda c: c[0])
+        if best is None:
+            return None
+        p, nxt, key = best
+        self._fired.add(key)
+        if len(self._fired) > 256:
+            self._fired = {key}
+        self.pending = (nxt, load, wall, wall + self.hold_s)
+        self.predictions += 1
+        self.last = {"from": load.name, "to": nxt.name, "p": round(p, 3)}
+        return nxt
+
+    def holding(self, load, wall):
+        """True while a pre-switch away from load should be kept."""
+        return self.pending is not None and load == self.pending[1] and wall <= self.pending[3]
+
+    # ---- one dispatcher tick ----
+
+    def observe_tick(self, classifier, wall):
+        """observe() for a tick, after classifier.update()."""
+        # A pre-switch moves the classifier to the predicted load, so its
+        # output would confirm the prediction by itself; judge it by the
+        # unbiased pick until it resolves.
+        self.observe(classifier.current if self.pending is None else classifier.measured, wall)
+
+    def decide(self, classifier, running, wall):
+        """
+        With no switch in flight: (load to switch to or None, whether it was
+        predicted). A pre-switch moves the classifier along, so hysteresis
+        and min_dwell count from the predicted load as after a measured
+        switch; while it is held, the classifier is kept on the running load.
+        """
+        load = classifier.current
+        if load != running:
+            if self.holding(load, wall):
+                classifier.force(running)
+                return None, False
+            return load, False
+        ahead = self.advise(running, wall)
+        if ahead is not None:
+            classifier.force(ahead)
+        return ahead, ahead is not None
+
+    def stats(self):
+        done = self.hits + self.misses
+        return {
+            "predictions": self.predictions,
+            "hits": self.hits,
+            "misses": self.misses,
+            "accuracy": round(self.hits / done, 3) if done else None,
+            "mean_lead_s": round(self.lead_total / self.hits, 3) if self.hits else None,
+            "patterns": sum(1 for e in self.model.values() for c, _ in e[1].values() if c >= self.min_count),
+            "last": self.last,
+        }
+
+    # ---- persistence ----
+
+    def to_json(self):
+        model = []
+        for (slot, load), (visits, nxt) in sorted(self.model.items(), key=lambda kv: (kv[0][0], kv[0][1].value)):
+            model.append([slot, load.name, round(visits, 4),
+                          {n.name: [round(c, 4), round(at, 3)] for n, (c, at) in nxt.items()}])
+        return {"version": STATE_VERSION, "slot_s": self.slot_s, "model": model}
+
+    def load_json(self, state):
+        """Take over a saved model; one learned with another slot size is ignored."""
+        if state.get("version") != STATE_VERSION or state.get("slot_s") != self.slot_s:
+            return False
+        self.model = {(slot, SystemLoad[load]): [v, {SystemLoad[n]: list(c) for n, c in nxt.items()}]
+                      for slot, load, v, nxt in state["model"]}
+        return True
+
+    def save(self, path):
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.to_json(), f, separators=(",", ":"))
+        os.replace(tmp, path)
+        self.dirty = False
+
+    def load(self, path):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return self.load_json(json.load(f))
+        except (OSError, ValueError, KeyError, TypeError):
+            return False
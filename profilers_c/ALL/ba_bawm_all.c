@@ -0,0 +1,231 @@
+#include <errno.h>
+#include <stdio.h>
+#include <signal.h>
+#include <string.h>
+#include <unistd.h>
+#include <stdlib.h>
+#include <sys/syscall.h>
+#include <linux/perf_event.h>
+#include <bpf/bpf.h>
+#include <bpf/libbpf.h>
+#include "ba_bawm_all.skel.h"
+
+enum { PROBE_CPU, PROBE_IO, PROBE_MEM, PROBE_NET, PROBE_PARALLEL, NR_PROBES };
+static const char *probe_names[NR_PROBES] = { "cpu", "io", "mem", "net", "parallel" };
+#define DEFAULT_PROBES "cpu,io,mem,net,parallel"
+#define DEFAULT_RQ_HZ 99
+/* sample_every[] is indexed by the same keys as the counters (cpu..net). */
+#define NR_SAMPLED PROBE_PARALLEL
+
+static volatile sig_atomic_t exiting = 0;
+
+void handle_signal(int sig) {
+    exiting = 1;
+}
+
+static void usage(const char *prog) {
+    fprintf(stderr, "Usage: %s [-p probe[,probe...]] [-f hz] [-s [probe=]N[,...]]\n", prog);
+    fprintf(stderr, "  probes: cpu io mem net parallel, or all (default: %s)\n", DEFAULT_PROBES);
+    fprintf(stderr, "  -f hz   run-queue sampling rate for the parallel probe, which also\n"
+                    "          checks the dispatcher's trigger thresholds (default: %d)\n",
+            DEFAULT_RQ_HZ);
+    fprintf(stderr, "  -s N    also stream every Nth cpu/io/mem/net event per CPU to the\n"
+                    "          ba_bawm_events ring buffer, e.g. -s 64 or -s cpu=1000,net=16\n"
+                    "          (default: off)\n");
+}
+
+static int parse_sampling(char *list, __u32 every[NR_SAMPLED]) {
+    char *tok;
+
+    for (tok = strtok(list, ","); tok; tok = strtok(NULL, ",")) {
+        char *eq = strchr(tok, '=');
+        char *end;
+        unsigned long n;
+        int i;
+
+        n = strtoul(eq ? eq + 1 : tok, &end, 10);
+        if (*end || end == (eq ? eq + 1 : tok))
+            return -1;
+        if (!eq) {
+            for (i = 0; i < NR_SAMPLED; i++)
+                every[i] = n;
+            continue;
+        }
+        *eq = '\0';
+        for (i = 0; i < NR_SAMPLED; i++) {
+            if (!strcmp(tok, probe_names[i]))
+                break;
+        }
+        if (i == NR_SAMPLED) {
+            fprintf(stderr, "Unknown sampled probe: %s\n", tok);
+            return -1;
+        }
+        every[i] = n;
+    }
+    return 0;
+}
+
+/* The run-queue sampler runs on a CPU-clock timer on CPU 0 and reads every CPU's rq. */
+static struct bpf_link *attach_rq_sampler(struct bpf_program *prog, int hz) {
+    struct perf_event_attr attr = {
+        .type = PERF_TYPE_SOFTWARE,
+        .config = PERF_COUNT_SW_CPU_CLOCK,
+        .size = sizeof(attr),
+        .freq = 1,
+        .sample_freq = hz,
+    };
+    struct bpf_link *link;
+    int fd;
+
+    fd = syscall(__NR_perf_event_open, &attr, -1, 0, -1, PERF_FLAG_FD_CLOEXEC);
+    if (fd < 0)
+        return NULL;
+    link = bpf_program__attach_perf_event(prog, fd);
+    if (!link)
+        close(fd);
+    return link;
+}
+
+/*
+ * libbpf refuses to reuse a pinned map whose size differs from the one
+ * being loaded, e.g. the events ring of an earlier run with another -s.
+ * Drop such a pin so a fresh map is created and pinned in its place.
+ */
+static void unpin_if_resized(struct bpf_map *map) {
+    const char *path = bpf_map__pin_path(map);
+    struct bpf_map_info info = {};
+    __u32 len = sizeof(info);
+    int fd;
+
+    if (!path)
+        return;
+    fd = bpf_obj_get(path);
+    if (fd < 0)
+        return;
+    if (!bpf_map_get_info_by_fd(fd, &info, &len) && info.max_entries != bpf_map__max_entries(map)) {
+        fprintf(stderr, "%s was pinned with %u entries, replacing it with %u\n",
+                path, info.max_entries, bpf_map__max_entries(map));
+        unlink(path);
+    }
+    close(fd);
+}
+
+static int parse_probes(char *list, __u32 *mask) {
+    char *tok;
+
+    *mask = 0;
+    for (tok = strtok(list, ","); tok; tok = strtok(NULL, ",")) {
+        int i;
+
+        if (!strcmp(tok, "all")) {
+            *mask = (1u << NR_PROBES) - 1;
+            continue;
+        }
+        for (i = 0; i < NR_PROBES; i++) {
+            if (!strcmp(tok, probe_names[i]))
+                break;
+        }
+        if (i == NR_PROBES) {
+            fprintf(stderr, "Unknown probe: %s\n", tok);
+            return -1;
+        }
+        *mask |= 1u << i;
+    }
+    return *mask ? 0 : -1;
+}
+
+int main(int argc, char **argv) {
+
+    struct ba_bawm_all_skel_bpf *skel;
+    struct bpf_link *rq_link = NULL;
+    char probes[64] = DEFAULT_PROBES;
+    int rq_hz = DEFAULT_RQ_HZ;
+    __u32 every[NR_SAMPLED] = {};
+    __u32 mask;
+    int opt, err, i, streaming = 0;
+
+    while ((opt = getopt(argc, argv, "p:f:s:h")) != -1) {
+        switch (opt) {
+        case 'p':
+            snprintf(probes, sizeof(probes), "%s", optarg);
+            break;
+        case 'f':
+            rq_hz = atoi(optarg);
+            if (rq_hz <= 0) {
+                usage(argv[0]);
+                return 1;
+            }
+            break;
+        case 's':
+            if (parse_sampling(optarg, every)) {
+                usage(argv[0]);
+                return 1;
+            }
+            break;
+        default:
+            usage(argv[0]);
+            return opt == 'h' ? 0 : 1;
+        }
+    }
+    if (parse_probes(probes, &mask)) {
+        usage(argv[0]);
+        return 1;
+    }
+
+    signal(SIGINT, handle_signal);
+    signal(SIGTERM, handle_signal);
+
+    libbpf_set_strict_mode(LIBBPF_STRICT_ALL);
+
+    skel = ba_bawm_all_skel_bpf__open();
+    if (!skel) {
+        fprintf(stderr, "Failed to open BPF skeleton\n");
+        return 1;
+    }
+
+    /* Disabled probes are never loaded, so they cost nothing at all. */
+    skel->rodata->nr_cpus = libbpf_num_possible_cpus();
+    for (i = 0; i < NR_SAMPLED; i++) {
+        skel->rodata->sample_every[i] = every[i];
+        streaming |= every[i] != 0;
+    }
+    /* Without -s nothing is ever emitted; keep the ring at its minimum size. */
+    if (!streaming)
+        bpf_map__set_max_entries(skel->maps.ba_bawm_events, getpagesize());
+    unpin_if_resized(skel->maps.ba_bawm_events);
+    bpf_program__set_autoload(skel->progs.handle_sched_switch, mask & (1 << PROBE_CPU));
+    bpf_program__set_autoload(skel->progs.sample_runqueues, mask & (1 << PROBE_PARALLEL));
+    bpf_program__set_autoload(skel->progs.handle_block_rq_issue, mask & (1 << PROBE_IO));
+    bpf_program__set_autoload(skel->progs.handle_mm_page_alloc, mask & (1 << PROBE_MEM));
+    bpf_program__set_autoload(skel->progs.handle_net_dev_queue, mask & (1 << PROBE_NET));
+
+    err = ba_bawm_all_skel_bpf__load(skel);
+    if (err) {
+        fprintf(stderr, "Failed to load BPF skeleton\n");
+        goto cleanup;
+    }
+
+    err = ba_bawm_all_skel_bpf__attach(skel);
+    if (err) {
+        fprintf(stderr, "Failed to attach BPF programs\n");
+        goto cleanup;
+    }
+
+    if (mask & (1 << PROBE_PARALLEL)) {
+        rq_link = attach_rq_sampler(skel->progs.sample_runqueues, rq_hz);
+        if (!rq_link) {
+            err = -errno;
+            fprintf(stderr, "Failed to attach run-queue sampler\n");
+            goto cleanup;
+        }
+    }
+
+    while (!exiting) {
+        sleep(1);
+    }
+
+    cleanup:
+        bpf_link__destroy(rq_link);
+        ba_bawm_all_skel_bpf__destroy(skel);
+        return err < 0 ? -err : 0;
+}
@@ -0,0 +1,282 @@
+#include "../vmlinux.h"
+#include <bpf/bpf_helpers.h>
+#include <bpf/bpf_tracing.h>
+#include <bpf/bpf_core_read.h>
+
+char LICENSE[] SEC("license") = "GPL";
+
+/* Keys match SystemLoad in system_load_enum.py. */
+#define KEY_CPU         0
+#define KEY_IO          1
+#define KEY_MEM         2
+#define KEY_NET         3
+#define NR_KEYS         4
+#define KEY_PARALLEL    4
+
+/* ba_bawm_rq layout; keep in sync with rq_histogram.py. */
+#define RQ_BUCKETS      32
+#define RQ_SUM          RQ_BUCKETS
+#define RQ_COUNT        (RQ_BUCKETS + 1)
+#define MAX_CPUS        1024
+
+/* ba_bawm_trig_cfg layout; keep in sync with trigger.py. */
+#define TRIG_WINDOW     (KEY_PARALLEL + 1)
+#define TRIG_SLOTS      (TRIG_WINDOW + 1)
+#define NSEC_PER_SEC    1000000000ULL
+
+struct {
+    __uint(type, BPF_MAP_TYPE_PERCPU_ARRAY);
+    __uint(max_entries, 8);
+    __type(key, __u32);
+    __type(value, __u64);
+    __uint(pinning, LIBBPF_PIN_BY_NAME);
+} ba_bawm SEC(".maps");
+
+/*
+ * Log2 histogram of system-wide runnable tasks, sampled from one CPU by a
+ * perf timer. Only that CPU writes, so a plain array is enough.
+ */
+struct {
+    __uint(type, BPF_MAP_TYPE_ARRAY);
+    __uint(max_entries, RQ_COUNT + 1);
+    __type(key, __u32);
+    __type(value, __u64);
+    __uint(pinning, LIBBPF_PIN_BY_NAME);
+} ba_bawm_rq SEC(".maps");
+
+/*
+ * Runnable tasks per CPU, summed over the same samples, followed by the
+ * number of samples; keep in sync with rq_histogram.py. The dispatcher
+ * adds up a CPU partition's slots to get its own PARALLEL figure.
+ */
+struct {
+    __uint(type, BPF_MAP_TYPE_ARRAY);
+    __uint(max_entries, MAX_CPUS + 1);
+    __type(key, __u32);
+    __type(value, __u64);
+    __uint(pinning, LIBBPF_PIN_BY_NAME);
+} ba_bawm_rq_cpu SEC(".maps");
+
+/* Sampled per-task records for attribution; layout matches event_stream.py. */
+struct event {
+    __u64 ts_ns;
+    __u64 cgroup_id;
+    __u32 pid;
+    __u16 cpu;
+    __u16 type;
+};
+
+struct {
+    __uint(type, BPF_MAP_TYPE_RINGBUF);
+    __uint(max_entries, 1 << 20);
+    __uint(pinning, LIBBPF_PIN_BY_NAME);
+} ba_bawm_events SEC(".maps");
+
+/*
+ * Trigger mode. The dispatcher writes a threshold per key (events/second;
+ * runnable tasks for PARALLEL; 0 = not watched) and a window length in ns
+ * (0 = off). Each window the run-queue timer compares the rates against
+ * the thresholds and sends a notification for every crossing, either way.
+ */
+struct {
+    __uint(type, BPF_MAP_TYPE_ARRAY);
+    __uint(max_entries, TRIG_SLOTS);
+    __type(key, __u32);
+    __type(value, __u64);
+    __uint(pinning, LIBBPF_PIN_BY_NAME);
+} ba_bawm_trig_cfg SEC(".maps");
+
+/* Notifications; layout matches trigger.py. Submitted with a wakeup. */
+struct trigger {
+    __u64 ts_ns;
+    __u64 value;
+    __u32 key;
+    __u32 above;
+};
+
+struct {
+    __uint(type, BPF_MAP_TYPE_RINGBUF);
+    __uint(max_entries, 1 << 12);
+    __uint(pinning, LIBBPF_PIN_BY_NAME);
+} ba_bawm_trig SEC(".maps");
+
+/* Trigger window state; only the run-queue timer touches it. */
+static __u64 trig_start;
+static __u64 trig_base[NR_KEYS];
+static __u64 trig_runnable;
+static __u64 trig_samples;
+static __u32 trig_above;
+
+extern struct rq runqueues __ksym;
+
+/* Set by the loader before load. */
+const volatile __u32 nr_cpus = 1;
+/* Emit every Nth event of each type per CPU; 0 = counters only. */
+const volatile __u32 sample_every[NR_KEYS] = {};
+
+static __always_inline void emit(__u32 key) {
+    struct event *e;
+
+    e = bpf_ringbuf_reserve(&ba_bawm_events, sizeof(*e), 0);
+    if (!e)
+        return;
+    e->ts_ns = bpf_ktime_get_ns();
+    e->cgroup_id = bpf_get_current_cgroup_id();
+    e->pid = bpf_get_current_pid_tgid() >> 32;
+    e->cpu = bpf_get_smp_processor_id();
+    e->type = key;
+    /* The consumer polls once per tick, so never wake it. */
+    bpf_ringbuf_submit(e, BPF_RB_NO_WAKEUP);
+}
+
+static __always_inline void count(__u32 key) {
+    __u64 *val;
+
+    val = bpf_map_lookup_elem(&ba_bawm, &key);
+    if (!val)
+        return;
+    (*val)++;
+    if (sample_every[key] && *val % sample_every[key] == 0)
+        emit(key);
+}
+
+static __always_inline void rq_add(__u32 slot, __u64 n) {
+    __u64 *val;
+
+    val = bpf_map_lookup_elem(&ba_bawm_rq, &slot);
+    if (val)
+        *val += n;
+}
+
+static __always_inline void rq_cpu_add(__u32 slot, __u64 n) {
+    __u64 *val;
+
+    val = bpf_map_lookup_elem(&ba_bawm_rq_cpu, &slot);
+    if (val)
+        *val += n;
+}
+
+static __always_inline __u32 log2_bucket(__u64 v) {
+    __u32 r = 0;
+
+    if (!v)
+        return 0;
+    if (v >> 32) { v >>= 32; r += 32; }
+    if (v >> 16) { v >>= 16; r += 16; }
+    if (v >> 8) { v >>= 8; r += 8; }
+    if (v >> 4) { v >>= 4; r += 4; }
+    if (v >> 2) { v >>= 2; r += 2; }
+    if (v >> 1) { r += 1; }
+    r += 1;
+    return r < RQ_BUCKETS ? r : RQ_BUCKETS - 1;
+}
+
+static __always_inline __u64 total(__u32 key) {
+    __u64 sum = 0;
+    __u32 i;
+
+    for (i = 0; i < MAX_CPUS; i++) {
+        __u64 *val;
+
+        if (i >= nr_cpus)
+            break;
+        val = bpf_map_lookup_percpu_elem(&ba_bawm, &key, i);
+        if (val)
+            sum += *val;
+    }
+    return sum;
+}
+
+static __always_inline void check_triggers(__u64 runnable) {
+    __u32 slot = TRIG_WINDOW;
+    __u64 *window, now, elapsed;
+    __u32 key;
+
+    window = bpf_map_lookup_elem(&ba_bawm_trig_cfg, &slot);
+    if (!window || !*window)
+        return;
+    trig_runnable += runnable;
+    trig_samples++;
+    now = bpf_ktime_get_ns();
+    elapsed = now - trig_start;
+    if (elapsed < *window)
+        return;
+
+    for (key = 0; key <= KEY_PARALLEL; key++) {
+        struct trigger t;
+        __u64 *thresh, value, cur;
+        __u32 above;
+
+        if (key == KEY_PARALLEL) {
+            value = trig_runnable / trig_samples;
+        } else {
+            cur = total(key);
+            value = (cur - trig_base[key & (NR_KEYS - 1)]) * NSEC_PER_SEC / elapsed;
+            trig_base[key & (NR_KEYS - 1)] = cur;
+        }
+        thresh = bpf_map_lookup_elem(&ba_bawm_trig_cfg, &key);
+        if (!thresh || !*thresh)
+            continue;
+        above = value >= *thresh;
+        if (above == !!(trig_above & (1u << key)))
+            continue;
+        trig_above ^= 1u << key;
+        t.ts_ns = now;
+        t.value = value;
+        t.key = key;
+        t.above = above;
+        bpf_ringbuf_output(&ba_bawm_trig, &t, sizeof(t), 0);
+    }
+    trig_start = now;
+    trig_runnable = 0;
+    trig_samples = 0;
+}
+
+SEC("tracepoint/sched/sched_switch")
+int handle_sched_switch(struct trace_event_raw_sched_switch *ctx) {
+    count(KEY_CPU);
+    return 0;
+}
+
+SEC("perf_event")
+int sample_runqueues(struct bpf_perf_event_data *ctx) {
+    __u64 runnable = 0;
+    __u32 i;
+
+    for (i = 0; i < MAX_CPUS; i++) {
+        struct rq *rq;
+
+        if (i >= nr_cpus)
+            break;
+        rq = bpf_per_cpu_ptr(&runqueues, i);
+        if (rq) {
+            runnable += rq->nr_running;
+            rq_cpu_add(i, rq->nr_running);
+        }
+    }
+
+    rq_add(log2_bucket(runnable), 1);
+    rq_add(RQ_SUM, runnable);
+    rq_add(RQ_COUNT, 1);
+    rq_cpu_add(MAX_CPUS, 1);
+    check_triggers(runnable);
+    return 0;
+}
+
+SEC("tracepoint/block/block_rq_issue")
+int handle_block_rq_issue(struct trace_event_raw_block_rq_issue *ctx) {
+    count(KEY_IO);
+    return 0;
+}
+
+SEC("tracepoint/kmem/mm_page_alloc")
+int handle_mm_page_alloc(struct trace_event_raw_kmem_mm_page_alloc *ctx) {
+    count(KEY_MEM);
+    return 0;
+}
+
+SEC("tracepoint/net/net_dev_queue")
+int handle_net_dev_queue(struct trace_event_raw_net_dev_template *ctx) {
+    count(KEY_NET);
+    return 0;
+}
@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+Replay a dispatcher trace (see "RECORD_TRACE") through the same sampler,
+scoring model and classifier the dispatcher uses, without BPF or root.
+
+    python replay.py config/tests/vm1-trace.bbtr
+    python replay.py trace.bbtr --config dispatcher_config_alt.json --json
+
+With --config the scoring, hysteresis and scheduler mapping come from that
+file instead of the config recorded in the trace, so threshold, weight and
+mapping changes can be compared offline. Scheduler switches are assumed to
+succeed.
+
+With --predict a phase predictor (the config's "predict" block, or the
+defaults) learns from the trace as it goes, as it would in the dispatcher,
+and the report says how often it was right and how much earlier the right
+scheduler ran than in reactive mode. It starts with an empty model, so
+the trace should span several days of the pattern.
+"""
+import argparse
+import collections
+import json
+import sys
+import time
+from datetime import datetime
+
+from load_classifier import LoadClassifier
+from phase_predictor import PhasePredictor
+from sampler import RateSampler
+from scoring import ScoringModel
+from system_load_enum import SystemLoad
+from tick_trace import SWITCH_FAILED, SWITCHED, TraceSource, read_trace
+
+
+def replay(path, config=None, cpus=None, predict=False):
+    src = TraceSource()
+    now = [0.0]
+    clock = lambda: now[0]
+
+    meta = None
+    sampler = classifier = None
+    scheds = {}
+    curr = None
+    prev_t = None
+    ticks = matched = restarts = recorded_switches = recorded_failures = 0
+    sched_time = collections.Counter()
+    first_t = last_t = 0.0
+
+    # Predicting: wall clock of a monotonic tick time, the classifier and
+    # load the dispatcher would run with the predictor, and when each load
+    # last showed up in the unsmoothed rates (the phase's actual start).
+    predictor = pclassifier = None
+    wall_at = None
+    ahead = ahead_since = None
+    raw_prev = None
+    raw_onset = {}
+    saved = early = 0.0
+    saved_hits = ahead_switches = 0
+
+    started = time.perf_counter()
+    for kind, rec in read_trace(path):
+        if kind == "meta":
+            if "monotonic" in rec:
+                wall_at = (datetime.fromisoformat(rec["wall_time"]).timestamp(), rec["monotonic"])
+            if meta is None:
+                meta = rec
+                cfg = config or rec["config"]
+                if predict:
+                    params = dict(cfg.get("predict") or {})
+                    params.pop("path", None)
+                    predictor = PhasePredictor(**params)
+            elif config is None:
+                # A reload: the dispatcher applies the new config in place.
+                cfg = rec["config"]
+                if classifier is not None:
+                    model = ScoringModel.from_config(cfg.get("scoring", {}), cpus or meta["cpus"])
+                    classifier.configure(model, **cfg.get("hysteresis", {}))
+                    if pclassifier is not None:
+                        pclassifier.configure(model, **cfg.get("hysteresis", {}))
+                    sampler.rq_stat = cfg.get("PARALLEL_STAT", "p50")
+            scheds = {SystemLoad[k]: v for k, v in cfg["scheds"].items()}
+            continue
+
+        tk = rec
+        if meta is None:
+            raise ValueError(f"{path}: tick before metadata")
+        if sampler is None:
+            # Build everything at the start of the first window, as the dispatcher does.
+            now[0] = first_t = tk.t - tk.window
+            curr = SystemLoad[meta.get("initial", "CPU")]
+            model = ScoringModel.from_config(cfg.get("scoring", {}), cpus or meta["cpus"])
+            sampler = RateSampler(src, rq=src if meta.get("rq") else None,
+                                  rq_stat=cfg.get("PARALLEL_STAT", "p50"), clock=clock)
+            classifier = LoadClassifier(model, curr, clock=clock, **cfg.get("hysteresis", {}))
+            prev_t = first_t
+            ahead = curr
+            if predictor is not None:
+                pclassifier = LoadClassifier(model, curr, clock=clock, **cfg.get("hysteresis", {}))
+            if wall_at is None:
+                # Older traces: the wall time was taken when the first window began.
+                wall_at = (datetime.fromisoformat(meta["wall_time"]).timestamp(), first_t)
+
+        now[0] = last_t = tk.t
+        src.tick = tk
+        rates = sampler.sample()
+        new = classifier.update(rates)
+        sched_time[scheds.get(curr, "?")] += tk.t - prev_t
+        prev_t = tk.t
+
+        if predictor is not None:
+            wall = wall_at[0] + tk.t - wall_at[1]
+            pclassifier.update(rates)
+            predictor.observe_tick(pclassifier, wall)
+            raw = classifier.model.pick(classifier.model.scores([rates.get(s.value, 0.0)
+                                                                 for s in LoadClassifier.LOADS]))
+            if raw != raw_prev:
+                raw_onset[raw] = tk.t
+                raw_prev = raw
+            if new != curr and new == ahead and ahead_since is not None:
+                # Reactive mode only gets here now; the predictor was already there.
+                onset = min(raw_onset.get(new, tk.t), tk.t)
+                saved += tk.t - max(ahead_since, onset)
+                early += max(0.0, onset - ahead_since)
+                saved_hits += 1
+            target, predicted = predictor.decide(pclassifier, ahead, wall)
+            if target is not None:
+                ahead, ahead_since = target, tk.t if predicted else None
+                ahead_switches += 1
+
+        if new != curr:
+            if scheds.get(new) != scheds.get(curr):
+                restarts += 1
+            curr = new
+
+        ticks += 1
+        matched += curr == tk.load
+        recorded_switches += tk.result == SWITCHED
+        recorded_failures += tk.result == SWITCH_FAILED
+    elapsed = time.perf_counter() - started
+
+    if classifier is None:
+        raise ValueError(f"{path}: no ticks recorded")
+    duration = last_t - first_t
+    stats = classifier.stats()
+    report = {
+        "ticks": ticks,
+        "duration_s": round(duration, 3),
+        "switches": stats["switches"],
+        "suppressed": stats["suppressed"],
+        "switches_per_min": round(stats["switches"] * 60.0 / duration, 3) if duration > 0 else 0.0,
+        "scheduler_restarts": restarts,
+        "time_in_state": stats["time_in_state"],
+        "time_per_scheduler": {k: round(v, 3) for k, v in sched_time.items()},
+        "recorded": {
+            "switches": recorded_switches,
+            "failed_switches": recorded_failures,
+            "agreement": round(matched / ticks, 4),
+        },
+        "replay_s": round(elapsed, 3),
+        "speedup": round(duration / elapsed, 1) if elapsed > 0 else None,
+    }
+    if predictor is not None:
+        report["predictor"] = dict(
+            predictor.stats(),
+            switches=ahead_switches,
+            saved_s=round(saved, 3),
+            saved_per_hit_s=round(saved / saved_hits, 3) if saved_hits else None,
+            early_s=round(early, 3),
+        )
+    return report
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("trace")
+    ap.add_argument("--config", help="dispatcher config to replay with instead of the recorded one")
+    ap.add_argument("--cpus", type=int, help="CPU count for the PARALLEL threshold (default: recorded)")
+    ap.add_argument("--predict", action="store_true", help="also replay with the phase predictor")
+    ap.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = ap.parse_args()
+
+    config = None
+    if args.config:
+        with open(args.config, "r", encoding="utf-8") as f:
+            config = json.load(f)
+
+    try:
+        report = replay(args.trace, config, args.cpus, args.predict)
+    except (OSError, ValueError) as e:
+        print(f"replay: {e}", file=sys.stderr)
+        return 1
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return 0
+
+    print(f"{report['ticks']} ticks, {report['duration_s']:.1f}s of trace replayed in "
+          f"{report['replay_s']:.3f}s ({report['speedup']}x)")
+    print(f"switches: {report['switches']} ({report['switches_per_min']}/min), "
+          f"suppressed: {report['suppressed']}, scheduler restarts: {report['scheduler_restarts']}")
+    print(f"recorded: {report['recorded']['switches']} switches, "
+          f"{report['recorded']['failed_switches']} failed, "
+          f"agreement {report['recorded']['agreement']:.1%}")
+    if "predictor" in report:
+        pr = report["predictor"]
+        acc = "n/a" if pr["accuracy"] is None else f"{pr['accuracy']:.1%}"
+        print(f"predictor: {pr['predictions']} predictions, {pr['hits']} hits, {pr['misses']} misses "
+              f"(accuracy {acc}), {pr['switches']} switches")
+        print(f"  right scheduler {pr['saved_s']:.1f}s earlier than reactive "
+              f"({pr['saved_per_hit_s'] or 0:.2f}s per change), {pr['early_s']:.1f}s switched before the change")
+    print("time in state:")
+    for name, t in sorted(report["time_in_state"].items(), key=lambda kv: -kv[1]):
+        print(f"  {name:<10} {t:10.1f}s")
+    print("time per scheduler:")
+    for name, t in sorted(report["time_per_scheduler"].items(), key=lambda kv: -kv[1]):
+        print(f"  {name:<40} {t:10.1f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,132 @@
+from bpf_map import BATCH_UNSUPPORTED, BpfMap, u32_bytes, u64
+
+RQ_PIN_PATH = "/sys/fs/bpf/ba_bawm_rq"
+RQ_CPU_PIN_PATH = "/sys/fs/bpf/ba_bawm_rq_cpu"
+
+# Layout of the ba_bawm_rq array (see profilers_c/ALL/ba_bawm_all_skel.bpf.c):
+# slots [0, RQ_BUCKETS) are log2 buckets of system-wide runnable tasks per
+# sample (bucket 0 = 0 tasks, bucket b = [2^(b-1), 2^b - 1]), followed by the
+# sum of all samples and the number of samples. Every slot is monotonic.
+RQ_BUCKETS = 32
+RQ_SUM = RQ_BUCKETS
+RQ_COUNT = RQ_BUCKETS + 1
+
+# ba_bawm_rq_cpu: runnable tasks on each CPU summed over the same samples
+# (slots [0, MAX_CPUS)), then the number of samples.
+MAX_CPUS = 1024
+
+_U64 = (1 << 64) - 1
+
+
+def bucket_range(b):
+    if b == 0:
+        return 0, 0
+    return 1 << (b - 1), (1 << b) - 1
+
+
+def percentile(buckets, q):
+    """Estimate the q-quantile (0..1) from log2 bucket counts, interpolating inside a bucket."""
+    total = sum(buckets)
+    if total == 0:
+        return 0.0
+    rank = q * total
+    seen = 0
+    for b, n in enumerate(buckets):
+        if n and seen + n >= rank:
+            lo, hi = bucket_range(b)
+            return lo + (hi - lo) * (rank - seen) / n
+        seen += n
+    return float(bucket_range(len(buckets) - 1)[1])
+
+
+def summarize(buckets, total, count):
+    return {
+        "samples": count,
+        "mean": total / count if count else 0.0,
+        "p50": percentile(buckets, 0.50),
+        "p99": percentile(buckets, 0.99),
+        "buckets": list(buckets),
+    }
+
+
+class RunqueueHistogram:
+    """
+    Windowed view of the runnable-task histogram. window() returns
+    {samples, mean, p50, p99, buckets} for the samples taken since the
+    previous call. The histogram itself is read in one batched lookup.
+    """
+
+    def __init__(self, read_slots):
+        self._read = read_slots
+        self._last = self._read()
+
+    def window(self) -> dict:
+        cur = self._read()
+        delta = [(c - p) & _U64 for c, p in zip(cur, self._last)]
+        self._last = cur
+        return summarize(delta[:RQ_BUCKETS], delta[RQ_SUM], delta[RQ_COUNT])
+
+
+class RunqueueCpus:
+    """Per-CPU view of the same samples: window() -> mean runnable tasks on each CPU."""
+
+    def __init__(self, read_slots):
+        self._read = read_slots
+        self._last = self._read()
+
+    def window(self) -> list:
+        cur = self._read()
+        delta = [(c - p) & _U64 for c, p in zip(cur, self._last)]
+        self._last = cur
+        samples = delta[-1]
+        return [d / samples if samples else 0.0 for d in delta[:-1]]
+
+
+class FakeRunqueueHistogram(RunqueueHistogram):
+    """Feed raw runnable counts with add(); for tests and replay."""
+
+    def __init__(self):
+        self.slots = [0] * (RQ_COUNT + 1)
+        super().__init__(lambda: list(self.slots))
+
+    def add(self, runnable, n=1):
+        b = min(runnable.bit_length(), RQ_BUCKETS - 1)
+        self.slots[b] += n
+        self.slots[RQ_SUM] += runnable * n
+        self.slots[RQ_COUNT] += n
+
+
+def _slot_reader(m, n):
+    def read_slots():
+        slots = [0] * n
+        try:
+            items = m.lookup_batch()
+        except OSError as e:
+            if e.errno not in BATCH_UNSUPPORTED:
+                raise
+            items = [(u32_bytes(i), m.lookup(u32_bytes(i))) for i in range(len(slots))]
+        for k, v in items:
+            idx = u64(k)
+            if idx < len(slots) and v is not None:
+                slots[idx] = u64(v)
+        return slots
+
+    return read_slots
+
+
+def open_rq_histogram(path=RQ_PIN_PATH):
+    """Returns None when the parallel probe (and so the pinned map) isn't running."""
+    try:
+        m = BpfMap.from_pinned(path)
+    except FileNotFoundError:
+        return None
+    return RunqueueHistogram(_slot_reader(m, RQ_COUNT + 1))
+
+
+def open_rq_cpus(path=RQ_CPU_PIN_PATH):
+    """Returns None without the parallel probe, or with profilers built before the map existed."""
+    try:
+        m = BpfMap.from_pinned(path)
+    except FileNotFoundError:
+        return None
+    return RunqueueCpus(_slot_reader(m, MAX_CPUS + 1))
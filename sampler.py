@@ -0,0 +1,134 @@
+import time
+
+from system_load_enum import SystemLoad
+
+
+class RateSampler:
+    """
+    Turns CounterSource windows into events/second using monotonic time,
+    so a late tick no longer inflates the counts it is compared against.
+
+    If a run-queue histogram is given, PARALLEL is set to the chosen
+    statistic ("mean", "p50" or "p99") of system-wide runnable tasks over
+    the same window; it is a task count, not a rate.
+
+    With partitions ({name: [cpu, ...]}) the counters are read per CPU
+    slot and partition_rates holds each partition's rates as well. A
+    partition's PARALLEL is the mean number of runnable tasks on its CPUs
+    (from rq_cpus), since the histogram only covers the whole machine.
+    """
+
+    def __init__(self, source, rq=None, rq_stat="p50", partitions=None, rq_cpus=None,
+                 clock=time.monotonic):
+        self.source = source
+        self.rq = rq
+        self.rq_stat = rq_stat
+        self.rq_stats = None
+        self.partitions = partitions
+        self.rq_cpus = rq_cpus
+        self.partition_rates = {}
+        self.clock = clock
+        # Drop whatever accumulated before we started so the first window is clean.
+        if self.partitions is None:
+            self.source.snapshot()
+        else:
+            self.source.snapshot_cpus()
+            if self.rq_cpus is not None:
+                self.rq_cpus.window()
+        if self.rq is not None:
+            self.rq.window()
+        self.last = self.clock()
+        self.window = 0.0
+        self.counts = {}
+
+    def sample(self) -> dict:
+        if self.partitions is None:
+            snap = self.source.snapshot()
+        else:
+            per_cpu = self.source.snapshot_cpus()
+            snap = {k: sum(v) for k, v in per_cpu.items()}
+        now = self.clock()
+        self.window = max(now - self.last, 1e-6)
+        self.last = now
+        self.counts = snap
+        rates = {k: v / self.window for k, v in snap.items() if k != SystemLoad.PARALLEL.value}
+        if self.rq is not None:
+            self.rq_stats = self.rq.window()
+            rates[SystemLoad.PARALLEL.value] = self.rq_stats[self.rq_stat]
+        if self.partitions is not None:
+            self._split(per_cpu)
+        return rates
+
+    def _split(self, per_cpu):
+        runnable = self.rq_cpus.window() if self.rq_cpus is not None else None
+        for name, cpus in self.partitions.items():
+            rates = {k: sum(v[c] for c in cpus if c < len(v)) / self.window
+                     for k, v in per_cpu.items() if k != SystemLoad.PARALLEL.value}
+            if runnable is not None:
+                rates[SystemLoad.PARALLEL.value] = sum(runnable[c] for c in cpus if c < len(runnable))
+            self.partition_rates[name] = rates
+
+
+class AdaptiveCadence:
+    """
+    Sampling interval that tightens to min_interval whenever the
+    classification changes or a rate moves by more than change_ratio,
+    and backs off geometrically towards max_interval while things are stable.
+    """
+
+    def __init__(self, min_interval=0.1, max_interval=3.0, backoff=1.5,
+                 change_ratio=0.5, rate_floor=50.0, clock=time.monotonic, sleep=time.sleep):
+        self.clock = clock
+        self._sleep = sleep
+        self.interval = min_interval
+        self.configure(min_interval, max_interval, backoff, change_ratio, rate_floor)
+
+        self._prev_rates = {}
+        self._prev_class = None
+        self._deadline = self.clock()
+
+    def configure(self, min_interval=0.1, max_interval=3.0, backoff=1.5, change_ratio=0.5, rate_floor=50.0):
+        """Change the parameters mid-run; the current interval is clamped into the new range."""
+        if not 0 < min_interval <= max_interval:
+            raise ValueError("need 0 < min_interval <= max_interval")
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.change_ratio = change_ratio
+        self.rate_floor = rate_floor
+        self.interval = min(max(self.interval, min_interval), max_interval)
+
+    def _moved(self, rates):
+        for k in rates.keys() | self._prev_rates.keys():
+            prev = self._prev_rates.get(k, 0.0)
+            if abs(rates.get(k, 0.0) - prev) > self.change_ratio * max(prev, self.rate_floor):
+                return True
+        return False
+
+    def update(self, rates, classification) -> float:
+        if classification != self._prev_class or self._moved(rates):
+            self.interval = self.min_interval
+        else:
+            self.interval = min(self.interval * self.backoff, self.max_interval)
+        self._prev_rates = dict(rates)
+        self._prev_class = classification
+        return self.interval
+
+    def tighten(self):
+        """Something changed outside a tick (a trigger fired): sample at min_interval again."""
+        self.interval = self.min_interval
+
+    def delay(self) -> float:
+        """Seconds until the next deadline; deadlines don't accumulate drift."""
+        now = self.clock()
+        self._deadline += self.interval
+        if self._deadline < now:
+            # Fell behind (slow tick); restart the schedule from now.
+            self._deadline = now
+            return 0.0
+        return self._deadline - now
+
+    def wait(self):
+        delay = self.delay()
+        if delay > 0:
+            self._sleep(delay)
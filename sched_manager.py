@@ -0,0 +1,281 @@
+import asyncio
+import collections
+import os
+import signal
+import subprocess
+import time
+
+SCX_SYSFS = "/sys/kernel/sched_ext"
+
+
+class TransitionPredictor:
+    """First-order Markov model over scheduler switches."""
+
+    def __init__(self):
+        self.counts = collections.defaultdict(collections.Counter)
+        self.totals = collections.Counter()
+
+    def observe(self, prev, new):
+        if prev is not None and prev != new:
+            self.counts[prev][new] += 1
+        self.totals[new] += 1
+
+    def predict(self, current, k=1):
+        ranked = [b for b, _ in self.counts[current].most_common() if b != current]
+        for b, _ in self.totals.most_common():
+            if b != current and b not in ranked:
+                ranked.append(b)
+        return ranked[:k]
+
+
+def ops_name(binary):
+    """scx_bpfland -> bpfland, which is what root/ops reports once attached."""
+    name = os.path.basename(binary)
+    return name[len("scx_"):] if name.startswith("scx_") else name
+
+
+class SchedulerManager:
+    """
+    Owns the running sched_ext scheduler process.
+
+    switch() stops the current scheduler with SIGINT (escalating to SIGTERM
+    and SIGKILL after stop_timeout), waits for sched_ext to report the old
+    ops detached, starts the new binary and confirms it attached through
+    <sysfs>/state and <sysfs>/root/ops. Failed attaches are retried and
+    then rolled back to the previous binary. Every child is reaped.
+
+    With prewarm=N the N most likely next schedulers (from past switches)
+    are kept as held processes: the binary is already read into the page
+    cache and a shell is parked on `read` right before exec'ing it, so a
+    switch skips fork/exec-from-cold-disk. BPF load and verification still
+    happen on release; sched_ext has no way to load a scheduler without
+    attaching it while another one is active.
+
+    Every binary may come with arguments (a generated scx_layered spec);
+    a held process is only used for a binary started without any.
+    """
+
+    def __init__(self, sched_path, sysfs=SCX_SYSFS, stop_timeout=2.0, attach_timeout=5.0,
+                 retries=1, log_path=None, prewarm=0, poll_interval=0.01, clock=time.monotonic):
+        self.sched_path = sched_path
+        self.sysfs = sysfs
+        self.log_path = log_path
+        self.clock = clock
+        self.configure(stop_timeout, attach_timeout, retries, prewarm, poll_interval)
+
+        self.proc = None
+        self.binary = None
+        self.path = None
+        self.args = ()
+        self.handoffs = collections.defaultdict(list)
+        self.failures = collections.Counter()
+        self.restarts = collections.Counter()
+        self.start_times = collections.defaultdict(lambda: {"cold": [], "warm": []})
+        self.predictor = TransitionPredictor()
+        self._held = {}
+
+    def configure(self, stop_timeout=2.0, attach_timeout=5.0, retries=1, prewarm=0, poll_interval=0.01):
+        """Hand-off parameters; a changed prewarm takes effect at the next refill()."""
+        self.stop_timeout = stop_timeout
+        self.attach_timeout = attach_timeout
+        self.retries = retries
+        self.prewarm = prewarm
+        self.poll_interval = poll_interval
+
+    def set_sched_path(self, sched_path):
+        """Held processes exec binaries under the old path, so they go when it changes."""
+        if sched_path != self.sched_path:
+            for binary in list(self._held):
+                self._drop(binary)
+            self.sched_path = sched_path
+
+    # ---- sysfs ----
+
+    def _read(self, rel):
+        try:
+            with open(os.path.join(self.sysfs, rel), "r", encoding="utf-8") as f:
+                return f.read().strip()
+        except OSError:
+            return None
+
+    def state(self):
+        return self._read("state")
+
+    def attached_ops(self):
+        return self._read("root/ops")
+
+    def _wait_for(self, pred, timeout):
+        deadline = self.clock() + timeout
+        while True:
+            if pred():
+                return True
+            if self.clock() >= deadline:
+                return False
+            time.sleep(self.poll_interval)
+
+    # ---- process control ----
+
+    def alive(self):
+        return self.proc is not None and self.proc.poll() is None
+
+    def running(self, binary, args=()):
+        """True if binary, with args, under the current sched_path is what runs now."""
+        return self.alive() and self.path == os.path.join(self.sched_path, binary) and self.args == tuple(args)
+
+    def _popen(self, argv, **kwargs):
+        if self.log_path is not None:
+            with open(self.log_path, "ab") as out:
+                return subprocess.Popen(argv, stdout=out, stderr=subprocess.STDOUT, **kwargs)
+        return subprocess.Popen(argv, **kwargs)
+
+    def _spawn(self, binary, args):
+        """Returns (proc, warm)."""
+        held = None if args else self._held.pop(binary, None)
+        if held is not None and held.poll() is None:
+            held.stdin.write(b"\n")
+            held.stdin.close()
+            return held, True
+        return self._popen([os.path.join(self.sched_path, binary), *args]), False
+
+    # ---- pre-warming ----
+
+    def _hold(self, binary):
+        path = os.path.join(self.sched_path, binary)
+        try:
+            fd = os.open(path, os.O_RDONLY)
+            try:
+                os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+            finally:
+                os.close(fd)
+        except OSError:
+            return
+        self._held[binary] = self._popen(
+            ["/bin/sh", "-c", 'read _ && exec "$0"', path], stdin=subprocess.PIPE)
+
+    def _drop(self, binary):
+        held = self._held.pop(binary)
+        held.kill()
+        held.wait()
+
+    def refill(self):
+        """Hold the predicted next schedulers; drop the ones no longer predicted."""
+        want = set(self.predictor.predict(self.binary, self.prewarm)) if self.prewarm else set()
+        for binary in list(self._held):
+            if binary not in want or self._held[binary].poll() is not None:
+                self._drop(binary)
+        for binary in want - self._held.keys():
+            self._hold(binary)
+
+    def _attached(self, binary):
+        ops = self.attached_ops() or ""
+        return self.state() == "enabled" and ops.startswith(ops_name(binary))
+
+    def _confirm(self, binary):
+        if self.state() is None:
+            # No sched_ext sysfs to confirm against; settle for "still running".
+            time.sleep(min(self.attach_timeout, 0.2))
+            return self.alive()
+        self._wait_for(lambda: not self.alive() or self._attached(binary), self.attach_timeout)
+        return self.alive() and self._attached(binary)
+
+    def stop(self):
+        """Stop and reap the current scheduler, then wait for sched_ext to detach."""
+        proc, self.proc = self.proc, None
+        if proc is not None and proc.poll() is None:
+            for sig in (signal.SIGINT, signal.SIGTERM, signal.SIGKILL):
+                try:
+                    proc.send_signal(sig)
+                except ProcessLookupError:
+                    break
+                try:
+                    proc.wait(timeout=self.stop_timeout)
+                    break
+                except subprocess.TimeoutExpired:
+                    continue
+        if proc is not None:
+            proc.wait()
+        if self.state() is not None:
+            self._wait_for(lambda: self.state() == "disabled", self.stop_timeout)
+
+    def start(self, binary, args=()):
+        for _ in range(1 + self.retries):
+            t0 = self.clock()
+            self.proc, warm = self._spawn(binary, args)
+            if self._confirm(binary):
+                self.start_times[binary]["warm" if warm else "cold"].append(self.clock() - t0)
+                self.binary = binary
+                self.path = os.path.join(self.sched_path, binary)
+                self.args = tuple(args)
+                return True
+            self.failures[binary] += 1
+            self.stop()
+        return False
+
+    def switch(self, binary, args=()):
+        """Hand off to binary; returns False (after rolling back) if it never attached."""
+        prev, prev_args = self.binary, self.args
+        if self.running(binary, args):
+            # Different load, same scheduler: nothing to hand off.
+            return True
+        t0 = self.clock()
+        self.stop()
+        if self.start(binary, args):
+            self.handoffs[binary].append(self.clock() - t0)
+            self.predictor.observe(prev, binary)
+            self.refill()
+            return True
+        if prev is not None:
+            self.start(prev, prev_args)
+        self.refill()
+        return False
+
+    def restart(self, binary, args=()):
+        """Bring binary back after the scheduler exited on its own."""
+        self.stop()
+        self.restarts[binary] += 1
+        return self.start(binary, args)
+
+    def close(self):
+        for binary in list(self._held):
+            self._drop(binary)
+        self.stop()
+
+    def stats(self):
+        def mean_ms(vals):
+            return round(1000 * sum(vals) / len(vals), 2) if vals else None
+
+        out = {}
+        for binary in self.handoffs.keys() | self.failures.keys() | self.start_times.keys() | self.restarts.keys():
+            lat = sorted(self.handoffs.get(binary, []))
+            starts = self.start_times[binary]
+            out[os.path.basename(binary)] = {
+                "handoffs": len(lat),
+                "failures": self.failures.get(binary, 0),
+                "mean_ms": mean_ms(lat),
+                "max_ms": round(1000 * lat[-1], 2) if lat else None,
+                "cold_start_ms": mean_ms(starts["cold"]),
+                "warm_start_ms": mean_ms(starts["warm"]),
+                "warm_starts": len(starts["warm"]),
+                "restarts": self.restarts.get(binary, 0),
+            }
+        return out
+
+
+async def wait_exit(proc, poll_interval=0.5):
+    """Wait for a Popen to exit without blocking the event loop (pidfd, else polling)."""
+    try:
+        fd = os.pidfd_open(proc.pid)
+    except (AttributeError, OSError):
+        # No pidfd (old kernel/Python), or the process is already gone.
+        while proc.poll() is None:
+            await asyncio.sleep(poll_interval)
+        return
+    loop = asyncio.get_running_loop()
+    done = loop.create_future()
+    loop.add_reader(fd, lambda: done.done() or done.set_result(None))
+    try:
+        await done
+    finally:
+        loop.remove_reader(fd)
+        os.close(fd)
+    proc.poll()
@@ -0,0 +1,129 @@
+try:
+    import numpy as np
+except ImportError:  # only batch scoring needs it; the per-tick path is pure Python
+    np = None
+
+from system_load_enum import SystemLoad
+
+# Inputs, in column order for batch scoring: rates normalised by their thresholds.
+FEATURES = (SystemLoad.CPU, SystemLoad.IO, SystemLoad.MEM, SystemLoad.NET, SystemLoad.PARALLEL)
+# Scored loads; IDLE is chosen when none of them reaches idle_level.
+# Position == SystemLoad value, so an argmax index is the class value.
+CLASSES = FEATURES + (SystemLoad.IDLE,)
+
+# PARALLEL = None means "number of CPUs", filled in by from_config().
+DEFAULT_THRESHOLDS = {"CPU": 333, "IO": 333, "MEM": 667, "NET": 333, "PARALLEL": None}
+
+# Each load scores its own normalised rate. PARALLEL needs both many
+# runnable tasks and CPU activity, and outranks plain CPU when both are high.
+DEFAULT_WEIGHTS = {
+    "CPU": {"CPU": 1.0},
+    "IO": {"IO": 1.0},
+    "MEM": {"MEM": 1.0},
+    "NET": {"NET": 1.0},
+    "PARALLEL": {"CPU": 0.5, "PARALLEL": 0.75},
+}
+
+
+def _load(key):
+    if isinstance(key, SystemLoad):
+        return key
+    try:
+        return SystemLoad[key]
+    except KeyError:
+        raise ValueError(f"unknown load '{key}', expected one of {[s.name for s in FEATURES]}")
+
+
+def weight_matrix(weights):
+    """{load: {feature: w}} -> rows in CLASSES order (without IDLE), columns in FEATURES order."""
+    rows = {_load(c): {_load(f): float(w) for f, w in ws.items()} for c, ws in weights.items()}
+    for c in rows:
+        if c not in FEATURES:
+            raise ValueError(f"{c.name} cannot be scored")
+    return [[rows.get(c, {}).get(f, 0.0) for f in FEATURES] for c in FEATURES]
+
+
+class ScoringModel:
+    """
+    score[load] = sum(weight[load][f] * rate[f] / threshold[f]) + bias[load].
+
+    The highest score wins; IDLE wins when no score reaches idle_level.
+    With the default weights a load is picked once its rate reaches its
+    threshold, and the strongest load wins rather than a fixed priority.
+    classify() runs per tick in pure Python; classify_batch() scores a whole
+    (T, len(FEATURES)) trace of rates at once with NumPy when it's installed.
+    """
+
+    def __init__(self, thresholds, weights=None, bias=None, idle_level=1.0):
+        thresholds = {_load(k): v for k, v in thresholds.items()}
+        missing = [f.name for f in FEATURES if not thresholds.get(f)]
+        if missing:
+            raise ValueError(f"thresholds missing or zero for {missing}")
+        self.thresholds = {f: float(thresholds[f]) for f in FEATURES}
+        self.weights = weight_matrix(DEFAULT_WEIGHTS if weights is None else weights)
+        bias = {_load(k): float(v) for k, v in (bias or {}).items()}
+        self.bias = [bias.get(c, 0.0) for c in FEATURES]
+        self.idle_level = float(idle_level)
+
+        # Fold the thresholds into the weights: scores = rates @ W.T + b.
+        self._w = [[w / self.thresholds[f] for w, f in zip(row, FEATURES)] for row in self.weights]
+
+    @classmethod
+    def from_config(cls, cfg, cpus):
+        """cfg is the optional "scoring" block of the dispatcher config."""
+        thresholds = dict(DEFAULT_THRESHOLDS, **cfg.get("thresholds", {}))
+        if thresholds["PARALLEL"] is None:
+            thresholds["PARALLEL"] = cpus
+        return cls(thresholds, cfg.get("weights"), cfg.get("bias"), cfg.get("idle_level", 1.0))
+
+    def scores(self, rates) -> list:
+        """rates in FEATURES order -> scores in CLASSES order (IDLE last)."""
+        out = [sum(w * x for w, x in zip(row, rates)) + b for row, b in zip(self._w, self.bias)]
+        out.append(self.idle_level)
+        return out
+
+    @staticmethod
+    def pick(scores) -> SystemLoad:
+        best = max(range(len(scores)), key=scores.__getitem__)
+        return CLASSES[best]
+
+    def classify(self, rates) -> SystemLoad:
+        return self.pick(self.scores(rates))
+
+    def classify_batch(self, rates):
+        """(T, len(FEATURES)) rates -> T SystemLoad values (an int array with NumPy)."""
+        if np is None:
+            return [self.classify(row).value for row in rates]
+        return classify_weightings(np.asarray([self.weights]), self.thresholds, rates,
+                                   self.bias, self.idle_level)[0]
+
+
+def classify_weightings(weights, thresholds, rates, bias=None, idle_level=1.0, chunk=64):
+    """
+    Score many candidate weightings over one trace in a single pass.
+
+    weights: (C, len(FEATURES), len(FEATURES)) candidate matrices in
+    weight_matrix() layout; bias: (len(FEATURES),) or (C, len(FEATURES)).
+    Returns a (C, T) int8 array of SystemLoad values. Candidates are
+    processed chunk at a time to bound the (chunk, T, classes) temporary;
+    scores are float32, which is ample for a comparison against idle_level.
+    """
+    if np is None:
+        raise RuntimeError("classify_weightings needs numpy")
+    thresholds = {_load(k): v for k, v in thresholds.items()}
+    scale = 1.0 / np.array([thresholds[f] for f in FEATURES])
+    x = np.asarray(rates, dtype=np.float32) * scale.astype(np.float32)
+    w = np.asarray(weights, dtype=np.float32)
+    if w.ndim == 2:
+        w = w[None]
+    b = np.zeros(len(FEATURES), np.float32) if bias is None else np.asarray(bias, dtype=np.float32)
+    b = np.broadcast_to(b, (w.shape[0], len(FEATURES)))
+
+    out = np.empty((w.shape[0], x.shape[0]), dtype=np.int8)
+    for lo in range(0, w.shape[0], chunk):
+        hi = lo + chunk
+        s = np.matmul(x, w[lo:hi].transpose(0, 2, 1)) + b[lo:hi, None, :]
+        best = s.argmax(axis=2)
+        best[np.take_along_axis(s, best[..., None], axis=2)[..., 0] < idle_level] = SystemLoad.IDLE.value
+        out[lo:hi] = best
+    return out
@@ -7,25 +7,26 @@ cd "${SCRIPT_DIR}/profilers_c"
 make
 
 VM_ID=""
+SAMPLING=""
 
 PIDS=()
 
 cleanup() {
     echo ">>> Stopping all profilers and dispatcher..."
-    for pid in "${PIDS[@]}"; do
+    for pid in ${PIDS[@]+"${PIDS[@]}"}; do
         if kill -0 "$pid" 2>/dev/null; then
             kill "$pid" 2>/dev/null || true
         fi
     done
     echo ">>> Cleaning BPF filesystem..."
-    sudo rm -rf /sys/fs/bpf/ba_bawm 2>/dev/null || true
+    sudo rm -rf /sys/fs/bpf/ba_bawm /sys/fs/bpf/ba_bawm_rq /sys/fs/bpf/ba_bawm_rq_cpu /sys/fs/bpf/ba_bawm_events /sys/fs/bpf/ba_bawm_trig /sys/fs/bpf/ba_bawm_trig_cfg 2>/dev/null || true
 }
 
 
 trap 'cleanup; exit 1' INT TERM
 
 usage() {
-    echo "Usage: $0 [-m profile|sched] [-v vm_id] [cpu|io|mem|net|all] [config]" >&2
+    echo "Usage: $0 [-m profile|sched] [-v vm_id] [-s sampling] [cpu|io|mem|net|parallel[,...]|all] [config]" >&2
     echo ""
     echo "  -m profile   Run only profilers"
     echo "  -m sched     Run only dispatcher"
@@ -34,13 +35,18 @@ usage() {
     echo "  -v vm_id     Optional identifier (vm1, vm2)."
     echo "               If supplied, passed to dispatcher for logging."
     echo ""
-    echo "  PROFILER:    cpu | io | mem | net | all (default: all)"
-    echo "  config:      main | alt (default: main)"
+    echo "  -s sampling  Stream every Nth event per CPU for per-task attribution,"
+    echo "               e.g. 64 or cpu=1000,net=16 (default: off)."
+    echo ""
+    echo "  PROFILER:    comma-separated probes for the single profiler process:"
+    echo "               cpu | io | mem | net | parallel, or all (default: all)"
+    echo "  config:      main | alt | path/to/config.json, relative to the repo root"
+    echo "               (default: main)"
 }
 
 MODE="both"
 
-while getopts ":m:v:h" opt; do
+while getopts ":m:v:s:h" opt; do
     case "$opt" in
         m)
             MODE=$(echo "$OPTARG" | tr '[:upper:]' '[:lower:]')
@@ -48,6 +54,9 @@ while getopts ":m:v:h" opt; do
         v)
             VM_ID="$OPTARG"
             ;;
+        s)
+            SAMPLING="$OPTARG"
+            ;;
         h)
             usage
             exit 0
@@ -79,33 +88,34 @@ PROFILER=${1:-all}
 PROFILER=$(echo "$PROFILER" | tr '[:upper:]' '[:lower:]')
 
 CONFIG=${2:-main}
-CONFIG=$(echo "$CONFIG" | tr '[:upper:]' '[:lower:]')
-
-run_profiler() {
-    local p=$1
-    local up=${p^^}
-
-    echo ">>> Launching ${p} profiler (silent)"
-    sudo "./${up}/ba_bawm_${p}" >/dev/null 2>&1 &
-    PIDS+=($!)
-}
+if [[ "$CONFIG" != *.json ]]; then
+    CONFIG=$(echo "$CONFIG" | tr '[:upper:]' '[:lower:]')
+fi
 
 start_profilers() {
+    local probes
     case "$PROFILER" in
-        cpu|io|mem|net)
-            run_profiler "$PROFILER"
-            ;;
         all)
-            for p in cpu io mem net; do
-                run_profiler "$p"
-            done
+            probes="cpu,io,mem,net,parallel"
             ;;
         *)
-            echo "Invalid profiler: $PROFILER" >&2
-            usage
-            exit 1
+            if ! [[ "$PROFILER" =~ ^(cpu|io|mem|net|parallel)(,(cpu|io|mem|net|parallel))*$ ]]; then
+                echo "Invalid profiler: $PROFILER" >&2
+                usage
+                exit 1
+            fi
+            probes="$PROFILER"
             ;;
     esac
+
+    local extra=()
+    if [[ -n "$SAMPLING" ]]; then
+        extra=(-s "$SAMPLING")
+    fi
+
+    echo ">>> Launching profiler (probes=${probes}, sampling=${SAMPLING:-off}) (silent)"
+    sudo ./ALL/ba_bawm_all -p "${probes}" ${extra[@]+"${extra[@]}"} >/dev/null 2>&1 &
+    PIDS+=($!)
 }
 
 run_dispatcher() {
@@ -113,19 +123,14 @@ run_dispatcher() {
 
     echo ">>> Launching dispatcher (cfg=${cfg}, vm_id=${VM_ID:-none}) (silent)"
 
-    if [[ "${cfg}" == "alt" ]]; then
-        if [[ -n "$VM_ID" ]]; then
-            (cd .. && sudo python dispatcher.py alt "${VM_ID}") >/dev/null 2>&1 &
-        else
-            (cd .. && sudo python dispatcher.py alt) >/dev/null 2>&1 &
-        fi
-    else
-        if [[ -n "$VM_ID" ]]; then
-            (cd .. && sudo python dispatcher.py "${VM_ID}") >/dev/null 2>&1 &
-        else
-            (cd .. && sudo python dispatcher.py) >/dev/null 2>&1 &
-        fi
+    local args=()
+    case "${cfg}" in
+        alt|*.json) args+=("${cfg}") ;;
+    esac
+    if [[ -n "$VM_ID" ]]; then
+        args+=("${VM_ID}")
     fi
+    (cd .. && sudo python dispatcher.py ${args[@]+"${args[@]}"}) >/dev/null 2>&1 &
 
     PIDS+=($!)
 }
@@ -0,0 +1,203 @@
+import asyncio
+import bisect
+import functools
+import os
+
+from scoring import CLASSES, FEATURES
+from system_load_enum import SystemLoad
+
+CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+
+# Upper bounds in seconds; +Inf is implied.
+TICK_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+SWITCH_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# A reload is sub-millisecond unless it swaps the scheduler.
+RELOAD_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01) + SWITCH_BUCKETS
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, v):
+        self.counts[bisect.bisect_left(self.buckets, v)] += 1
+        self.sum += v
+        self.count += 1
+
+    def render(self, name, help_text):
+        lines = [f"# TYPE {name} histogram", f"# HELP {name} {help_text}", f"# UNIT {name} seconds"]
+        acc = 0
+        for le, n in zip(self.buckets + (float("inf"),), self.counts):
+            acc += n
+            lines.append(f'{name}_bucket{{le="{_le(le)}"}} {acc}')
+        lines.append(f"{name}_count {self.count}")
+        lines.append(f"{name}_sum {self.sum!r}")
+        return lines
+
+
+def _le(v):
+    return "+Inf" if v == float("inf") else repr(float(v))
+
+
+def _label(v):
+    return str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class DispatcherMetrics:
+    """
+    What the dispatcher knows after each tick, rendered as OpenMetrics on
+    scrape. Updated and rendered on the dispatcher's event loop, so a
+    scrape never interleaves with an update.
+    """
+
+    def __init__(self):
+        self.rates = {}
+        self.scores = ()
+        self.load = None
+        self.partitions = {}
+        self.scheduler = None
+        self.interval = 0.0
+        self.switches = 0
+        self.failures = 0
+        self.suppressed = 0
+        self.switches_per_min = 0.0
+        self.restarts = 0
+        self.restart_failures = 0
+        self.reloads = 0
+        self.reload_failures = 0
+        self.wakeups = 0
+        self.tick_seconds = Histogram(TICK_BUCKETS)
+        self.read_seconds = Histogram(TICK_BUCKETS)
+        self.switch_seconds = Histogram(SWITCH_BUCKETS)
+        self.reload_seconds = Histogram(RELOAD_BUCKETS)
+
+    def tick(self, duration, read_s, rates, classifier, scheduler, interval):
+        self.tick_seconds.observe(duration)
+        self.read_seconds.observe(read_s)
+        self.rates = rates
+        self.scores = tuple(classifier.scores)
+        self.load = classifier.current
+        self.suppressed = classifier.suppressed
+        self.switches_per_min = classifier.switches_per_min()
+        self.scheduler = scheduler
+        self.interval = interval
+
+    def switch(self, seconds, ok):
+        self.switch_seconds.observe(seconds)
+        if ok:
+            self.switches += 1
+        else:
+            self.failures += 1
+
+    def reload(self, seconds, ok):
+        if ok:
+            self.reloads += 1
+            self.reload_seconds.observe(seconds)
+        else:
+            self.reload_failures += 1
+
+    def render(self):
+        out = [
+            "# TYPE ba_bawm_rate gauge",
+            "# HELP ba_bawm_rate Per-load event rate over the last window (PARALLEL: runnable tasks).",
+        ]
+        for load in FEATURES:
+            out.append(f'ba_bawm_rate{{load="{load.name}"}} {float(self.rates.get(load.value, 0.0))!r}')
+        out += ["# TYPE ba_bawm_score gauge", "# HELP ba_bawm_score Classifier score per class."]
+        for cls, v in zip(CLASSES, self.scores):
+            out.append(f'ba_bawm_score{{class="{cls.name}"}} {float(v)!r}')
+        out += ["# TYPE ba_bawm_load stateset", "# HELP ba_bawm_load Current classification."]
+        for load in SystemLoad:
+            out.append(f'ba_bawm_load{{ba_bawm_load="{load.name}"}} {int(load == self.load)}')
+        if self.partitions:
+            out += ["# TYPE ba_bawm_partition_load stateset",
+                    "# HELP ba_bawm_partition_load Load each CPU partition's layer is set up for."]
+            for name, cur in self.partitions.items():
+                for load in SystemLoad:
+                    out.append(f'ba_bawm_partition_load{{partition="{_label(name)}",'
+                               f'ba_bawm_partition_load="{load.name}"}} {int(load == cur)}')
+        out += ["# TYPE ba_bawm_scheduler info", "# HELP ba_bawm_scheduler Scheduler currently attached."]
+        if self.scheduler:
+            out.append(f'ba_bawm_scheduler_info{{scheduler="{_label(os.path.basename(self.scheduler))}"}} 1')
+        out += [
+            "# TYPE ba_bawm_switches counter",
+            "# HELP ba_bawm_switches Completed scheduler switches.",
+            f"ba_bawm_switches_total {self.switches}",
+            "# TYPE ba_bawm_switch_failures counter",
+            "# HELP ba_bawm_switch_failures Switches rolled back because the scheduler never attached.",
+            f"ba_bawm_switch_failures_total {self.failures}",
+            "# TYPE ba_bawm_scheduler_restarts counter",
+            "# HELP ba_bawm_scheduler_restarts Restarts after the scheduler exited on its own.",
+            f"ba_bawm_scheduler_restarts_total {self.restarts}",
+            "# TYPE ba_bawm_scheduler_restart_failures counter",
+            "# HELP ba_bawm_scheduler_restart_failures Restart attempts where the scheduler never attached.",
+            f"ba_bawm_scheduler_restart_failures_total {self.restart_failures}",
+            "# TYPE ba_bawm_switches_suppressed counter",
+            "# HELP ba_bawm_switches_suppressed Load changes held back by hysteresis.",
+            f"ba_bawm_switches_suppressed_total {self.suppressed}",
+            "# TYPE ba_bawm_config_reloads counter",
+            "# HELP ba_bawm_config_reloads Config reloads put into effect.",
+            f"ba_bawm_config_reloads_total {self.reloads}",
+            "# TYPE ba_bawm_config_reload_failures counter",
+            "# HELP ba_bawm_config_reload_failures Config reloads rejected by validation.",
+            f"ba_bawm_config_reload_failures_total {self.reload_failures}",
+            "# TYPE ba_bawm_trigger_wakeups counter",
+            "# HELP ba_bawm_trigger_wakeups Ticks started by a profiler threshold crossing (trigger mode).",
+            f"ba_bawm_trigger_wakeups_total {self.wakeups}",
+            "# TYPE ba_bawm_switches_per_minute gauge",
+            "# HELP ba_bawm_switches_per_minute Switch rate over the classifier's stats window.",
+            f"ba_bawm_switches_per_minute {self.switches_per_min!r}",
+            "# TYPE ba_bawm_sample_interval_seconds gauge",
+            "# HELP ba_bawm_sample_interval_seconds Current sampling interval.",
+            "# UNIT ba_bawm_sample_interval_seconds seconds",
+            f"ba_bawm_sample_interval_seconds {self.interval!r}",
+        ]
+        out += self.switch_seconds.render("ba_bawm_switch_latency_seconds",
+                                          "Time to stop the old and attach the new scheduler.")
+        out += self.reload_seconds.render("ba_bawm_config_reload_seconds",
+                                          "From a config file change to it being in effect, scheduler swap included.")
+        out += self.tick_seconds.render("ba_bawm_tick_duration_seconds",
+                                        "Dispatcher tick, excluding the sleep.")
+        out += self.read_seconds.render("ba_bawm_bpf_read_seconds",
+                                        "Time to read the BPF counter and run-queue maps.")
+        out.append("# EOF")
+        return ("\n".join(out) + "\n").encode()
+
+
+async def _serve(reader, writer, metrics):
+    try:
+        request = await reader.readline()
+        while (await reader.readline()).strip():
+            pass  # headers
+        parts = request.split()
+        if len(parts) < 2 or parts[0] != b"GET":
+            head, body = b"405 Method Not Allowed", b""
+        elif parts[1] not in (b"/", b"/metrics"):
+            head, body = b"404 Not Found", b""
+        else:
+            head, body = b"200 OK", metrics.render()
+        writer.write(b"HTTP/1.1 " + head + b"\r\nContent-Type: " + CONTENT_TYPE.encode()
+                     + b"\r\nContent-Length: " + str(len(body)).encode()
+                     + b"\r\nConnection: close\r\n\r\n" + body)
+        await writer.drain()
+    except (ConnectionError, asyncio.IncompleteReadError):
+        pass
+    finally:
+        writer.close()
+
+
+async def serve_metrics(metrics, listen):
+    """An asyncio server for /metrics on "unix:/path" or "host:port"."""
+    handler = functools.partial(_serve, metrics=metrics)
+    if listen.startswith("unix:"):
+        path = listen[len("unix:"):]
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+        return await asyncio.start_unix_server(handler, path)
+    host, _, port = listen.rpartition(":")
+    return await asyncio.start_server(handler, host or "127.0.0.1", int(port))
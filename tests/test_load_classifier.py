@@ -0,0 +1,28 @@
+from load_classifier import LoadClassifier
+from scoring import ScoringModel
+from system_load_enum import SystemLoad
+
+
+def classifier(bias=None, idle_level=1.0):
+    model = ScoringModel.from_config({"bias": bias or {}, "idle_level": idle_level}, 4)
+    return model, LoadClassifier(model, SystemLoad.CPU, tau=0, min_dwell=0, clock=lambda: 0.0)
+
+
+def rates(model, **levels):
+    return {SystemLoad[k].value: v * model.thresholds[SystemLoad[k]] for k, v in levels.items()}
+
+
+def test_running_load_keeps_its_margin():
+    model, clf = classifier()
+    assert clf.update(rates(model, CPU=2.0, IO=2.5)) == SystemLoad.CPU
+    assert clf.update(rates(model, CPU=2.0, IO=3.0)) == SystemLoad.IO
+
+
+def test_margin_holds_for_negative_scores():
+    bias = {load: -3.0 for load in ("CPU", "IO", "MEM", "NET", "PARALLEL")}
+    model, clf = classifier(bias=bias, idle_level=-10.0)
+    # CPU scores -2.0 and IO -1.8: within the running load's margin.
+    assert clf.update(rates(model, CPU=1.0, IO=1.2)) == SystemLoad.CPU
+    assert clf.measured == SystemLoad.IO
+    # CPU -2.0 against IO -0.5: IO wins by more than the margin.
+    assert clf.update(rates(model, CPU=1.0, IO=2.5)) == SystemLoad.IO
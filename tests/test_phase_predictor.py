@@ -0,0 +1,69 @@
+from datetime import datetime
+
+from load_classifier import LoadClassifier
+from phase_predictor import PhasePredictor
+from scoring import ScoringModel
+from system_load_enum import SystemLoad
+
+
+def at(day, hour, minute, second=0.0):
+    return datetime(2026, 3, day, hour, minute).timestamp() + second
+
+
+def test_flapping_slot_is_not_predicted():
+    pp = PhasePredictor(slot_s=900, lead_s=10)
+    load = SystemLoad.CPU
+    for i in range(24):
+        pp.observe(load, at(2, 9, 0, 60 + 5 * i))
+        load = SystemLoad.IO if load == SystemLoad.CPU else SystemLoad.CPU
+
+    for entry in pp.model.values():
+        for count, _ in entry[1].values():
+            assert count <= entry[0]
+    pp.phase = None
+    pp.observe(SystemLoad.CPU, at(3, 9, 0, 55))
+    assert pp.advise(SystemLoad.CPU, at(3, 9, 0, 58)) is None
+
+
+def test_daily_change_is_predicted():
+    pp = PhasePredictor(slot_s=900, lead_s=10, decay=1.0)
+    for day in (2, 3, 4, 5):
+        pp.phase = None
+        pp.observe(SystemLoad.CPU, at(day, 9, 0, 30))
+        pp.observe(SystemLoad.IO, at(day, 9, 1))
+
+    pp.phase = None
+    pp.observe(SystemLoad.CPU, at(6, 9, 0, 30))
+    assert pp.advise(SystemLoad.CPU, at(6, 9, 0, 55)) == SystemLoad.IO
+    assert pp.holding(SystemLoad.CPU, at(6, 9, 1))
+    pp.observe(SystemLoad.IO, at(6, 9, 1))
+    assert pp.stats()["hits"] == 1
+
+
+def test_pre_switch_moves_the_classifier():
+    pp = PhasePredictor(slot_s=900, lead_s=10, decay=1.0)
+    for day in (2, 3, 4, 5):
+        pp.phase = None
+        pp.observe(SystemLoad.CPU, at(day, 9, 0, 30))
+        pp.observe(SystemLoad.IO, at(day, 9, 1))
+
+    now = [0.0]
+    clf = LoadClassifier(ScoringModel.from_config({}, 4), SystemLoad.CPU, min_dwell=2.0, clock=lambda: now[0])
+    cpu = {SystemLoad.CPU.value: 5000.0}
+    running = SystemLoad.CPU
+    for i in range(30):
+        now[0] = i * 0.5
+        wall = at(6, 9, 0, 45 + i * 0.5)
+        clf.update(cpu)
+        pp.observe_tick(clf, wall)
+        target, predicted = pp.decide(clf, running, wall)
+        if target is not None:
+            running = target
+            if predicted:
+                assert clf.current == SystemLoad.IO
+            else:
+                break
+        # The hold keeps the predicted scheduler although the load is still CPU.
+        assert running == SystemLoad.IO or wall < at(6, 9, 0, 51)
+    assert pp.stats()["predictions"] == 1
+    assert clf.current == running
@@ -0,0 +1,72 @@
+import os
+import signal
+
+import pytest
+
+from sched_manager import SchedulerManager
+
+# Attaches at once (root/ops = the name without scx_) and detaches on SIGINT.
+GOOD = """#!/bin/sh
+trap 'echo disabled > "{sysfs}/state"; exit 0' INT
+echo "${{0##*/scx_}}_1.0.0" > "{sysfs}/root/ops"
+echo enabled > "{sysfs}/state"
+while :; do sleep 0.05; done
+"""
+# Exits before it ever attaches, like a scheduler the verifier rejected.
+BAD = """#!/bin/sh
+exit 1
+"""
+# Attaches, but ignores SIGINT and SIGTERM.
+STUBBORN = """#!/bin/sh
+trap '' INT TERM
+echo "${{0##*/scx_}}_1.0.0" > "{sysfs}/root/ops"
+echo enabled > "{sysfs}/state"
+while :; do sleep 0.05; done
+"""
+
+
+@pytest.fixture
+def manager(tmp_path):
+    sysfs = tmp_path / "sys"
+    (sysfs / "root").mkdir(parents=True)
+    (sysfs / "state").write_text("disabled\n")
+    (sysfs / "root" / "ops").write_text("")
+    scheds = tmp_path / "scx"
+    scheds.mkdir()
+    for name, body in (("scx_good", GOOD), ("scx_other", GOOD), ("scx_bad", BAD), ("scx_stubborn", STUBBORN)):
+        path = scheds / name
+        path.write_text(body.format(sysfs=sysfs))
+        os.chmod(path, 0o755)
+
+    mgr = SchedulerManager(str(scheds), sysfs=str(sysfs), stop_timeout=0.5, attach_timeout=2.0)
+    yield mgr
+    mgr.close()
+
+
+def test_switch_confirms_attach(manager):
+    assert manager.switch("scx_good")
+    assert manager.running("scx_good")
+    assert manager.state() == "enabled"
+    assert manager.attached_ops().startswith("good")
+
+    old = manager.proc
+    assert manager.switch("scx_other")
+    assert old.returncode == 0  # stopped with SIGINT and reaped
+    assert manager.attached_ops().startswith("other")
+    assert manager.stats()["scx_other"]["handoffs"] == 1
+
+
+def test_failed_attach_rolls_back(manager):
+    assert manager.switch("scx_good")
+    assert not manager.switch("scx_bad")
+    assert manager.failures["scx_bad"] == 1 + manager.retries
+    assert manager.running("scx_good")
+    assert manager.attached_ops().startswith("good")
+
+
+def test_stop_escalates_to_sigkill(manager):
+    assert manager.switch("scx_stubborn")
+    proc = manager.proc
+    manager.stop()
+    assert proc.returncode == -signal.SIGKILL
+    assert manager.proc is None
@@ -0,0 +1,128 @@
+import collections
+import json
+import os
+import struct
+
+from system_load_enum import SystemLoad
+
+# Append-only dispatcher trace:
+#   MAGIC, then records, each starting with a one-byte tag.
+#   b"M": u32 length + JSON metadata (the dispatcher config and friends);
+#         written at start and again whenever the config is reloaded.
+#   b"T": one dispatcher tick, TICK below.
+MAGIC = b"BBTR\x01"
+META_TAG = b"M"
+TICK_TAG = b"T"
+_LEN = struct.Struct("=I")
+
+# t (monotonic s), window (s), CPU/IO/MEM/NET counter deltas,
+# run-queue mean/p50/p99 and sample count, decision, load after the
+# tick, switch result.
+TICK = struct.Struct("=dd4Q3fIBBB")
+COUNTER_KEYS = (SystemLoad.CPU.value, SystemLoad.IO.value, SystemLoad.MEM.value, SystemLoad.NET.value)
+
+NO_SWITCH = 0
+SWITCHED = 1
+SWITCH_FAILED = 2
+
+Tick = collections.namedtuple(
+    "Tick", "t window counts rq_mean rq_p50 rq_p99 rq_samples decision load result")
+
+
+class TraceWriter:
+    """Appends ticks to a trace file; the header is written only to a new file."""
+
+    def __init__(self, path):
+        self._f = open(path, "ab")
+        if self._f.tell() == 0:
+            self._f.write(MAGIC)
+
+    def meta(self, meta):
+        blob = json.dumps(meta, sort_keys=True).encode()
+        self._f.write(META_TAG + _LEN.pack(len(blob)) + blob)
+        self._f.flush()
+
+    def tick(self, t, window, counts, rq_stats, decision, load, result=NO_SWITCH):
+        rq = rq_stats or {}
+        self._f.write(TICK_TAG + TICK.pack(
+            t, window, *(counts.get(k, 0) for k in COUNTER_KEYS),
+            rq.get("mean", 0.0), rq.get("p50", 0.0), rq.get("p99", 0.0), rq.get("samples", 0),
+            decision.value, load.value, result))
+
+    def close(self):
+        self._f.close()
+
+
+def read_trace(path):
+    """Yields ("meta", dict) and ("tick", Tick) in file order."""
+    with open(path, "rb") as f:
+        data = f.read()
+    if not data.startswith(MAGIC):
+        raise ValueError(f"{path} is not a dispatcher trace")
+    view = memoryview(data)
+    off = len(MAGIC)
+    end = len(data)
+    while off < end:
+        tag = data[off:off + 1]
+        off += 1
+        if tag == TICK_TAG:
+            if off + TICK.size > end:
+                break  # torn final record from a crash
+            f = TICK.unpack_from(view, off)
+            off += TICK.size
+            yield "tick", Tick(f[0], f[1], dict(zip(COUNTER_KEYS, f[2:6])), f[6], f[7], f[8], f[9],
+                               SystemLoad(f[10]), SystemLoad(f[11]), f[12])
+        elif tag == META_TAG:
+            if off + _LEN.size > end:
+                break
+            n = _LEN.unpack_from(view, off)[0]
+            off += _LEN.size
+            if off + n > end:
+                break
+            yield "meta", json.loads(bytes(view[off:off + n]))
+            off += n
+        else:
+            raise ValueError(f"{path}: bad record tag {tag!r} at offset {off - 1}")
+
+
+class TraceSource:
+    """
+    Stands in for both the CounterSource and the run-queue histogram while
+    replaying: set .tick, then RateSampler.sample() sees that tick's window.
+    """
+
+    def __init__(self):
+        self.tick = None
+
+    def snapshot(self):
+        return dict(self.tick.counts) if self.tick else {}
+
+    def window(self):
+        tk = self.tick
+        if tk is None:
+            return {"samples": 0, "mean": 0.0, "p50": 0.0, "p99": 0.0}
+        return {"samples": tk.rq_samples, "mean": tk.rq_mean, "p50": tk.rq_p50, "p99": tk.rq_p99}
+
+    def close(self):
+        pass
+
+
+def rates_matrix(ticks, rq_stat="p50"):
+    """Rows of rates in scoring.FEATURES order, for ScoringModel.classify_batch()."""
+    rows = []
+    for tk in ticks:
+        w = max(tk.window, 1e-6)
+        c = tk.counts
+        rows.append([c[SystemLoad.CPU.value] / w, c[SystemLoad.IO.value] / w, c[SystemLoad.MEM.value] / w,
+                     c[SystemLoad.NET.value] / w, getattr(tk, "rq_" + rq_stat)])
+    return rows
+
+
+def open_trace_writer(path, base_dir="."):
+    if not path:
+        return None
+    path = os.path.join(base_dir, path)
+    parent = os.path.dirname(path)
+    if parent:
+        os.makedirs(parent, exist_ok=True)
+    return TraceWriter(path)
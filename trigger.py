@@ -0,0 +1,101 @@
+import asyncio
+import math
+import struct
+
+from bpf_map import BpfMap, u32_bytes, u64_bytes
+from event_stream import RingBuffer
+from system_load_enum import SystemLoad
+
+TRIG_PIN_PATH = "/sys/fs/bpf/ba_bawm_trig"
+TRIG_CFG_PIN_PATH = "/sys/fs/bpf/ba_bawm_trig_cfg"
+
+# ba_bawm_trig_cfg (see profilers_c/ALL/ba_bawm_all_skel.bpf.c): a threshold
+# per key up to PARALLEL, then the window length in ns.
+TRIG_KEYS = (SystemLoad.CPU, SystemLoad.IO, SystemLoad.MEM, SystemLoad.NET, SystemLoad.PARALLEL)
+TRIG_WINDOW = SystemLoad.PARALLEL.value + 1
+
+# struct trigger: ts_ns, value, key, above.
+NOTE = struct.Struct("=QQII")
+
+
+class TriggerStream:
+    """
+    Threshold crossings reported by the profiler's run-queue timer, so the
+    dispatcher can sleep while nothing changes. arm() sets the thresholds
+    and window in the kernel; wait() blocks on the ring buffer's fd until a
+    crossing arrives or the timeout passes.
+    """
+
+    def __init__(self, ring, cfg):
+        self.ring = ring
+        self.cfg = cfg
+        self.notes = 0
+        self.wakeups = 0
+        self.timeouts = 0
+        self.last = []
+
+    def arm(self, thresholds, window_ms, ratio=1.0):
+        """thresholds: {SystemLoad: rate}, as in ScoringModel.thresholds; a key fires at ratio x its threshold."""
+        for load in TRIG_KEYS:
+            t = thresholds.get(load)
+            value = max(1, math.ceil(ratio * t)) if t else 0
+            self.cfg.update(u32_bytes(load.value), u64_bytes(value))
+        self.cfg.update(u32_bytes(TRIG_WINDOW), u64_bytes(int(window_ms * 1e6)))
+
+    def disarm(self):
+        self.cfg.update(u32_bytes(TRIG_WINDOW), u64_bytes(0))
+
+    def drain(self):
+        """[(SystemLoad, above, value)] for every crossing since the last call."""
+        out = []
+        for rec in self.ring.records():
+            _, value, key, above = NOTE.unpack_from(rec)
+            out.append((SystemLoad(key), bool(above), value))
+        self.notes += len(out)
+        if out:
+            self.last = [(load.name, above, value) for load, above, value in out]
+        return out
+
+    async def wait(self, timeout):
+        """Sleep until a crossing or timeout seconds; returns the crossings (empty on timeout)."""
+        if not self.ring.pending():
+            loop = asyncio.get_running_loop()
+            woke = loop.create_future()
+            fd = self.ring.fileno()
+            loop.add_reader(fd, lambda: woke.done() or woke.set_result(None))
+            try:
+                await asyncio.wait_for(woke, timeout)
+            except asyncio.TimeoutError:
+                pass
+            finally:
+                loop.remove_reader(fd)
+        notes = self.drain()
+        if notes:
+            self.wakeups += 1
+        else:
+            self.timeouts += 1
+        return notes
+
+    def stats(self):
+        return {"wakeups": self.wakeups, "heartbeats": self.timeouts, "crossings": self.notes, "last": self.last}
+
+    def close(self):
+        try:
+            self.disarm()
+        finally:
+            self.ring.close()
+            self.cfg.close()
+
+
+def open_trigger(path=TRIG_PIN_PATH, cfg_path=TRIG_CFG_PIN_PATH):
+    """Returns None when the profiler is not running, or was built without trigger mode."""
+    try:
+        cfg = BpfMap.from_pinned(cfg_path)
+    except FileNotFoundError:
+        return None
+    try:
+        ring = RingBuffer.from_pinned(path, pollable=True)
+    except FileNotFoundError:
+        cfg.close()
+        return None
+    return TriggerStream(ring, cfg)